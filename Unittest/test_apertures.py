@@ -0,0 +1,199 @@
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from import_toolkit import _cluster_profiler, _cluster_report
+from import_toolkit import apertures as _apertures
+from import_toolkit import gravity
+
+
+class MockCluster(_cluster_profiler.Mixin, _cluster_report.Mixin):
+
+    def __init__(self, seed: int = 0):
+        np.random.seed(seed)
+        self.centre_of_potential = np.array([50., 60., 70.])
+        self.r500 = 1.
+        for part_type, n in zip(['0', '1', '4'], [4000, 5000, 1000]):
+            coords = self.centre_of_potential + np.random.normal(0., 1., (n, 3)) * np.array([1., 0.7, 0.4])
+            velocity = np.random.normal(0., 500., (n, 3)) + np.cross(coords - self.centre_of_potential, [0., 0., 300.])
+            setattr(self, f'partType{part_type}_coordinates', coords)
+            setattr(self, f'partType{part_type}_velocity', velocity)
+            setattr(self, f'partType{part_type}_mass', np.random.uniform(0.5, 1.5, n) * 1e-3)
+            setattr(self, f'partType{part_type}_subgroupnumber', np.random.randint(0, 3, n))
+        self.partType0_temperature = np.random.uniform(1e6, 1e8, 4000)
+
+
+def reference_report(cluster, aperture_radius):
+    """
+    Direct computation of the group_dynamics and group_morphology datasets,
+    selecting the particles and using the static kernels of the profiler.
+    """
+    P = _cluster_profiler.Mixin
+    selections = {}
+    for part_type in ['0', '1', '4']:
+        index = np.where(np.linalg.norm(getattr(cluster, f'partType{part_type}_coordinates') -
+                                        cluster.centre_of_potential, axis=1) < aperture_radius)[0]
+        selections[part_type] = {field: getattr(cluster, f'partType{part_type}_{field}')[index]
+                                 for field in ['mass', 'coordinates', 'velocity', 'subgroupnumber']}
+        selections[part_type]['temperature'] = cluster.partType0_temperature[index] if part_type == '0' else None
+    selections['total'] = {field: np.concatenate([selections[pt][field] for pt in ['0', '1', '4']])
+                           for field in ['mass', 'coordinates', 'velocity', 'subgroupnumber']}
+
+    report = {}
+    for group in ['total', '0', '1', '4']:
+        m, x, v = (selections[group][field] for field in ['mass', 'coordinates', 'velocity'])
+        M = np.sum(m)
+        x = x - cluster.centre_of_potential
+        zmf = P.zero_momentum_frame(m, v)
+        L = P.angular_momentum(m, x, v - zmf)
+        I = P.inertia_tensor(m, x)
+        vc = np.sqrt(_cluster_profiler.G_astro * M / aperture_radius)
+        eigenvalues, eigenvectors = np.linalg.eig(I)
+        # One eigenvector per row, sorted by decreasing eigenvalue
+        order = np.argsort(eigenvalues)[::-1]
+        eigenvalues = eigenvalues[order] / M
+        kinetic = P.kinetic_energy(P.mass_units(m), P.velocity_units(v - zmf)) * 1e-46
+        entry = {
+                'N_particles': len(m),
+                'aperture_mass': M,
+                'centre_of_mass': P.centre_of_mass(m, x) + cluster.centre_of_potential,
+                'zero_momentum_frame': zmf,
+                'angular_momentum': L,
+                'angular_velocity': np.linalg.inv(I) @ L,
+                'specific_angular_momentum': np.linalg.norm(L) / M,
+                'circular_velocity': vc,
+                'spin_parameter': np.linalg.norm(L) / (M * aperture_radius * vc * np.sqrt(2)),
+                'substructure_mass': M - np.sum(m[selections[group]['subgroupnumber'] == 0]),
+                'kinetic_energy': kinetic,
+                'dynamical_merging_index': np.linalg.norm(P.centre_of_mass(m, x)) / aperture_radius,
+                'inertia_tensor': I.ravel(),
+                'eigenvalues': eigenvalues,
+                'eigenvectors': eigenvectors[:, order].T.ravel(),
+                'triaxiality': (eigenvalues[0] - eigenvalues[1]) / (eigenvalues[0] - eigenvalues[2]),
+                'sphericity': np.sqrt(eigenvalues[2] / eigenvalues[0]),
+                'elongation': np.sqrt(eigenvalues[1] / eigenvalues[0]),
+        }
+        entry['substructure_fraction'] = entry['substructure_mass'] / M
+        for key, value in entry.items():
+            report.setdefault(key, []).append(value)
+
+    gas = selections['0']
+    thermal = P.thermal_energy(P.mass_units(gas['mass']), gas['temperature']) * 1e-46
+    report['thermal_energy'] = [thermal, thermal, 0., 0.]
+    report['thermodynamic_merging_index'] = [report['kinetic_energy'][1] / thermal] * 2 + [0., 0.]
+    return {key: np.asarray(value) for key, value in report.items()}
+
+
+class TestApertures(unittest.TestCase):
+
+    def assertReportEqual(self, report, expected):
+        for key, value in expected.items():
+            self.assertEqual(np.shape(report[key]), np.shape(value), key)
+            if key == 'eigenvectors':
+                # Defined up to a sign
+                np.testing.assert_allclose(np.abs(report[key]), np.abs(value), rtol=1e-6, atol=1e-9, err_msg=key)
+            else:
+                np.testing.assert_allclose(report[key], value, rtol=1e-6, atol=1e-12, err_msg=key)
+
+    def test_single_aperture_report(self):
+        cluster = MockCluster()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            dynamics = cluster.group_dynamics(aperture_radius=1.2)
+            morphology = cluster.group_morphology(aperture_radius=1.2)
+        self.assertEqual(list(dynamics.keys()), list(_cluster_report.dynamics_keys) + list(gravity.gravity_keys))
+        self.assertEqual(list(morphology.keys()), list(_cluster_report.morphology_keys))
+        self.assertReportEqual({**dynamics, **morphology}, reference_report(cluster, 1.2))
+
+    def test_report_grid_matches_single_apertures(self):
+        cluster = MockCluster()
+        apertures = np.array([0.3, 0.8, 1.5, 3.])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            reports = cluster.group_report_apertures(apertures)
+            for aperture_radius, report in zip(apertures, reports):
+                expected = cluster.group_report(aperture_radius=aperture_radius)
+                self.assertEqual(set(report.keys()), set(expected.keys()))
+                self.assertReportEqual(report, expected)
+                self.assertReportEqual(report, reference_report(cluster, aperture_radius))
+
+    def test_degenerate_morphology(self):
+        # Axisymmetric distribution: two equal eigenvalues, plus an empty aperture
+        moments = np.zeros((2, 4, _apertures.N_MOMENTS + 1))
+        moments[0, :, _apertures._M] = 2.
+        moments[0, :, _apertures._MXX] = [1., 1., 4., 0., 0., 0.]
+        morphology = _apertures.morphology_from_moments(moments)
+        eigenvalues = morphology['eigenvalues'][0]
+        eigenvectors = morphology['eigenvectors'][0].reshape(4, 3, 3)
+        inertia_tensor = morphology['inertia_tensor'][0].reshape(4, 3, 3)
+        np.testing.assert_allclose(eigenvalues, [[2.5, 2.5, 1.]] * 4)
+        np.testing.assert_allclose(eigenvectors @ np.swapaxes(eigenvectors, -1, -2), [np.identity(3)] * 4, atol=1e-12)
+        np.testing.assert_allclose(inertia_tensor @ np.swapaxes(eigenvectors, -1, -2),
+                                   2. * np.swapaxes(eigenvectors, -1, -2) * eigenvalues[:, None, :], atol=1e-12)
+        np.testing.assert_allclose(morphology['triaxiality'][0], 0.)
+        self.assertTrue(np.all(np.isnan(morphology['eigenvalues'][1])))
+        self.assertTrue(np.all(np.isnan(morphology['eigenvectors'][1])))
+
+    def test_memoised_group_quantities(self):
+        cluster = MockCluster()
+        P = _cluster_profiler.Mixin
+        R = 1.3
+        index = {pt: np.where(cluster.particle_radii(pt) < R)[0] for pt in ['0', '1', '4']}
+        fields = {field: [getattr(cluster, f'partType{pt}_{field}')[index[pt]] for pt in ['0', '1', '4']]
+                  for field in ['mass', 'coordinates', 'velocity']}
+        mass, coords, velocity = (np.concatenate(fields[field]) for field in ['mass', 'coordinates', 'velocity'])
+        zmf = P.zero_momentum_frame(mass, velocity)
+        expected = {
+                'group_mass_aperture'      : (mass.sum(), [m.sum() for m in fields['mass']]),
+                'group_centre_of_mass'     : (P.centre_of_mass(mass, coords),
+                                              [P.centre_of_mass(m, x) for m, x in zip(fields['mass'], fields['coordinates'])]),
+                'group_zero_momentum_frame': (zmf,
+                                              [P.zero_momentum_frame(m, v) for m, v in zip(fields['mass'], fields['velocity'])]),
+                'group_kinetic_energy'     : (P.kinetic_energy(P.mass_units(mass), P.velocity_units(velocity - zmf)) * 1e-46,
+                                              [P.kinetic_energy(P.mass_units(m), P.velocity_units(v - zmf)) * 1e-46
+                                               for m, v in zip(fields['mass'], fields['velocity'])]),
+                'group_angular_momentum'   : (P.angular_momentum(mass, coords - cluster.centre_of_potential, velocity - zmf),
+                                              [P.angular_momentum(m, x - cluster.centre_of_potential, v - zmf)
+                                               for m, x, v in zip(fields['mass'], fields['coordinates'], fields['velocity'])]),
+        }
+        for method, (total, per_type) in expected.items():
+            np.testing.assert_allclose(getattr(cluster, method)(aperture_radius=R), total, rtol=1e-8, err_msg=method)
+            np.testing.assert_allclose(getattr(cluster, method)(out_allPartTypes=True, aperture_radius=R), per_type,
+                                       rtol=1e-8, err_msg=method)
+
+        # Repeated calls are served from the cache, until the arrays change
+        hits = cluster.particle_cache().hits
+        zmf_cached = cluster.group_zero_momentum_frame(aperture_radius=R)
+        self.assertGreater(cluster.particle_cache().hits, hits)
+        zmf_cached += 1.
+        np.testing.assert_allclose(cluster.group_zero_momentum_frame(aperture_radius=R), zmf)
+        cluster.partType1_velocity = cluster.partType1_velocity + 100.
+        self.assertFalse(np.allclose(cluster.group_zero_momentum_frame(aperture_radius=R), zmf))
+        cluster.invalidate_particle_cache('4')
+        self.assertFalse(any(key[1] == 'all' for key in cluster.particle_cache()._data))
+
+    def test_particle_cache(self):
+        cluster = MockCluster()
+        radii = cluster.particle_radii('0')
+        self.assertIs(cluster.particle_radii('0'), radii)
+        index = cluster.aperture_index('0', 1.)
+        np.testing.assert_array_equal(index, np.where(radii < 1.)[0])
+        self.assertIs(cluster.aperture_index('0', 1.), index)
+
+        # New coordinates or a new centre invalidate the entries
+        cluster.partType0_coordinates = cluster.partType0_coordinates[::2]
+        self.assertEqual(len(cluster.particle_radii('0')), len(radii[::2]))
+        cluster.centre_of_potential = cluster.centre_of_potential + 0.1
+        np.testing.assert_allclose(cluster.particle_radii('0'),
+                                   np.linalg.norm(cluster.partType0_coordinates - cluster.centre_of_potential, axis=1))
+
+        cluster.invalidate_particle_cache()
+        self.assertEqual(len(cluster.particle_cache()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
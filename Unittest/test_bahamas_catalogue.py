@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from bahamas.catalogue import load_catalogue, catalogue_filenames
+
+
+class TestBahamasCatalogue(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(1)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.group_files = []
+        self.m500 = []
+        self.scop = []
+        self.scom = []
+        self.smass = []
+        self.fsid = []
+        self.nsub = []
+        first_subhalo = 0
+        for i in range(4):
+            n_groups = np.random.randint(5, 20)
+            nsub = np.random.randint(0, 4, n_groups)
+            fsid = first_subhalo + np.concatenate(([0], np.cumsum(nsub)[:-1]))
+            first_subhalo += nsub.sum()
+            m500 = 10 ** np.random.uniform(1., 5., n_groups)
+            scop = np.random.uniform(0., 400., (nsub.sum(), 3))
+            scom = np.random.uniform(0., 400., (nsub.sum(), 3))
+            smass = 10 ** np.random.uniform(-1., 3., nsub.sum())
+            file_name = os.path.join(self.tmpdir.name, f'eagle_subfind_tab_032.{i}.hdf5')
+            with h5.File(file_name, 'w') as f:
+                f.create_group('Header')
+                f['Header'].attrs['HubbleParam'] = 0.7
+                f['Header'].attrs['ExpansionFactor'] = 1.
+                f['Header'].attrs['Redshift'] = 0.
+                for dataset in ['GroupMass', 'Group_M_Crit2500', 'Group_R_Crit2500', 'Group_R_Crit500',
+                                'Group_M_Crit200', 'Group_R_Crit200']:
+                    f[f'FOF/{dataset}'] = np.ones(n_groups, dtype=np.float32)
+                f['FOF/Group_M_Crit500'] = m500.astype(np.float32)
+                f['FOF/GroupCentreOfPotential'] = np.random.uniform(0., 400., (n_groups, 3)).astype(np.float32)
+                f['FOF/NumOfSubhalos'] = nsub
+                f['FOF/FirstSubhaloID'] = fsid
+                f['Subhalo/CentreOfPotential'] = scop.astype(np.float32)
+                f['Subhalo/CentreOfMass'] = scom.astype(np.float32)
+                f['Subhalo/Mass'] = smass.astype(np.float32)
+            self.group_files.append(file_name)
+            self.m500.append(m500)
+            self.scop.append(scop)
+            self.scom.append(scom)
+            self.smass.append(smass)
+            self.fsid.append(fsid)
+            self.nsub.append(nsub)
+        self.files = [self.group_files, os.path.join(self.tmpdir.name, 'eagle_subfind_particles_032.0.hdf5')]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_mass_cut_and_subhalos(self):
+        m500_min = 10 ** 13.5
+        table, subhalos = load_catalogue(self.files, m500_min=m500_min, path=self.tmpdir.name)
+
+        # Same selection as the full catalogue with the cut applied afterwards
+        m500 = np.concatenate(self.m500) * 1.0e10 / 0.7
+        idx = np.where(m500 > m500_min)[0]
+        np.testing.assert_array_equal(table['idx'], idx)
+
+        all_subhalos = {
+                'COP' : np.concatenate(self.scop) / 0.7,
+                'COM' : np.concatenate(self.scom) / 0.7,
+                'Mass': np.concatenate(self.smass) * 1.0e10 / 0.7,
+        }
+        fsid = np.concatenate(self.fsid)[idx]
+        nsub = np.concatenate(self.nsub)[idx]
+        for i in range(len(table)):
+            start = table['SCOP_offset'][i]
+            for field, values in all_subhalos.items():
+                np.testing.assert_allclose(subhalos[field][start:start + table['NSUB'][i]],
+                                           values[fsid[i]:fsid[i] + nsub[i]], rtol=1e-6, err_msg=field)
+
+        # The saved catalogue is reused and memory-mapped
+        self.assertTrue(os.path.isfile(catalogue_filenames('032', m500_min, self.tmpdir.name)[0]))
+        table_mmap, subhalos_mmap = load_catalogue(self.files, m500_min=m500_min, path=self.tmpdir.name)
+        self.assertIsInstance(table_mmap, np.memmap)
+        np.testing.assert_array_equal(table_mmap, table)
+        np.testing.assert_array_equal(subhalos_mmap, subhalos)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.apertures import particle_moments, N_MOMENTS
+from import_toolkit.bootstrap import poisson_weights, bootstrap_enclosed_moments
+from rotvel_correlation.alignment import group_alignment, group_alignment_bootstrap
+from test_apertures import MockCluster
+
+
+class TestBootstrap(unittest.TestCase):
+
+    def test_poisson_weights(self):
+        weights = poisson_weights(np.random.default_rng(0), 50, 20000)
+        self.assertEqual(weights.shape, (50, 20000))
+        np.testing.assert_allclose([weights.mean(), weights.var()], [1., 1.], rtol=5e-3)
+        np.testing.assert_allclose(np.mean(weights == 0), np.exp(-1.), rtol=5e-3)
+
+    def test_replicas_are_weighted_sums(self):
+        np.random.seed(8)
+        n, n_replicas = 3000, 7
+        coords = np.random.normal(0., 1., (n, 3))
+        velocity = np.random.normal(0., 300., (n, 3))
+        mass = np.random.uniform(0.5, 1.5, n)
+        radius = np.linalg.norm(coords, axis=1)
+        apertures = np.array([1.5, 0.5, 2.5])
+
+        replicas = bootstrap_enclosed_moments(radius, mass, coords, velocity, apertures, n_replicas=n_replicas,
+                                              rng=np.random.default_rng(3), chunk_size=n)
+        # With a single chunk, the weights are drawn once for the particles in radial order
+        order = np.argsort(radius, kind='stable')
+        inside = order[:np.sum(radius < apertures.max())]
+        weights = poisson_weights(np.random.default_rng(3), n_replicas, len(inside))
+        rows = np.column_stack((particle_moments(mass[inside], coords[inside], velocity[inside]), np.ones(len(inside))))
+        for j, aperture_radius in enumerate(apertures):
+            selected = radius[inside] < aperture_radius
+            np.testing.assert_allclose(replicas[:, j], weights[:, selected] @ rows[selected], rtol=1e-10)
+
+        # The chunks draw different weights, but give replicas with the same statistics
+        chunked = bootstrap_enclosed_moments(radius, mass, coords, velocity, apertures, n_replicas=n_replicas,
+                                             rng=np.random.default_rng(3), chunk_size=250)
+        self.assertEqual(chunked.shape, (n_replicas, 3, N_MOMENTS + 1))
+        np.testing.assert_allclose(chunked[..., -1].mean(axis=0), [np.sum(radius < r) for r in apertures], rtol=0.1)
+
+    def test_alignment_percentiles(self):
+        cluster = MockCluster()
+        apertures = np.array([0.5, 1., 2.])
+        replicas = cluster.group_report_bootstrap(apertures, n_replicas=100, seed=1)
+        self.assertEqual(replicas['angular_momentum'].shape, (100, 3, 4, 3))
+        self.assertEqual(replicas['eigenvectors'].shape, (100, 3, 4, 9))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            reports = cluster.group_report_apertures(apertures)
+        eigenvectors = np.array([report['eigenvectors'] for report in reports]).reshape(3, 4, 3, 3)
+        dots = np.einsum('kaijx,aijx->kaij', replicas['eigenvectors'].reshape(100, 3, 4, 3, 3), eigenvectors)
+        self.assertTrue(np.all(dots >= 0))
+
+        uncertainties = group_alignment_bootstrap(replicas, percentiles=(16., 50., 84.))
+        nominal = group_alignment({key: np.array([report[key] for report in reports]) for key in replicas})
+        self.assertEqual(set(uncertainties.keys()), {f'{pair}_percentiles' for pair in nominal})
+        for pair, value in nominal.items():
+            percentiles = uncertainties[f'{pair}_percentiles']
+            self.assertEqual(percentiles.shape, (3, 3, 4, 4))
+            self.assertTrue(np.all(np.diff(percentiles, axis=1) >= 0))
+        # The well-resolved total L is tightly aligned with the spin axis (z) of the mock
+        np.testing.assert_allclose(uncertainties['c_l_percentiles'][2, 1, 0, 0], nominal['c_l'][2, 0, 0], atol=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
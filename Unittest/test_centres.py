@@ -0,0 +1,84 @@
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.centres import shrinking_sphere, most_bound_particle, centre_names
+from test_apertures import MockCluster
+
+
+def naive_shrinking_sphere(mass, coords, centre, radius, shrink_factor=0.975, min_particles=1000, min_fraction=0.01):
+    inside = np.linalg.norm(coords - centre, axis=1) < radius
+    n_min = max(min_particles, min_fraction * np.count_nonzero(inside))
+    while np.count_nonzero(inside) >= n_min:
+        centre = mass[inside] @ coords[inside] / np.sum(mass[inside])
+        radius *= shrink_factor
+        inside = np.linalg.norm(coords - centre, axis=1) < radius
+    return centre
+
+
+class TestCentres(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(11)
+        # A dense clump off-centre within a broader halo
+        self.clump = np.array([0.3, -0.2, 0.1])
+        self.coords = np.concatenate((np.random.normal(0., 1., (20000, 3)),
+                                      self.clump + np.random.normal(0., 0.05, (5000, 3))))
+        self.mass = np.random.uniform(0.5, 1.5, len(self.coords))
+
+    def test_shrinking_sphere(self):
+        centre, radius, iterations = shrinking_sphere(self.mass, self.coords, np.zeros(3), 2.)
+        self.assertGreater(iterations, 0)
+        np.testing.assert_allclose(centre, self.clump, atol=0.01)
+        np.testing.assert_allclose(centre, naive_shrinking_sphere(self.mass, self.coords, np.zeros(3), 2.),
+                                   rtol=1e-10, atol=1e-12)
+        self.assertGreaterEqual(np.count_nonzero(np.linalg.norm(self.coords - centre, axis=1) < radius), 1)
+        with self.assertRaises(ValueError):
+            shrinking_sphere(self.mass, self.coords, np.zeros(3), 2., shrink_factor=1.)
+
+    def test_most_bound_particle(self):
+        mass, coords = self.mass[::10], self.coords[::10]
+        targets = np.arange(0, len(mass), 3)
+        index = most_bound_particle(mass, coords, targets, theta=0.3, softening=0.01)
+        separation = np.sqrt(np.sum((coords[targets, None] - coords[None, :]) ** 2, axis=-1) ** 2 + 0.01 ** 2)
+        potential = np.sum(mass[None, :] / separation, axis=1) - mass[targets] / 0.01
+        self.assertEqual(index, targets[np.argmax(potential)])
+
+    def test_report_centres(self):
+        cluster = MockCluster()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            centres = cluster.group_centres()
+        self.assertEqual(tuple(centres.keys()), centre_names)
+        np.testing.assert_array_equal(centres['cop'], cluster.centre_of_potential)
+        with self.assertRaises(ValueError):
+            cluster.group_centres(['median'])
+
+        # The report about each centre matches the report of a cluster centred there
+        apertures = np.array([0.8, 2.])
+        offset = cluster.centre_of_potential + np.array([0.2, -0.1, 0.05])
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            reports = cluster.group_report_centres({'cop': cluster.centre_of_potential, 'offset': offset,
+                                                    'com': centres['com']}, apertures)
+            self.assertEqual(reports[0]['angular_momentum'].shape, (3, 4, 3))
+            np.testing.assert_array_equal(reports[0]['centres'], ['cop', 'offset', 'com'])
+            for c, centre in enumerate([cluster.centre_of_potential, offset, centres['com']]):
+                shifted = MockCluster()
+                shifted.centre_of_potential = centre
+                expected = shifted.group_report_apertures(apertures)
+                for i in range(len(apertures)):
+                    for key, value in expected[i].items():
+                        np.testing.assert_allclose(reports[i][key][c], value, rtol=1e-8, atol=1e-10, err_msg=key)
+
+        np.testing.assert_array_equal(cluster.particle_radial_order('1', offset),
+                                      np.argsort(cluster.particle_radii('1', offset), kind='stable'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from import_toolkit.geometry import periodic_recentre, radial_distance, periodic_box_mask, pairwise_angles, vector_angles
+from import_toolkit._cluster_profiler import Mixin
+
+
+class TestGeometry(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.boxsize = 100.
+        self.centre = np.array([99., 1., 50.])
+        self.coords = np.random.uniform(0., self.boxsize, (10000, 3))
+
+    def test_periodic_recentre(self):
+        coords = self.coords.copy()
+        periodic_recentre(coords, self.centre, self.boxsize, chunk_size=777)
+        offset = coords - self.centre
+        self.assertTrue(np.all(np.abs(offset) <= self.boxsize / 2))
+        # Shifted by whole box lengths only
+        shift = (coords - self.coords) / self.boxsize
+        np.testing.assert_allclose(shift, np.rint(shift), atol=1e-10)
+
+    def test_radial_distance(self):
+        wrapped = periodic_recentre(self.coords.copy(), self.centre, self.boxsize)
+        expected = np.linalg.norm(wrapped - self.centre, axis=1)
+        np.testing.assert_allclose(radial_distance(wrapped, self.centre, chunk_size=333), expected)
+        np.testing.assert_allclose(radial_distance(self.coords, self.centre, boxsize=self.boxsize), expected)
+
+    def test_periodic_box_mask(self):
+        wrapped = periodic_recentre(self.coords.copy(), self.centre, self.boxsize)
+        expected = np.all(np.abs(wrapped - self.centre) < 10., axis=1)
+        mask = periodic_box_mask(self.coords, self.centre, 10., boxsize=self.boxsize, chunk_size=500)
+        np.testing.assert_array_equal(mask, expected)
+        self.assertGreater(mask.sum(), 0)
+
+    def test_pairwise_angles(self):
+        vectors1 = np.random.normal(0., 1., (7, 4, 3))
+        vectors2 = np.random.normal(0., 1., (7, 5, 3))
+        angles = pairwise_angles(vectors1, vectors2)
+        cosines = pairwise_angles(vectors1, vectors2, cosine=True)
+        self.assertEqual(angles.shape, (7, 4, 5))
+        for k, i, j in np.ndindex(angles.shape):
+            expected = Mixin.angle_between_vectors(vectors1[k, i], vectors2[k, j])
+            self.assertAlmostEqual(cosines[k, i, j], expected, places=12)
+            self.assertAlmostEqual(angles[k, i, j], np.degrees(np.arccos(expected)), places=8)
+
+    def test_vector_angles_edge_cases(self):
+        vectors = np.array([[1., 2., 3.], [1., 2., 3.], [1., 0., 0.], [0., 0., 0.]])
+        others = np.array([[2., 4., 6.], [-1., -2., -3.], [0., 1e-9, 0.], [1., 0., 0.]])
+        angles = vector_angles(vectors, others)
+        np.testing.assert_allclose(angles[:3], [0., 180., 90.], atol=1e-10)
+        self.assertTrue(np.isnan(angles[3]))
+        np.testing.assert_allclose(vector_angles(vectors, others, cosine=True)[:3], [1., -1., 0.], atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
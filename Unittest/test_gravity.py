@@ -0,0 +1,120 @@
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit import gravity, kernels
+from test_apertures import MockCluster
+
+
+class TestGravity(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(6)
+        n = 3000
+        self.coords = np.random.normal(0., 1., (n, 3)) * np.array([1., 0.7, 0.4])
+        self.mass = np.random.uniform(0.5, 1.5, n)
+        self.labels = np.random.randint(0, 3, n)
+        self.radius = np.linalg.norm(self.coords, axis=1)
+
+    def test_octree(self):
+        tree = gravity.Octree(self.coords, leaf_size=8)
+        np.testing.assert_array_equal(np.sort(tree.order), np.arange(len(self.coords)))
+        leaves = tree.child_count == 0
+        self.assertTrue(np.all(tree.end[leaves] - tree.start[leaves] <= 8))
+        # The leaves partition the particles, and each node contains its particles
+        self.assertEqual(np.sum(tree.end[leaves] - tree.start[leaves]), len(self.coords))
+        for node in np.random.choice(len(tree), 50, replace=False):
+            x = tree.coords[tree.start[node]:tree.end[node]]
+            self.assertTrue(np.all(np.abs(x - tree.centre[node]) <= 0.5 * tree.size[node] * (1 + 1e-9)))
+
+        # Monopoles summed from the leaves up match the direct sums over each node
+        mass = self.mass[tree.order]
+        group = self.labels[tree.order] - 1
+        particles = np.arange(0, len(mass), 2)
+        monopoles = tree.node_monopoles(mass, group, 2, particles=particles)
+        added = np.zeros(len(mass), dtype=bool)
+        added[particles] = True
+        for node in np.random.choice(len(tree), 50, replace=False):
+            for g in range(2):
+                member = (group == g) & added
+                member[:tree.start[node]] = False
+                member[tree.end[node]:] = False
+                np.testing.assert_allclose(monopoles[node, g], [np.sum(mass[member]), *(mass[member] @ tree.coords[member])],
+                                           rtol=1e-10, atol=1e-12)
+
+    def test_apertures_match_direct_sum(self):
+        apertures = np.array([1.5, 0.5, 3.])
+        pairs = gravity.aperture_pair_energies(self.radius, self.mass, self.coords, self.labels, apertures,
+                                               n_labels=3, theta=0.3)
+        energy = gravity.potential_energy_from_pairs(pairs)
+        for aperture_radius, aperture_energy in zip(apertures, energy):
+            inside = self.radius < aperture_radius
+            direct = gravity.direct_potential_energy(self.mass[inside], self.coords[inside])
+            np.testing.assert_allclose(aperture_energy[0], direct, rtol=1e-4)
+            np.testing.assert_allclose(np.sum(aperture_energy[1:]), aperture_energy[0], rtol=1e-12)
+            # Energy of one type: its self-energy plus half of its interaction energy with the others
+            a = inside & (self.labels == 0)
+            b = inside & (self.labels != 0)
+            cross = direct - gravity.direct_potential_energy(self.mass[a], self.coords[a]) - \
+                    gravity.direct_potential_energy(self.mass[b], self.coords[b])
+            np.testing.assert_allclose(aperture_energy[1],
+                                       gravity.direct_potential_energy(self.mass[a], self.coords[a]) + 0.5 * cross,
+                                       rtol=1e-4)
+
+    def test_numpy_walk_matches_compiled(self):
+        if not kernels.NUMBA_AVAILABLE:
+            self.skipTest("numba is not installed")
+        expected = gravity.aperture_pair_energies(self.radius, self.mass, self.coords, self.labels, [0.8, 2.],
+                                                  softening=0.01)
+        kernels.NUMBA_AVAILABLE = False
+        try:
+            pairs = gravity.aperture_pair_energies(self.radius, self.mass, self.coords, self.labels, [0.8, 2.],
+                                                   softening=0.01)
+        finally:
+            kernels.NUMBA_AVAILABLE = True
+        np.testing.assert_allclose(pairs, expected, rtol=1e-10)
+
+    def test_accuracy(self):
+        self.assertLess(gravity.tree_accuracy(self.mass, self.coords, n_sample=1000, theta=0.5, seed=0), 1e-3)
+        self.assertLess(gravity.tree_accuracy(self.mass, self.coords, n_sample=1000, theta=0.2, seed=0), 1e-5)
+        with self.assertRaises(ValueError):
+            gravity.tree_accuracy(self.mass, self.coords, theta=1.2)
+
+    def test_group_dynamics(self):
+        cluster = MockCluster()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            dynamics = cluster.group_dynamics(aperture_radius=1.2)
+        potential_energy = cluster.group_potential_energy([0.5, 1.2])
+        # The grid of apertures walks the tree differently: equal within the accuracy of the tree
+        np.testing.assert_allclose(dynamics['potential_energy'], potential_energy[1], rtol=1e-3)
+        np.testing.assert_allclose(dynamics['virial_ratio'],
+                                   2 * dynamics['kinetic_energy'] / np.abs(dynamics['potential_energy']), rtol=1e-12)
+        self.assertTrue(np.all(potential_energy < 0))
+        self.assertTrue(np.all(np.abs(potential_energy[0]) < np.abs(potential_energy[1])))
+        self.assertLess(cluster.group_potential_energy_accuracy(aperture_radius=1.2, n_sample=1000), 1e-3)
+
+        # The grid reports carry the potential energy, which group_dynamics then reads back
+        cluster = MockCluster()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertNotIn('potential_energy', cluster.group_report_apertures([0.5, 1.2])[0])
+            reports = cluster.group_report_apertures([0.5, 1.2], potential_energy=True)
+            calls = []
+            group_potential_energy = cluster.group_potential_energy
+            cluster.group_potential_energy = lambda *args, **kwargs: calls.append(args) or group_potential_energy(*args, **kwargs)
+            dynamics = cluster.group_dynamics(aperture_radius=1.2)
+        self.assertEqual(calls, [])
+        np.testing.assert_array_equal(reports[1]['potential_energy'], dynamics['potential_energy'])
+        np.testing.assert_allclose(reports[0]['potential_energy'], potential_energy[0], rtol=1e-12)
+        np.testing.assert_allclose(reports[0]['virial_ratio'],
+                                   2 * reports[0]['kinetic_energy'] / np.abs(reports[0]['potential_energy']), rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+import numpy as np
+import h5py as h5
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from import_toolkit._cluster_retriever import read_header_attributes, invalidate_header_cache
+
+
+class TestHeaderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'eagle_subfind_particles_029.0.hdf5')
+        with h5.File(self.path, 'w') as f:
+            f.create_group('Header')
+            f['Header'].attrs['HubbleParam'] = 0.6777
+            f['Header'].attrs['MassTable'] = np.array([0., 0.097, 0., 0., 0., 0.])
+            f.create_group('Units')
+            f['Units'].attrs['UnitLength_in_cm'] = 3.08568e24
+
+    def tearDown(self):
+        invalidate_header_cache()
+        self.tmpdir.cleanup()
+
+    def test_header_is_read_once(self):
+        header = read_header_attributes(self.path)
+        self.assertAlmostEqual(header['HubbleParam'], 0.6777)
+        self.assertAlmostEqual(header['MassTable'][1], 0.097)
+
+        # Served from the cache: same dictionary object
+        self.assertIs(read_header_attributes(self.path), header)
+
+        # Other groups are cached independently
+        units = read_header_attributes(self.path, 'Units')
+        self.assertAlmostEqual(units['UnitLength_in_cm'], 3.08568e24)
+        self.assertEqual(read_header_attributes(self.path, 'Constants'), {})
+
+    def test_cache_invalidation(self):
+        header = read_header_attributes(self.path)
+
+        # Explicit invalidation forces a new read
+        invalidate_header_cache(self.path)
+        self.assertIsNot(read_header_attributes(self.path), header)
+
+        # Rewriting the file changes the mtime and refreshes the entry
+        time.sleep(0.01)
+        with h5.File(self.path, 'a') as f:
+            f['Header'].attrs['HubbleParam'] = 0.704
+        os.utime(self.path, (time.time() + 10, time.time() + 10))
+        self.assertAlmostEqual(read_header_attributes(self.path)['HubbleParam'], 0.704)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.jackknife import jackknife_blocks, jackknife_error
+from import_toolkit.apertures import accumulate_moments, stack_moments, bulk_quantities_from_moments
+from test_apertures import MockCluster
+
+
+class TestJackknife(unittest.TestCase):
+
+    def test_blocks(self):
+        np.random.seed(9)
+        coords = np.random.normal(0., 1., (5000, 3)) + 10.
+        blocks = jackknife_blocks(coords, n_blocks=8, centre=np.full(3, 10.))
+        np.testing.assert_array_equal(np.unique(blocks), np.arange(8))
+        np.testing.assert_allclose(np.bincount(blocks) / len(blocks), 1 / 8, atol=0.02)
+        random_blocks = jackknife_blocks(coords, n_blocks=8, method='random', rng=np.random.default_rng(0))
+        self.assertTrue(np.all((random_blocks >= 0) & (random_blocks < 8)))
+        with self.assertRaises(ValueError):
+            jackknife_blocks(coords, method='radial')
+
+    def test_error_of_the_mean(self):
+        # For the mean, the jackknife error is the standard error
+        values = np.random.normal(size=40)
+        estimates = (values.sum() - values) / (len(values) - 1)
+        np.testing.assert_allclose(jackknife_error(estimates), np.std(values, ddof=1) / np.sqrt(len(values)))
+
+    def test_matches_leave_one_out(self):
+        cluster = MockCluster()
+        apertures = np.array([1.5, 0.5, 3.])
+        n_blocks = 6
+        errors = cluster.group_bulk_quantities_jackknife(apertures, n_blocks=n_blocks)
+        self.assertEqual(errors['angular_momentum_err'].shape, (3, 4, 3))
+
+        blocks = {pt: jackknife_blocks(getattr(cluster, f'partType{pt}_coordinates'), n_blocks=n_blocks,
+                                       centre=cluster.centre_of_potential) for pt in ['0', '1', '4']}
+        for i, aperture_radius in enumerate(apertures):
+            samples = []
+            for left_out in range(n_blocks):
+                moments = []
+                for pt in ['0', '1', '4']:
+                    keep = (cluster.particle_radii(pt) < aperture_radius) & (blocks[pt] != left_out)
+                    moments.append(accumulate_moments(*[getattr(cluster, f'partType{pt}_{field}')[keep]
+                                                        for field in ['mass', 'coordinates', 'velocity']],
+                                                      centre=cluster.centre_of_potential)[None, :])
+                samples.append(bulk_quantities_from_moments(stack_moments(moments)[0], cluster.centre_of_potential))
+            for key in samples[0]:
+                expected = jackknife_error(np.array([sample[key] for sample in samples]))
+                np.testing.assert_allclose(errors[f'{key}_err'][i], expected, rtol=1e-6, atol=1e-12, err_msg=key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from import_toolkit import kernels
+from import_toolkit.apertures import particle_moments, accumulate_moments
+from import_toolkit._cluster_profiler import Mixin as ProfilerMixin
+
+
+class TestKernels(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(2)
+        n = 120000
+        self.mass = np.random.uniform(0.1, 1., n).astype(np.float32)
+        self.coords = np.random.normal(0., 1., (n, 3))
+        self.velocity = np.random.normal(0., 500., (n, 3)).astype(np.float32)
+        self.temperature = 10 ** np.random.uniform(5., 8., n)
+        self.subgroupnumber = np.random.randint(0, 3, n)
+
+    def reductions(self):
+        return [
+                (ProfilerMixin.centre_of_mass(self.mass, self.coords), 1e-5, 1e-8),
+                (ProfilerMixin.zero_momentum_frame(self.mass, self.velocity), 1e-4, 1e-3),
+                (ProfilerMixin.angular_momentum(self.mass, self.coords, self.velocity), 1e-5, 0.),
+                (ProfilerMixin.inertia_tensor(self.mass, self.coords), 1e-5, 1e-3),
+                (ProfilerMixin.kinetic_energy(self.mass, self.velocity), 1e-5, 0.),
+        ]
+
+    def test_reductions_match_profiler(self):
+        # The profiler dispatches to the compiled kernels: compare with its NumPy fallback
+        compiled = self.reductions()
+        numba_available = kernels.NUMBA_AVAILABLE
+        kernels.NUMBA_AVAILABLE = False
+        try:
+            numpy_version = self.reductions()
+        finally:
+            kernels.NUMBA_AVAILABLE = numba_available
+        for (value, rtol, atol), (expected, _, _) in zip(compiled, numpy_version):
+            np.testing.assert_allclose(value, expected, rtol=rtol, atol=atol)
+        if kernels.NUMBA_AVAILABLE:
+            np.testing.assert_array_equal(compiled[0][0], kernels.centre_of_mass(self.mass, self.coords))
+
+    def test_accumulate_moments(self):
+        centre = np.array([0.1, -0.2, 0.3])
+        expected = particle_moments(self.mass, self.coords, self.velocity, temperature=self.temperature,
+                                    subgroupnumber=self.subgroupnumber, centre=centre).sum(axis=0)
+        total = accumulate_moments(self.mass, self.coords, self.velocity, temperature=self.temperature,
+                                   subgroupnumber=self.subgroupnumber, centre=centre, chunk_size=7000)
+        self.assertEqual(total[-1], len(self.mass))
+        np.testing.assert_allclose(total[:-1], expected, rtol=1e-8, atol=1e-6)
+
+    @unittest.skipUnless(kernels.NUMBA_AVAILABLE, "numba is not installed")
+    def test_moment_sums_without_optional_fields(self):
+        expected = particle_moments(self.mass, self.coords, self.velocity).sum(axis=0)
+        np.testing.assert_allclose(kernels.moment_sums(self.mass, self.coords, self.velocity), expected,
+                                   rtol=1e-8, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
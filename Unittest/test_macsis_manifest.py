@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from macsis import manifest
+
+
+def make_file(path: str) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'0')
+    return path
+
+
+class TestMacsisManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmpdir.name, 'macsis_gas')
+        self.manifest_file = os.path.join(self.tmpdir.name, 'work', 'macsis_manifest.npz')
+        # All halos have both files at z = 0, halo_0002 has no particle data at z = 0.24
+        for halo in ['halo_0000', 'halo_0001', 'halo_0002']:
+            for sn in ['022', '019']:
+                make_file(os.path.join(self.root, halo, 'data', f'groups_{sn}', f'eagle_subfind_tab_{sn}.0.hdf5'))
+                make_file(os.path.join(self.root, halo, 'data', f'groups_{sn}', f'eagle_subfind_tab_{sn}.1.hdf5'))
+                if halo != 'halo_0002' or sn == '022':
+                    make_file(os.path.join(self.root, halo, 'data', f'particledata_{sn}',
+                                           f'eagle_subfind_particles_{sn}.0.hdf5'))
+        os.makedirs(os.path.join(self.root, 'other'))
+        manifest._manifest.clear()
+        self.scanned = []
+        self._scan_halo = manifest._scan_halo
+
+        def counting_scan_halo(path, halo):
+            self.scanned.append(halo)
+            return self._scan_halo(path, halo)
+
+        manifest._scan_halo = counting_scan_halo
+
+    def tearDown(self):
+        manifest._scan_halo = self._scan_halo
+        manifest._manifest.clear()
+        self.tmpdir.cleanup()
+
+    def test_build_and_load(self):
+        built = manifest.build_manifest(self.root, self.manifest_file)
+        self.assertTrue(os.path.isfile(self.manifest_file))
+        np.testing.assert_array_equal(built['halos'], ['halo_0000', 'halo_0001', 'halo_0002'])
+        self.assertEqual(built['files'].shape, (3, len(manifest.z_IDNumber), 2))
+        self.assertEqual(built['files'][1, manifest.z_IDNumber.index('022'), manifest.GROUP],
+                         os.path.join('halo_0001', 'data', 'groups_022', 'eagle_subfind_tab_022.0.hdf5'))
+        self.assertEqual(built['files'][2, manifest.z_IDNumber.index('019'), manifest.PARTICLE], '')
+        self.assertEqual(self.scanned, ['halo_0000', 'halo_0001', 'halo_0002'])
+
+        # Read back from file, without scanning the tree
+        manifest._manifest.clear()
+        self.scanned.clear()
+        loaded = manifest.load_manifest(self.root, self.manifest_file)
+        self.assertEqual(self.scanned, [])
+        self.assertEqual(loaded['root'], self.root)
+        np.testing.assert_array_equal(loaded['files'], built['files'])
+
+        # A manifest of another tree is rebuilt
+        manifest._manifest.clear()
+        other = os.path.join(self.tmpdir.name, 'other_gas')
+        os.makedirs(other)
+        self.assertEqual(len(manifest.load_manifest(other, self.manifest_file)['halos']), 0)
+
+    def test_find_files(self):
+        files = manifest.find_files('z000p000', self.root, self.manifest_file)
+        self.assertEqual(len(files), 3)
+        self.assertEqual(files[2], [
+                os.path.join(self.root, 'halo_0002', 'data', 'groups_022', 'eagle_subfind_tab_022.0.hdf5'),
+                os.path.join(self.root, 'halo_0002', 'data', 'particledata_022', 'eagle_subfind_particles_022.0.hdf5')
+        ])
+        self.assertTrue(all(os.path.isfile(x) for pair in files for x in pair))
+        self.scanned.clear()
+        with self.assertRaises(FileNotFoundError):
+            manifest.find_files('z000p240', self.root, self.manifest_file)
+        self.assertEqual(self.scanned, [])
+
+    def test_verify_file(self):
+        files = manifest.find_files('z000p000', self.root, self.manifest_file)
+        self.scanned.clear()
+        self.assertEqual(manifest.verify_file(files[0][0], self.manifest_file), files[0][0])
+        self.assertEqual(self.scanned, [])
+
+        # The first group file of halo_0001 is removed: only that halo is rescanned
+        os.remove(files[1][0])
+        fresh = manifest.verify_file(files[1][0], self.manifest_file)
+        self.assertEqual(fresh, os.path.join(self.root, 'halo_0001', 'data', 'groups_022',
+                                             'eagle_subfind_tab_022.1.hdf5'))
+        self.assertEqual(self.scanned, ['halo_0001'])
+        self.assertEqual(manifest.find_files('z000p000', self.root, self.manifest_file)[1][0], fresh)
+
+        # The manifest file is updated too
+        manifest._manifest.clear()
+        self.assertEqual(manifest.find_files('z000p000', self.root, self.manifest_file)[1][0], fresh)
+
+        os.remove(fresh)
+        with self.assertRaises(FileNotFoundError):
+            manifest.verify_file(fresh, self.manifest_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
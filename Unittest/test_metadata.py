@@ -0,0 +1,121 @@
+import io
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+
+from import_toolkit import metadata
+from import_toolkit.simulation import Simulation
+
+
+class MockZoomSimulation:
+
+    simulation_name = 'macsis'
+    setup = 'zoom'
+    cluster_prefix = 'halo_'
+    clusterIDAllowed = np.arange(3)
+    zcat = {'z_value': ['z000p000', 'z000p240'], 'z_IDNumber': ['022', '019']}
+    redshiftAllowed = zcat['z_value']
+
+    def __init__(self, pathData: str):
+        self.pathData = pathData
+
+    def halo_Num(self, n: int) -> str:
+        return f'{n:04d}'
+
+
+def make_files(path: str, prefix: str, sizes: list) -> None:
+    os.makedirs(path, exist_ok=True)
+    for i, size in enumerate(sizes):
+        with open(os.path.join(path, f'{prefix}{i}.hdf5'), 'wb') as f:
+            f.write(b'0' * size)
+
+
+class TestCompletenessScan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.scanned = []
+        self._scan_subject = metadata._scan_subject
+
+        def counting_scan_subject(path, prefix):
+            self.scanned.append(path)
+            return self._scan_subject(path, prefix)
+
+        metadata._scan_subject = counting_scan_subject
+
+    def tearDown(self):
+        metadata._scan_subject = self._scan_subject
+        self.tmpdir.cleanup()
+
+    def test_zoom_scan_and_rescan(self):
+        simulation = MockZoomSimulation(self.tmpdir.name)
+        # Halo 0 complete at both redshifts, halo 1 only at z = 0 with groups, halo 2 missing
+        for redshift_index in ['022', '019']:
+            data = os.path.join(self.tmpdir.name, 'halo_0000', 'data')
+            make_files(os.path.join(data, f'groups_{redshift_index}'), 'eagle_subfind_tab_', [10, 20])
+            make_files(os.path.join(data, f'particledata_{redshift_index}'), 'eagle_subfind_particles_', [5])
+        make_files(os.path.join(self.tmpdir.name, 'halo_0001', 'data', 'groups_022'), 'eagle_subfind_tab_', [7])
+
+        scan = metadata.scan_completeness(simulation, max_workers=2)
+        self.assertEqual(scan['completeness'].shape, (3, 2))
+        np.testing.assert_array_equal(scan['completeness'], [[True, True], [False, False], [False, False]])
+        np.testing.assert_array_equal(scan['file_counts'][0], [[2, 1], [2, 1]])
+        np.testing.assert_array_equal(scan['file_sizes'][0], [[30, 5], [30, 5]])
+        np.testing.assert_array_equal(scan['file_counts'][1], [[1, 0], [0, 0]])
+        self.assertEqual(len(self.scanned), 5)
+
+        # Only the subject directory with a new mtime is listed again
+        particledata = os.path.join(self.tmpdir.name, 'halo_0001', 'data', 'particledata_022')
+        make_files(particledata, 'eagle_subfind_particles_', [3, 4])
+        groups = os.path.join(self.tmpdir.name, 'halo_0000', 'data', 'groups_022')
+        make_files(groups, 'eagle_subfind_tab_', [10, 20, 30])
+        os.utime(groups, (scan['mtimes'][0, 0, 0] + 10, scan['mtimes'][0, 0, 0] + 10))
+        self.scanned.clear()
+        rescan = metadata.scan_completeness(simulation, previous=scan, max_workers=2)
+        self.assertEqual(sorted(self.scanned), sorted([particledata, groups]))
+        np.testing.assert_array_equal(rescan['completeness'], [[True, True], [True, False], [False, False]])
+        np.testing.assert_array_equal(rescan['file_counts'][0], [[3, 1], [2, 1]])
+        np.testing.assert_array_equal(rescan['file_sizes'][1], [[7, 7], [0, 0]])
+
+    def test_check_dirs_prints_halo_ids(self):
+        simulation = MockZoomSimulation(self.tmpdir.name)
+        simulation.clusterIDAllowed = np.array([5, 7])
+        for redshift_index in ['022', '019']:
+            data = os.path.join(self.tmpdir.name, 'halo_0005', 'data')
+            make_files(os.path.join(data, f'groups_{redshift_index}'), 'eagle_subfind_tab_', [1])
+            make_files(os.path.join(data, f'particledata_{redshift_index}'), 'eagle_subfind_particles_', [1])
+        output = io.StringIO()
+        with redirect_stdout(output):
+            check_matrix = metadata.check_dirs(simulation)
+        np.testing.assert_array_equal(check_matrix, [[True, True], [False, False]])
+        self.assertEqual(output.getvalue().splitlines(), ['7 z000p000', '7 z000p240'])
+
+    def test_volume_scanned_once(self):
+        simulation = Simulation(simulation_name='bahamas')
+        simulation.set_pathData(self.tmpdir.name)
+        simulation.clusterIDAllowed = np.arange(2000)
+        make_files(os.path.join(self.tmpdir.name, 'groups_032'), 'eagle_subfind_tab_', [8, 8, 8])
+        make_files(os.path.join(self.tmpdir.name, 'particledata_032'), 'eagle_subfind_particles_', [16])
+        make_files(os.path.join(self.tmpdir.name, 'groups_031'), 'eagle_subfind_tab_', [8])
+
+        scan = metadata.scan_completeness(simulation)
+        self.assertEqual(len(self.scanned), 3)
+        self.assertEqual(scan['completeness'].shape, (2000, len(simulation.redshiftAllowed)))
+        z_index = simulation.redshiftAllowed.index('z000p000')
+        self.assertTrue(np.all(scan['completeness'][:, z_index]))
+        self.assertEqual(np.count_nonzero(scan['completeness'][0]), 1)
+        np.testing.assert_array_equal(scan['file_sizes'][1999, z_index], [24, 16])
+
+        self.scanned.clear()
+        rescan = metadata.scan_completeness(simulation, previous=scan)
+        self.assertEqual(self.scanned, [])
+        np.testing.assert_array_equal(rescan['file_counts'], scan['file_counts'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import h5py
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.phase_table import PhaseTable
+from import_toolkit.apertures import _M, _MV, _MT, accumulate_moments, thermal_energy_factor
+from test_apertures import MockCluster
+
+
+class TestPhaseTable(unittest.TestCase):
+
+    def setUp(self):
+        self.cluster = MockCluster()
+        self.radius = self.cluster.particle_radii('0')
+        self.radius_edges = np.array([0.3, 0.5, 1., 1.5, 3.])
+        self.temperature_edges = np.logspace(6, 8, 9)
+        self.table = self.cluster.group_phase_table(self.radius_edges, self.temperature_edges)
+
+    def direct(self, aperture_radius, t_min=None, t_max=None):
+        c = self.cluster
+        keep = self.radius < aperture_radius
+        if t_min is not None: keep &= c.partType0_temperature > t_min
+        if t_max is not None: keep &= c.partType0_temperature <= t_max
+        return accumulate_moments(c.partType0_mass[keep], c.partType0_coordinates[keep], c.partType0_velocity[keep],
+                                  temperature=c.partType0_temperature[keep], centre=c.centre_of_potential)
+
+    def test_exact_on_edges(self):
+        t_cuts = [None] + list(self.temperature_edges)
+        for aperture_radius in self.radius_edges:
+            for t_min in t_cuts:
+                np.testing.assert_allclose(self.table.enclosed(aperture_radius, t_min=t_min),
+                                           self.direct(aperture_radius, t_min=t_min), rtol=1e-9, atol=1e-12)
+        # Temperature band between two edges
+        t_min, t_max = self.temperature_edges[2], self.temperature_edges[5]
+        band = self.table.quantities(1.5, t_min=t_min, t_max=t_max)
+        expected = self.direct(1.5, t_min=t_min, t_max=t_max)
+        np.testing.assert_allclose(band['mass'], expected[_M], rtol=1e-9)
+        np.testing.assert_allclose(band['momentum'], expected[_MV], rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(band['thermal_energy'], expected[_MT] * thermal_energy_factor, rtol=1e-9)
+        keep = (self.radius < 1.5) & (self.cluster.partType0_temperature > t_min) & \
+               (self.cluster.partType0_temperature <= t_max)
+        self.assertEqual(band['N_particles'], np.count_nonzero(keep))
+
+    def test_interpolation(self):
+        # Vectorised over the apertures, and bracketed by the neighbouring edges
+        apertures = np.array([0.7, 1.2, 2.])
+        mass = self.table.quantities(apertures, t_min=2e6)['mass']
+        self.assertEqual(mass.shape, (3,))
+        lower = [self.direct(r, t_min=self.temperature_edges[2])[_M] for r in [0.5, 1., 1.5]]
+        upper = [self.direct(r, t_min=self.temperature_edges[1])[_M] for r in [1., 1.5, 3.]]
+        self.assertTrue(np.all(mass >= lower) & np.all(mass <= upper))
+
+    def test_hdf5_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'phase_table.hdf5')
+            with h5py.File(filename, 'w') as f:
+                for path, value in self.table.to_dict().items():
+                    f.create_dataset(path, data=value)
+            table = PhaseTable.from_hdf5(filename)
+        np.testing.assert_array_equal(table.table, self.table.table)
+        np.testing.assert_array_equal(table.radius_edges, self.radius_edges)
+        np.testing.assert_array_equal(table.temperature_edges, self.temperature_edges)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.profiles import RadialProfiles, profile_bins
+from test_apertures import MockCluster
+
+
+class TestProfiles(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(3)
+        self.radius = np.random.exponential(1., 20000)
+        self.values = np.random.normal(5., 2., 20000)
+        self.weights = np.random.uniform(0.5, 2., 20000)
+        # Includes empty bins at the outer end
+        self.bin_edges = np.concatenate((profile_bins(0.05, 8., 20), [50., 60.]))
+
+    def test_binned_sums(self):
+        binning = RadialProfiles(self.radius, self.bin_edges)
+        bin_index = np.digitize(self.radius, self.bin_edges) - 1
+        expected = np.array([self.weights[bin_index == i].sum() for i in range(len(binning))])
+        np.testing.assert_allclose(binning.bin_sum(self.weights), expected)
+        np.testing.assert_array_equal(binning.counts, np.bincount(bin_index[(bin_index >= 0) & (bin_index < len(binning))],
+                                                                   minlength=len(binning)))
+        cumulative = np.array([self.weights[self.radius < edge].sum() for edge in self.bin_edges[1:]])
+        np.testing.assert_allclose(binning.cumulative(self.weights), cumulative)
+
+    def test_weighted_profiles(self):
+        binning = RadialProfiles(self.radius, self.bin_edges)
+        profiles = binning.weighted_profiles({'field': self.values}, weights=self.weights)
+        bin_index = np.digitize(self.radius, self.bin_edges) - 1
+        for i in range(len(binning)):
+            in_bin = bin_index == i
+            if not in_bin.any():
+                self.assertTrue(np.isnan(profiles['field'][i]))
+                continue
+            mean = np.average(self.values[in_bin], weights=self.weights[in_bin])
+            dispersion = np.sqrt(np.average((self.values[in_bin] - mean) ** 2, weights=self.weights[in_bin]))
+            self.assertAlmostEqual(profiles['field'][i], mean, places=8)
+            self.assertAlmostEqual(profiles['field_dispersion'][i], dispersion, places=6)
+
+    def test_cluster_profiles(self):
+        cluster = MockCluster()
+        cluster.partType0_sphdensity = np.random.uniform(1., 10., len(cluster.partType0_mass))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            cop = cluster.radial_profiles('0', bins=10, aperture_radius=1.)
+            derotated = cluster.radial_profiles('0', bins=10, frame='derotated', align='0', aperture_radius=1.)
+            emission = cluster.radial_profiles('0', bins=10, weighting='emission', aperture_radius=1.)
+
+        # Rotations do not change the radial or scalar profiles
+        for key in ['mass', 'density', 'radial_velocity', 'velocity_dispersion', 'temperature', 'entropy']:
+            np.testing.assert_allclose(derotated[key], cop[key], rtol=1e-8, err_msg=key)
+        np.testing.assert_allclose(cop['cumulative_mass'][-1],
+                                   cluster.partType0_mass[cluster.particle_radii('0') < 2.].sum())
+        np.testing.assert_allclose(emission['mass'], cop['mass'])
+        self.assertFalse(np.allclose(emission['temperature'], cop['temperature']))
+
+
+if __name__ == '__main__':
+    unittest.main()
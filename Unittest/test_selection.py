@@ -0,0 +1,152 @@
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.selection import Selection
+from import_toolkit import apertures as _apertures
+from import_toolkit import kernels
+from import_toolkit._cluster_profiler import Mixin as ProfilerMixin
+from test_apertures import MockCluster
+
+
+class TestSelection(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(4)
+        self.n = 2500
+        self.a = np.random.uniform(size=self.n) < 0.3
+        self.b = np.random.uniform(size=self.n) < 0.6
+
+    def test_algebra(self):
+        representations = [
+                lambda mask: Selection.from_mask(mask),
+                lambda mask: Selection.from_index(np.flatnonzero(mask), len(mask)),
+        ]
+        for make_a in representations:
+            for make_b in representations:
+                a, b = make_a(self.a), make_b(self.b)
+                np.testing.assert_array_equal((a & b).index, np.flatnonzero(self.a & self.b))
+                np.testing.assert_array_equal((a | b).mask, self.a | self.b)
+                np.testing.assert_array_equal((~a).index, np.flatnonzero(~self.a))
+                self.assertEqual(len(a & b), np.count_nonzero(self.a & self.b))
+
+        everything = Selection.everything(self.n)
+        a = Selection.from_mask(self.a)
+        self.assertIs(everything & a, a)
+        self.assertTrue((everything | a).is_everything)
+        self.assertEqual(everything.count, self.n)
+        with self.assertRaises(ValueError):
+            a & Selection.everything(self.n + 1)
+
+    def test_reductions(self):
+        values = np.random.normal(size=(self.n, 3))
+        weights = np.random.uniform(size=self.n)
+        for selection in [Selection.from_mask(self.a), Selection.from_index(np.flatnonzero(self.a), self.n),
+                          Selection.everything(self.n)]:
+            mask = selection.mask
+            np.testing.assert_allclose(selection.sum(values, weights=weights, chunk_size=300),
+                                       np.sum(values[mask] * weights[mask, None], axis=0))
+            np.testing.assert_allclose(selection.sum(weights, chunk_size=300), np.sum(weights[mask]))
+            chunks = list(selection.chunks(chunk_size=300))
+            np.testing.assert_array_equal(np.concatenate([np.arange(self.n)[block] for block in chunks]),
+                                          np.flatnonzero(mask))
+
+    def test_selected_moments(self):
+        cluster = MockCluster()
+        fields = [cluster.partType0_mass, cluster.partType0_coordinates, cluster.partType0_velocity]
+        selection = Selection.from_mask(cluster.particle_radii('0') < 1.1) & cluster.subgroup_selection('0', 0)
+        expected = _apertures.accumulate_moments(
+                *[field[selection.index] for field in fields],
+                temperature=cluster.partType0_temperature[selection.index],
+                centre=cluster.centre_of_potential
+        )
+        moments = _apertures.accumulate_moments(*fields, temperature=cluster.partType0_temperature,
+                                                centre=cluster.centre_of_potential, selection=selection)
+        np.testing.assert_allclose(moments, expected, rtol=1e-10)
+        if kernels.NUMBA_AVAILABLE:
+            np.testing.assert_allclose(
+                    kernels.moment_sums(*fields, temperature=cluster.partType0_temperature,
+                                        centre=cluster.centre_of_potential, index=selection.index),
+                    expected[:-1], rtol=1e-10)
+
+    def test_cluster_selections(self):
+        cluster = MockCluster()
+        R = 1.2
+        fuzz_mass = []
+        for part_type in ['0', '1', '4']:
+            radii = cluster.particle_radii(part_type)
+            subgroupnumber = getattr(cluster, f'partType{part_type}_subgroupnumber')
+            mass = getattr(cluster, f'partType{part_type}_mass')
+            fuzz_mass.append(np.sum(mass[(radii < R) & (subgroupnumber == 0)]))
+            np.testing.assert_array_equal(cluster.radius_selection(part_type, R, r_min=0.5).index,
+                                          np.flatnonzero((radii >= 0.5) & (radii < R)))
+        total_mass = cluster.group_mass_aperture(out_allPartTypes=True, aperture_radius=R)
+        np.testing.assert_allclose(cluster.group_substructure_mass(out_allPartTypes=True, aperture_radius=R),
+                                   total_mass - fuzz_mass)
+        np.testing.assert_allclose(cluster.group_substructure_fraction(aperture_radius=R),
+                                   1 - np.sum(fuzz_mass) / np.sum(total_mass))
+
+        inside = cluster.particle_radii('0') < R
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            thermal_energy = cluster.group_thermal_energy(aperture_radius=R)
+        expected = ProfilerMixin.thermal_energy(ProfilerMixin.mass_units(cluster.partType0_mass[inside]),
+                                                cluster.partType0_temperature[inside]) * 1e-46
+        np.testing.assert_allclose(thermal_energy, expected, rtol=1e-10)
+
+        hot = cluster.temperature_selection(t_min=1e7)
+        np.testing.assert_array_equal(hot.mask, cluster.partType0_temperature > 1e7)
+
+    def test_report_selections(self):
+        # Every selection of the single pass matches the report of the filtered particles
+        cluster = MockCluster()
+        apertures = np.array([0.8, 2.])
+        selections = {
+                'all'    : lambda part_type: Selection.everything(len(getattr(cluster, f'partType{part_type}_mass'))),
+                'central': lambda part_type: cluster.named_selection('central', part_type),
+                'hot'    : lambda part_type: cluster.temperature_selection(t_min=1e7) if part_type == '0' else
+                           Selection.everything(len(getattr(cluster, f'partType{part_type}_mass'))),
+        }
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            reports = cluster.group_report_selections(selections, apertures)
+        self.assertEqual(reports[0]['angular_momentum'].shape, (3, 4, 3))
+        np.testing.assert_array_equal(reports[1]['selections'], ['all', 'central', 'hot'])
+
+        for s, select in enumerate(selections.values()):
+            filtered = MockCluster()
+            for part_type in ['0', '1', '4']:
+                mask = select(part_type).mask
+                fields = ['mass', 'coordinates', 'velocity', 'subgroupnumber'] + (['temperature'] if part_type == '0' else [])
+                for field in fields:
+                    setattr(filtered, f'partType{part_type}_{field}', getattr(cluster, f'partType{part_type}_{field}')[mask])
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                expected = filtered.group_report_apertures(apertures)
+            for i in range(len(apertures)):
+                for key, value in expected[i].items():
+                    np.testing.assert_allclose(reports[i][key][s], value, rtol=1e-8, atol=1e-10, err_msg=key)
+
+        # An empty selection warns about its own rows
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            cluster.group_report_selections({
+                    'all' : selections['all'],
+                    'none': lambda part_type: ~Selection.everything(len(getattr(cluster, f'partType{part_type}_mass')))
+            }, apertures)
+        messages = [str(w.message) for w in caught if 'N_particles is 0' in str(w.message)]
+        self.assertEqual(len(messages), len(apertures))
+        self.assertTrue(all(message.endswith('(none)') for message in messages))
+
+        self.assertEqual(np.count_nonzero(cluster.named_selection('hot_gas', '1').mask), 0)
+        with self.assertRaises(ValueError):
+            cluster.named_selection('cold', '0')
+
+
+if __name__ == '__main__':
+    unittest.main()
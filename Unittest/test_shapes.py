@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.shapes import iterative_shape, iterative_shapes, shape_keys
+from test_apertures import MockCluster
+
+
+class TestShapes(unittest.TestCase):
+
+    def test_recovers_axis_ratios(self):
+        np.random.seed(7)
+        q, s = 0.7, 0.4
+        # Isodensity surfaces are ellipsoids with axis ratios (q, s), rotated at random
+        coords = np.random.normal(0., 1., (60000, 3)) * np.array([1., q, s])
+        rotation, _ = np.linalg.qr(np.random.normal(size=(3, 3)))
+        coords = coords @ rotation.T
+        mass = np.random.uniform(0.5, 1.5, len(coords))
+
+        shape = iterative_shape(mass, coords, 1.5)
+        self.assertTrue(shape['converged'])
+        self.assertGreater(shape['iterations'], 1)
+        np.testing.assert_allclose(shape['elongation'], q, rtol=0.03)
+        np.testing.assert_allclose(shape['sphericity'], s, rtol=0.03)
+        np.testing.assert_allclose(np.abs(shape['eigenvectors'].reshape(3, 3) @ rotation), np.identity(3), atol=0.02)
+
+        # The spherical (non-iterative) measurement is biased towards round shapes
+        inside = np.linalg.norm(coords, axis=1) < 1.5
+        eigenvalues = np.linalg.eigvalsh((coords[inside] * mass[inside, None]).T @ coords[inside])
+        self.assertGreater(np.sqrt(eigenvalues[0] / eigenvalues[2]), s + 0.05)
+
+    def test_apertures_match_single_shapes(self):
+        cluster = MockCluster()
+        apertures = np.array([1.5, 0.02, 0.8, 3.])
+        shapes = cluster.group_morphology_iterative(apertures)
+        self.assertEqual(set(shapes.keys()), set(shape_keys))
+        self.assertEqual(shapes['eigenvectors'].shape, (4, 4, 9))
+        # Too few particles in the smallest aperture
+        self.assertTrue(np.all(np.isnan(shapes['sphericity'][1])))
+        self.assertFalse(np.any(shapes['converged'][1]))
+
+        fields = {field: np.concatenate([getattr(cluster, f'partType{pt}_{field}') for pt in ['0', '1', '4']])
+                  for field in ['mass', 'coordinates']}
+        coords = fields['coordinates'] - cluster.centre_of_potential
+        for i, aperture_radius in enumerate(apertures):
+            # All the particles are passed: the ones outside the sphere are never selected
+            expected = iterative_shape(fields['mass'], coords, aperture_radius)
+            for key in shape_keys:
+                if key == 'eigenvectors':
+                    np.testing.assert_allclose(np.abs(shapes[key][i, 0]), np.abs(expected[key]), rtol=1e-8, atol=1e-10)
+                else:
+                    np.testing.assert_allclose(shapes[key][i, 0], expected[key], rtol=1e-8, err_msg=key)
+
+        gas = iterative_shapes(cluster.particle_radii('0'), cluster.partType0_mass, cluster.partType0_coordinates,
+                               apertures, centre=cluster.centre_of_potential)
+        np.testing.assert_allclose(shapes['sphericity'][:, 1], gas['sphericity'], rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
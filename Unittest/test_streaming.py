@@ -0,0 +1,118 @@
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+import numpy as np
+import h5py as h5
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.streaming import ApertureAccumulator, clean_chunk, stream_report
+from bahamas import read as bahamas_read
+import test_apertures
+from test_apertures import MockCluster
+
+
+class TestStreaming(unittest.TestCase):
+
+    assertReportEqual = test_apertures.TestApertures.assertReportEqual
+
+    def test_chunks_match_report_grid(self):
+        cluster = MockCluster()
+        apertures = np.array([1.5, 0.3, 3., 0.8, 0.8])
+        accumulator = ApertureAccumulator(apertures, cluster.centre_of_potential)
+
+        # Chunks of uneven size, in shuffled order and interleaving the particle types
+        chunks = []
+        for part_type in ['0', '1', '4']:
+            fields = {field: getattr(cluster, f'partType{part_type}_{field}')
+                      for field in ['mass', 'coordinates', 'velocity', 'subgroupnumber']}
+            if part_type == '0':
+                fields['temperature'] = cluster.partType0_temperature
+            order = np.random.permutation(len(fields['mass']))
+            for index in np.array_split(order, np.sort(np.random.choice(len(order), 7, replace=False))):
+                chunks.append((part_type, {field: values[index] for field, values in fields.items()}))
+        np.random.shuffle(chunks)
+        for part_type, data in chunks:
+            accumulator.update(part_type, data, chunk_size=300)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            reports = accumulator.report()
+            expected = cluster.group_report_apertures(apertures)
+        self.assertEqual(len(reports), len(apertures))
+        for report, expected_report in zip(reports, expected):
+            self.assertEqual(set(report.keys()), set(expected_report.keys()))
+            self.assertReportEqual(report, expected_report)
+
+    def test_clean_chunk(self):
+        np.random.seed(2)
+        n = 1000
+        centre = np.array([10., 10., 10.])
+        data = {
+                'coordinates': centre + np.random.uniform(-3., 3., (n, 3)),
+                'mass'       : np.ones(n),
+                'temperature': 10 ** np.random.uniform(3., 8., n),
+                'sphdensity' : 10 ** np.random.uniform(-30., -24., n),
+        }
+        clean = clean_chunk('0', data, centre, r200=0.5)
+        density = data['sphdensity'] * 6.769911178294543e-31 / 1.674e-24
+        expected = ((np.linalg.norm(data['coordinates'] - centre, axis=1) < 2.5) &
+                    (data['temperature'] > 1e4) &
+                    (np.log10(data['temperature']) > np.log10(density) / 3 + 13 / 3))
+        np.testing.assert_array_equal(clean['temperature'], data['temperature'][expected])
+        self.assertEqual(len(clean_chunk('1', data, centre, r200=0.5)['mass']),
+                         np.sum(np.linalg.norm(data['coordinates'] - centre, axis=1) < 2.5))
+
+    def test_bahamas_chunks(self):
+        np.random.seed(3)
+        boxsize = 100.
+        fofgroup = {'COP': np.array([1., 50., 99.]), 'R200': 1., 'R500': 0.7, 'R2500': 0.3}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fofgroup['particlefiles'] = os.path.join(tmpdir, 'eagle_subfind_particles_032.0.hdf5')
+            groupNumbers = []
+            with h5.File(fofgroup['particlefiles'], 'w') as f:
+                f.create_group('Header')
+                f['Header'].attrs['HubbleParam'] = 0.7
+                f['Header'].attrs['ExpansionFactor'] = 1.
+                f['Header'].attrs['Redshift'] = 0.
+                f['Header'].attrs['BoxSize'] = boxsize * 0.7
+                f['Header'].attrs['MassTable'] = np.array([0., 5e-4, 0., 0., 0., 0.])
+                for part_type in ['0', '1', '4']:
+                    n = 3000
+                    coords = (fofgroup['COP'] + np.random.normal(0., 1., (n, 3))) % boxsize
+                    f[f'PartType{part_type}/Coordinates'] = (coords * 0.7).astype(np.float32)
+                    f[f'PartType{part_type}/Velocity'] = np.random.normal(0., 500., (n, 3)).astype(np.float32)
+                    f[f'PartType{part_type}/SubGroupNumber'] = np.random.randint(0, 3, n)
+                    if part_type != '1':
+                        f[f'PartType{part_type}/Mass'] = np.random.uniform(5e-4, 1.5e-3, n).astype(np.float32)
+                    if part_type == '0':
+                        f['PartType0/Temperature'] = np.random.uniform(1e6, 1e8, n).astype(np.float32)
+                        f['PartType0/Density'] = np.random.uniform(1., 10., n).astype(np.float32)
+                        f['PartType0/Density'].attrs['CGSConversionFactor'] = 6.769911178294543e-31
+                        f['PartType0/SmoothingLength'] = np.ones(n, dtype=np.float32)
+                    groupNumbers.append(np.sort(np.random.choice(n, 2000, replace=False)))
+
+            # The chunks hold the same particles as the gathered reader
+            particles = bahamas_read.cluster_particles(fofgroup=fofgroup, groupNumbers=groupNumbers)
+            chunks = list(bahamas_read.cluster_particle_chunks(fofgroup=fofgroup, groupNumbers=groupNumbers,
+                                                               chunk_size=450))
+            self.assertTrue(all(len(data['mass']) <= 450 for _, data in chunks))
+            for part_type in ['0', '1', '4']:
+                for field in ['mass', 'coordinates', 'velocity', 'subgroupnumber']:
+                    np.testing.assert_allclose(
+                            np.concatenate([data[field] for pt, data in chunks if pt == part_type]),
+                            particles[f'partType{part_type}'][field], err_msg=field)
+
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                apertures, reports = stream_report(iter(chunks), fofgroup)
+        self.assertEqual(len(apertures), 23)
+        self.assertEqual(len(reports), 23)
+        np.testing.assert_array_equal(reports[-1]['N_particles'][1:], [2000, 2000, 2000])
+
+
+if __name__ == '__main__':
+    unittest.main()
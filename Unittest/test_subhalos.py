@@ -0,0 +1,118 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.subhalos import SubhaloGroups, catalogue_substructure
+from import_toolkit._cluster_profiler import Mixin as ProfilerMixin
+from test_apertures import MockCluster
+
+
+class TestSubhalos(unittest.TestCase):
+
+    def test_reduce(self):
+        np.random.seed(5)
+        subgroupnumber = np.random.choice([0, 3, 7, 8], 500)
+        values = np.random.normal(size=(500, 3))
+        groups = SubhaloGroups(subgroupnumber)
+        np.testing.assert_array_equal(groups.subgroupnumber, [0, 3, 7, 8])
+        np.testing.assert_array_equal(groups.counts, [np.sum(subgroupnumber == n) for n in [0, 3, 7, 8]])
+        np.testing.assert_allclose(groups.reduce(values),
+                                   [values[subgroupnumber == n].sum(axis=0) for n in [0, 3, 7, 8]])
+        empty = SubhaloGroups(np.zeros(0, dtype=int))
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.reduce(np.zeros((0, 3))).shape, (0, 3))
+
+    def test_group_subhalos(self):
+        cluster = MockCluster()
+        apertures = np.array([1.5, 0.4, 3.])
+        cluster.group_subhalos(apertures)
+        # Replacing the SubGroupNumbers invalidates the cached grouped order.
+        # Part type 4 has no particles in subhalo 2, which must still appear as empty.
+        cluster.partType4_subgroupnumber = np.minimum(cluster.partType4_subgroupnumber, 1)
+        subhalos = cluster.group_subhalos(apertures)
+        np.testing.assert_array_equal(subhalos['subgroupnumber'], [0, 1, 2])
+        self.assertEqual(subhalos['mass'].shape, (3, 3, 4))
+        self.assertEqual(subhalos['angular_momentum'].shape, (3, 3, 4, 3))
+
+        P = ProfilerMixin
+        for i, aperture_radius in enumerate(apertures):
+            for j, number in enumerate([0, 1, 2]):
+                selected = {}
+                for part_type in ['0', '1', '4']:
+                    index = np.flatnonzero((cluster.particle_radii(part_type) < aperture_radius) &
+                                           (getattr(cluster, f'partType{part_type}_subgroupnumber') == number))
+                    selected[part_type] = [getattr(cluster, f'partType{part_type}_{field}')[index]
+                                           for field in ['mass', 'coordinates', 'velocity']]
+                selected['total'] = [np.concatenate([selected[pt][k] for pt in ['0', '1', '4']]) for k in range(3)]
+                for k, grouping in enumerate(['total', '0', '1', '4']):
+                    m, x, v = selected[grouping]
+                    self.assertEqual(subhalos['N_particles'][i, j, k], len(m))
+                    np.testing.assert_allclose(subhalos['mass'][i, j, k], np.sum(m), rtol=1e-10)
+                    if len(m) == 0:
+                        self.assertTrue(np.all(np.isnan(subhalos['centre_of_mass'][i, j, k])))
+                        continue
+                    com = P.centre_of_mass(m, x)
+                    bulk_velocity = P.zero_momentum_frame(m, v)
+                    np.testing.assert_allclose(subhalos['centre_of_mass'][i, j, k], com, rtol=1e-10)
+                    np.testing.assert_allclose(subhalos['bulk_velocity'][i, j, k], bulk_velocity, rtol=1e-10)
+                    np.testing.assert_allclose(subhalos['angular_momentum'][i, j, k],
+                                               P.angular_momentum(m, x - com, v - bulk_velocity),
+                                               rtol=1e-7, atol=1e-9)
+
+    def test_catalogue_matches_particles(self):
+        # A central halo within 0.8 Mpc and three compact satellites, each entirely
+        # inside or outside the apertures: the subhalo-based and particle-based
+        # definitions then agree.
+        cluster = MockCluster()
+        cop = cluster.centre_of_potential
+        satellites = cop + np.array([[0.5, 0., 0.], [0., 1.5, 0.], [0., 0., -4.]])
+        for part_type in ['0', '1', '4']:
+            direction = np.random.normal(size=(2000, 3))
+            direction /= np.linalg.norm(direction, axis=1)[:, None]
+            coords = [cop + direction * np.random.uniform(0., 0.8, (2000, 1))]
+            coords += [centre + np.random.normal(0., 0.01, (200, 3)) for centre in satellites]
+            coords = np.concatenate(coords)
+            setattr(cluster, f'partType{part_type}_coordinates', coords)
+            setattr(cluster, f'partType{part_type}_velocity', np.random.normal(0., 300., (len(coords), 3)))
+            setattr(cluster, f'partType{part_type}_mass', np.random.uniform(0.5, 1.5, len(coords)) * 1e-3)
+            setattr(cluster, f'partType{part_type}_subgroupnumber', np.repeat([0, 1, 2, 3], [2000, 200, 200, 200]))
+        cluster.partType0_temperature = np.random.uniform(1e6, 1e8, 2600)
+
+        # Subhalo table from the particles
+        mass = np.concatenate([getattr(cluster, f'partType{pt}_mass') for pt in ['0', '1', '4']])
+        coords = np.concatenate([getattr(cluster, f'partType{pt}_coordinates') for pt in ['0', '1', '4']])
+        groups = SubhaloGroups(np.concatenate([getattr(cluster, f'partType{pt}_subgroupnumber')
+                                               for pt in ['0', '1', '4']]))
+        subhalo_mass = groups.reduce(mass)
+        subhalo_centre_of_mass = groups.reduce(coords * mass[:, None]) / subhalo_mass[:, None]
+        subhalo_centre_of_potential = np.concatenate(([cop], satellites))
+
+        apertures = np.array([1., 2., 6.])
+        catalogue = catalogue_substructure(subhalo_mass, subhalo_centre_of_potential, subhalo_centre_of_mass,
+                                           cop, apertures)
+        np.testing.assert_array_equal(catalogue['subhalo_N_satellites'], [1, 2, 3])
+        for i, aperture_radius in enumerate(apertures):
+            np.testing.assert_allclose(catalogue['subhalo_substructure_mass'][i],
+                                       cluster.group_substructure_mass(aperture_radius=aperture_radius), rtol=1e-8)
+            np.testing.assert_allclose(catalogue['subhalo_substructure_fraction'][i],
+                                       cluster.group_substructure_fraction(aperture_radius=aperture_radius), rtol=1e-8)
+            np.testing.assert_allclose(catalogue['subhalo_dynamical_merging_index'][i],
+                                       cluster.group_dynamical_merging_index(aperture_radius=aperture_radius),
+                                       rtol=1e-8)
+
+        # Periodic boundaries: the same group wrapped across the box edge
+        boxsize = 100.
+        shift = np.array([50., 40., 30.])
+        wrapped = catalogue_substructure(subhalo_mass, (subhalo_centre_of_potential + shift) % boxsize,
+                                         (subhalo_centre_of_mass + shift) % boxsize, (cop + shift) % boxsize,
+                                         apertures, boxsize=boxsize)
+        for key, value in catalogue.items():
+            np.testing.assert_allclose(wrapped[key], value, rtol=1e-8, err_msg=key)
+
+
+if __name__ == '__main__':
+    unittest.main()
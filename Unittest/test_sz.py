@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+import warnings
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from import_toolkit.sz import tsz_factor, ksz_factor, sz_keys
+from rotvel_correlation.alignment import save_report
+from test_apertures import MockCluster
+
+
+class TestSZ(unittest.TestCase):
+
+    def setUp(self):
+        self.cluster = MockCluster()
+        # Some cold gas, below the cut
+        self.cluster.partType0_temperature = 10 ** np.random.uniform(4., 8., 4000)
+        self.x = self.cluster.partType0_coordinates - self.cluster.centre_of_potential
+        self.hot = self.cluster.partType0_temperature > 1e5
+        self.apertures = np.array([0.5, 1.2, 3.])
+        self.lines_of_sight = np.array([[1., 0., 0.], [0., 1., 0.], [0., 0., 1.], [1., 2., -2.]])
+
+    def test_spherical_and_cylindrical(self):
+        c = self.cluster
+        sz = c.group_sz(self.apertures, lines_of_sight=self.lines_of_sight, depth=2.)
+        self.assertEqual(tuple(sz.keys()), sz_keys)
+        n = sz['lines_of_sight']
+        np.testing.assert_allclose(np.linalg.norm(n, axis=1), 1.)
+        m, T, v = c.partType0_mass, c.partType0_temperature, c.partType0_velocity
+        for i, R in enumerate(self.apertures):
+            inside = self.hot & (np.linalg.norm(self.x, axis=1) < R)
+            np.testing.assert_allclose(sz['tSZ_sphere'][i], np.sum(m[inside] * T[inside]) * tsz_factor, rtol=1e-10)
+            np.testing.assert_allclose(sz['kSZ_sphere'][i], (m[inside] @ v[inside]) @ n.T * ksz_factor, rtol=1e-9)
+            for l in range(len(n)):
+                along = self.x @ n[l]
+                across = np.linalg.norm(self.x - along[:, None] * n[l], axis=1)
+                inside = self.hot & (across < R) & (np.abs(along) < 2.)
+                np.testing.assert_allclose(sz['tSZ_cylinder'][i, l], np.sum(m[inside] * T[inside]) * tsz_factor,
+                                           rtol=1e-10)
+                np.testing.assert_allclose(sz['kSZ_cylinder'][i, l], np.sum(m[inside] * (v[inside] @ n[l])) * ksz_factor,
+                                           rtol=1e-9)
+
+        # Without depth, the cylinders hold at least the particles of the spheres
+        sz = c.group_sz(self.apertures)
+        self.assertTrue(np.all(sz['tSZ_cylinder'] >= sz['tSZ_sphere'][:, None]))
+        with self.assertRaises(ValueError):
+            c.group_sz(self.apertures, lines_of_sight=[0., 0., 0.])
+
+    def test_save_report(self):
+        c = self.cluster
+        c.generate_apertures = lambda: self.apertures
+        c.group_fofinfo = lambda aperture_radius: {'r_aperture': aperture_radius}
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertNotIn('tSZ_sphere', save_report(c)['aperture00'])
+            report = save_report(c, sz=True)
+        np.testing.assert_allclose(report['aperture01']['kSZ_cylinder'], c.group_sz(self.apertures)['kSZ_cylinder'][1])
+        with self.assertRaises(ValueError):
+            save_report(c, sz=True, selections=['all'])
+        with self.assertRaises(ValueError):
+            save_report(c, potential_energy=True, centres=['cop'])
+
+    def test_map_constants(self):
+        # Same constants as the tSZ maps of obsolete/map_renderer_SZ.py
+        sigma_T, k_B, m_e, c, m_H = 6.65245854533e-29, 1.38064852e-23, 9.10938291e-31, 299792458., 1.6737236e-27
+        mass_kg, Mpc = 1e10 * 1.98841586e30, 3.0856776e22
+        np.testing.assert_allclose(tsz_factor, sigma_T * k_B / (m_e * c ** 2 * m_H * 1.16) * mass_kg / Mpc ** 2,
+                                   rtol=1e-3)
+        np.testing.assert_allclose(ksz_factor, -sigma_T / (c * m_H * 1.16) * mass_kg * 1e3 / Mpc ** 2, rtol=1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+------------------------------------------------------------------
+FILE:   catalogue.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file builds the box-wide FoF catalogue of a BAHAMAS snapshot.
+The M500 selection is applied while reading the subfind tab files,
+so that only the selected groups (and the centres of potential, centres of mass and
+masses of their subhalos) are kept in memory and communicated across
+cores. The catalogue is a single structured array with one row per
+selected group, saved as .npy and loaded back memory-mapped, so that
+reruns at the same redshift do not open the tab files at all.
+The subhalo table is enough for the catalogue-only substructure
+screening (see import_toolkit.subhalos.catalogue_substructure).
+-------------------------------------------------------------------
+"""
+
+import os
+import numpy as np
+import h5py as h5
+from mpi4py import MPI
+
+from .__init__ import pprint, comm, rank
+from .conversion import comoving_length, comoving_mass
+from .read import split
+
+CATALOGUE_PATH = '/local/scratch/altamura/analysis_results/bahamas_catalogues'
+M500_MIN = 1.0e13
+
+catalogue_dtype = np.dtype([
+	('idx',         np.int64),
+	('Mfof',        np.float32),
+	('M2500',       np.float32),
+	('R2500',       np.float32),
+	('M500',        np.float32),
+	('R500',        np.float32),
+	('M200',        np.float32),
+	('R200',        np.float32),
+	('COP',         np.float32, (3,)),
+	('NSUB',        np.int64),
+	('FSID',        np.int64),
+	('SCOP_offset', np.int64),
+])
+
+subhalo_dtype = np.dtype([
+	('COP',  np.float32, (3,)),
+	('COM',  np.float32, (3,)),
+	('Mass', np.float32),
+])
+
+# Catalogue columns read from the subfind tab files
+fof_datasets = {
+	'Mfof':  'FOF/GroupMass',
+	'M2500': 'FOF/Group_M_Crit2500',
+	'R2500': 'FOF/Group_R_Crit2500',
+	'M500':  'FOF/Group_M_Crit500',
+	'R500':  'FOF/Group_R_Crit500',
+	'M200':  'FOF/Group_M_Crit200',
+	'R200':  'FOF/Group_R_Crit200',
+	'COP':   'FOF/GroupCentreOfPotential',
+	'NSUB':  'FOF/NumOfSubhalos',
+	'FSID':  'FOF/FirstSubhaloID',
+}
+subhalo_datasets = {
+	'COP':  'Subhalo/CentreOfPotential',
+	'COM':  'Subhalo/CentreOfMass',
+	'Mass': 'Subhalo/Mass',
+}
+
+
+def commune_rows(data: np.ndarray) -> np.ndarray:
+	"""
+	Allgathers the rows of an array of any dtype (including structured
+	arrays and (N, 3) arrays) in rank order.
+	"""
+	data = np.ascontiguousarray(data)
+	row_shape = data.shape[1:]
+	row_bytes = data.dtype.itemsize * int(np.prod(row_shape, dtype=np.int64))
+	counts = np.asarray(comm.allgather(len(data) * row_bytes), dtype=np.int64)
+	displacements = np.concatenate(([0], np.cumsum(counts)[:-1]))
+	result = np.empty((counts.sum() // max(row_bytes, 1),) + row_shape, dtype=data.dtype)
+	comm.Allgatherv(data.view(np.uint8).ravel(), [result.view(np.uint8).ravel(), counts, displacements, MPI.BYTE])
+	return result
+
+def catalogue_filenames(snapshot: str, m500_min: float = M500_MIN, path: str = CATALOGUE_PATH) -> tuple:
+	basename = f"bahamas_fof_{snapshot}_M500min{m500_min:.1e}"
+	return os.path.join(path, f"{basename}.npy"), os.path.join(path, f"{basename}_subhalos.npy")
+
+def tab_header(group_file: str) -> dict:
+	header = {}
+	with h5.File(group_file, 'r') as f:
+		header['Hub']  = f['Header'].attrs['HubbleParam']
+		header['aexp'] = f['Header'].attrs['ExpansionFactor']
+		header['zred'] = f['Header'].attrs['Redshift']
+	return header
+
+def build_catalogue(group_files: list, m500_min: float = M500_MIN) -> tuple:
+	"""
+	Reads the subfind tab files (split across cores) and returns the
+	catalogue of the groups with M500 > m500_min, in physical units.
+
+	:param group_files: expect list of str
+		The eagle_subfind_tab files of the snapshot, sorted by file number.
+	:param m500_min: expect float
+		The M500 selection threshold in M_sun.
+	:return: (np.ndarray, np.ndarray)
+		The catalogue (catalogue_dtype, one row per selected group) and the
+		subhalos of the selected groups (subhalo_dtype, one row per subhalo).
+		The subhalos of group i are
+		subhalos[table['SCOP_offset'][i] : table['SCOP_offset'][i] + table['NSUB'][i]],
+		the first being the central subhalo.
+	"""
+	pprint(f"[+] Building FoF catalogue from {len(group_files)} tab files...")
+	header = tab_header(group_files[0])
+	st, fh = split(len(group_files))
+
+	# First pass: mass selection and sizes of the files on this core
+	selections = []
+	num_subhalos = []
+	for x in range(st, fh, 1):
+		with h5.File(group_files[x], 'r') as f:
+			m500 = comoving_mass(header, f['FOF/Group_M_Crit500'][:] * 1.0e10)
+			selections.append(m500 > m500_min)
+			num_subhalos.append(f['Subhalo/CentreOfPotential'].shape[0])
+
+	# Global indices of the first group and subhalo on this core
+	sizes = comm.allgather((sum(len(s) for s in selections), sum(num_subhalos)))
+	group_start = sum(size[0] for size in sizes[:rank])
+	subhalo_start = sum(size[1] for size in sizes[:rank])
+
+	# Second pass: read the selected rows only, into a preallocated table
+	table = np.zeros(sum(int(s.sum()) for s in selections), dtype=catalogue_dtype)
+	row = 0
+	group_offset = group_start
+	for x, selection in zip(range(st, fh, 1), selections):
+		n = int(selection.sum())
+		if n > 0:
+			with h5.File(group_files[x], 'r') as f:
+				for field, dataset in fof_datasets.items():
+					table[field][row:row + n] = f[dataset][:][selection]
+			table['idx'][row:row + n] = group_offset + np.where(selection)[0]
+		row += n
+		group_offset += len(selection)
+	del selections
+
+	# Conversion
+	for field in ['Mfof', 'M2500', 'M500', 'M200']:
+		table[field] = comoving_mass(header, table[field] * 1.0e10)
+	for field in ['R2500', 'R500', 'R200', 'COP']:
+		table[field] = comoving_length(header, table[field])
+	table = commune_rows(table)
+
+	# Subhalo table: keep the ranges of the selected groups only
+	n_local = sum(num_subhalos)
+	coverage = np.zeros(n_local + 1, dtype=np.int64)
+	np.add.at(coverage, np.clip(table['FSID'] - subhalo_start, 0, n_local), 1)
+	np.add.at(coverage, np.clip(table['FSID'] + table['NSUB'] - subhalo_start, 0, n_local), -1)
+	keep = np.cumsum(coverage[:-1]) > 0
+	del coverage
+
+	subhalos = np.empty(int(keep.sum()), dtype=subhalo_dtype)
+	subhalo_index = subhalo_start + np.where(keep)[0]
+	row = 0
+	subhalo_offset = 0
+	for x, n_sub in zip(range(st, fh, 1), num_subhalos):
+		selection = keep[subhalo_offset:subhalo_offset + n_sub]
+		n = int(selection.sum())
+		if n > 0:
+			with h5.File(group_files[x], 'r') as f:
+				for field, dataset in subhalo_datasets.items():
+					subhalos[field][row:row + n] = f[dataset][:][selection]
+		row += n
+		subhalo_offset += n_sub
+
+	# Conversion
+	for field in ['COP', 'COM']:
+		subhalos[field] = comoving_length(header, subhalos[field])
+	subhalos['Mass'] = comoving_mass(header, subhalos['Mass'] * 1.0e10)
+	subhalos = commune_rows(subhalos)
+	subhalo_index = commune_rows(subhalo_index)
+	table['SCOP_offset'] = np.searchsorted(subhalo_index, table['FSID'])
+	pprint(f"\t Found {len(table)} groups with M500 > {m500_min:.1e} M_sun")
+	return table, subhalos
+
+def load_catalogue(files: list,
+                   m500_min: float = M500_MIN,
+                   path: str = CATALOGUE_PATH,
+                   rebuild: bool = False) -> tuple:
+	"""
+	Returns the FoF catalogue of the snapshot, memory-mapped from file if
+	it was saved by a previous run, otherwise builds and saves it.
+
+	:param files: expect list
+		The output of read.find_files: [group_files, particle_file].
+	:param m500_min: expect float
+	:param path: expect str
+		Directory of the saved catalogues.
+	:param rebuild: expect bool
+		If True, the tab files are read again and the saved catalogue overwritten.
+	:return: (np.ndarray, np.ndarray)
+		See build_catalogue.
+	"""
+	snapshot = os.path.basename(files[1]).split('_')[-1].split('.')[0]
+	table_file, subhalo_file = catalogue_filenames(snapshot, m500_min, path)
+	saved = comm.bcast(os.path.isfile(table_file) and os.path.isfile(subhalo_file) if rank == 0 else None, root=0)
+
+	if saved and not rebuild:
+		pprint(f"[+] Load FoF catalogue {table_file:s}")
+		return np.load(table_file, mmap_mode='r'), np.load(subhalo_file, mmap_mode='r')
+
+	table, subhalos = build_catalogue(files[0], m500_min)
+	if rank == 0:
+		if not os.path.exists(path): os.makedirs(path)
+		for array, file_name in zip([table, subhalos], [table_file, subhalo_file]):
+			with open(file_name + '.tmp', 'wb') as f:
+				np.save(f, array)
+			os.replace(file_name + '.tmp', file_name)
+	return table, subhalos
+
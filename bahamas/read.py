@@ -26,6 +26,10 @@ from .conversion import (
 	momentum_units,
 	energy_units,
 )
+from import_toolkit.geometry import periodic_recentre, periodic_box_mask, CHUNK_SIZE
+from import_toolkit.streaming import stream_report
+from import_toolkit.subhalos import catalogue_substructure
+from import_toolkit._cluster_profiler import Mixin as ProfilerMixin
 
 def split(nfiles):
     nfiles=int(nfiles)
@@ -100,6 +104,17 @@ def fof_header(files: list):
 		header['OmgB'] = f['Header'].attrs['OmegaBaryon']
 	return header
 
+def fof_boxsize(files: list) -> float:
+	"""
+	Side of the periodic box in physical Mpc.
+	"""
+	header = {}
+	with h5.File(files[1], 'r') as f:
+		header['Hub']  = f['Header'].attrs['HubbleParam']
+		header['zred'] = f['Header'].attrs['Redshift']
+		boxsize = comoving_length(header, f['Header'].attrs['BoxSize'])
+	return float(boxsize)
+
 # def fof_mass_cut(files: list):
 # 	st, fh = split(len(files))
 # 	M500 = np.empty(0, dtype=np.float32)
@@ -121,66 +136,21 @@ def fof_header(files: list):
 # 	return idx
 
 def fof_groups(files: list):
+	"""
+	Returns the FoF catalogue of the groups with M500 > 10^13 M_sun, one
+	entry per selected cluster (see catalogue.py). The 'idx' field holds the
+	index of each cluster in the full FoF list of the snapshot.
+	"""
+	from .catalogue import load_catalogue
 	pprint(f"[+] Find groups information...")
-	st, fh = split(len(files[0]))
-	Mfof = np.empty(0, dtype=np.float32)
-	M2500 = np.empty(0, dtype=np.float32)
-	M500 = np.empty(0, dtype=np.float32)
-	M200 = np.empty(0, dtype=np.float32)
-	R2500 = np.empty(0, dtype=np.float32)
-	R500 = np.empty(0, dtype=np.float32)
-	R200 = np.empty(0, dtype=np.float32)
-	COP = np.empty(0, dtype=np.float32)
-	NSUB = np.empty(0, dtype=np.int)
-	FSID = np.empty(0, dtype=np.int)
-	SCOP = np.empty(0, dtype=np.float32)
-	for x in range(st, fh, 1):
-		with h5.File(files[0][x], 'r') as f:
-			Mfof = np.append(Mfof, f['FOF/GroupMass'][:])
-			M2500 = np.append(M2500, f['FOF/Group_M_Crit2500'][:])
-			R2500 = np.append(R2500, f['FOF/Group_R_Crit2500'][:])
-			M500 = np.append(M500, f['FOF/Group_M_Crit500'][:])
-			R500 = np.append(R500, f['FOF/Group_R_Crit500'][:])
-			M200 = np.append(M200, f['FOF/Group_M_Crit200'][:])
-			R200 = np.append(R200, f['FOF/Group_R_Crit200'][:])
-			COP = np.append(COP, f['FOF/GroupCentreOfPotential'][:])
-			NSUB = np.append(NSUB, f['FOF/NumOfSubhalos'][:])
-			FSID = np.append(FSID, f['FOF/FirstSubhaloID'][:])
-			SCOP = np.append(SCOP, f['Subhalo/CentreOfPotential'][:])
+	table, subhalos = load_catalogue(files)
 
-	header = {}
-	with h5.File(files[0][0], 'r') as f:
-		header['Hub'] =  f['Header'].attrs['HubbleParam']
-		header['aexp'] = f['Header'].attrs['ExpansionFactor']
-		header['zred'] = f['Header'].attrs['Redshift']
-
-	# Conversion
-	Mfof = comoving_mass(header, Mfof * 1.0e10)
-	M2500 = comoving_mass(header, M2500 * 1.0e10)
-	M500 = comoving_mass(header, M500 * 1.0e10)
-	M200 = comoving_mass(header, M200 * 1.0e10)
-	R2500 = comoving_length(header, R2500)
-	R500 = comoving_length(header, R500)
-	R200 = comoving_length(header, R200)
-	COP = comoving_length(header, COP)
-	SCOP = comoving_length(header, SCOP)
-
-	data = {}
+	data = {field: table[field] for field in table.dtype.names}
+	data['SCOP']  = subhalos['COP']
+	data['SCOM']  = subhalos['COM']
+	data['SMASS'] = subhalos['Mass']
 	data['groupfiles'] = files[0]
 	data['particlefiles'] = files[1]
-	data['Mfof'] = commune(Mfof)
-	data['M2500'] = commune(M2500)
-	data['R2500'] = commune(R2500)
-	data['M500'] = commune(M500)
-	data['R500'] = commune(R500)
-	data['M200'] = commune(M200)
-	data['R200'] = commune(R200)
-	data['COP']  = commune(COP.reshape(-1, 1)).reshape(-1, 3)
-	data['NSUB'] = commune(NSUB)
-	data['FSID'] = commune(FSID)
-	data['SCOP'] = commune(SCOP.reshape(-1, 1)).reshape(-1, 3)
-	data['idx'] = np.where(data['M500'] > 1.0e13)[0]
-
 	return data
 
 def fof_group(clusterID: int, fofgroups: Dict[str, np.ndarray] = None):
@@ -188,22 +158,48 @@ def fof_group(clusterID: int, fofgroups: Dict[str, np.ndarray] = None):
 	new_data = {}
 	new_data['clusterID'] = clusterID
 	new_data['idx']   = fofgroups['idx'][clusterID]
-	new_data['Mfof']  = fofgroups['Mfof'][new_data['idx']]
-	new_data['M2500'] = fofgroups['M2500'][new_data['idx']]
-	new_data['R2500'] = fofgroups['R2500'][new_data['idx']]
-	new_data['M500']  = fofgroups['M500'][new_data['idx']]
-	new_data['R500']  = fofgroups['R500'][new_data['idx']]
-	new_data['M200']  = fofgroups['M200'][new_data['idx']]
-	new_data['R200']  = fofgroups['R200'][new_data['idx']]
-	new_data['COP']   = fofgroups['COP'][new_data['idx']]
-	new_data['NSUB']  = fofgroups['NSUB'][new_data['idx']]
-	new_data['FSID']  = fofgroups['FSID'][new_data['idx']]
-	new_data['SCOP']  = fofgroups['SCOP'][new_data['idx']]
+	new_data['Mfof']  = fofgroups['Mfof'][clusterID]
+	new_data['M2500'] = fofgroups['M2500'][clusterID]
+	new_data['R2500'] = fofgroups['R2500'][clusterID]
+	new_data['M500']  = fofgroups['M500'][clusterID]
+	new_data['R500']  = fofgroups['R500'][clusterID]
+	new_data['M200']  = fofgroups['M200'][clusterID]
+	new_data['R200']  = fofgroups['R200'][clusterID]
+	new_data['COP']   = np.asarray(fofgroups['COP'][clusterID])
+	new_data['NSUB']  = fofgroups['NSUB'][clusterID]
+	new_data['FSID']  = fofgroups['FSID'][clusterID]
+	scop_offset = fofgroups['SCOP_offset'][clusterID]
+	new_data['SCOP']  = np.asarray(fofgroups['SCOP'][scop_offset:scop_offset + new_data['NSUB']])
+	new_data['SCOM']  = np.asarray(fofgroups['SCOM'][scop_offset:scop_offset + new_data['NSUB']])
+	new_data['SMASS'] = np.asarray(fofgroups['SMASS'][scop_offset:scop_offset + new_data['NSUB']])
 	new_data['groupfiles']  = fofgroups['groupfiles']
 	new_data['particlefiles'] = fofgroups['particlefiles']
 	return new_data
 
 
+def fof_substructure(clusterID: int,
+                     fofgroups: Dict[str, np.ndarray] = None,
+                     apertures: np.ndarray = None,
+                     boxsize: float = None) -> Dict[str, np.ndarray]:
+	"""
+	Catalogue-only substructure fractions and dynamical merging indices of one
+	group, from the subhalo table of the FoF catalogue (no particle data).
+	These follow the subhalo-based definition: see
+	import_toolkit.subhalos.catalogue_substructure.
+
+	:param clusterID: expect int
+	:param fofgroups: expect dict, as returned by fof_groups
+	:param apertures: default = None (the grid of Cluster.generate_apertures)
+	:param boxsize: default = None (no periodic wrapping), otherwise fof_boxsize(files)
+	:return: dict of np.ndarray with shape (N_apertures,), including the apertures.
+	"""
+	group_data = fof_group(clusterID, fofgroups=fofgroups)
+	if apertures is None:
+		apertures = ProfilerMixin.aperture_grid(group_data['R200'], group_data['R500'], group_data['R2500'])
+	substructure = catalogue_substructure(group_data['SMASS'], group_data['SCOP'], group_data['SCOM'],
+	                                      group_data['COP'], apertures, boxsize=boxsize)
+	return {'apertures': np.asarray(apertures), **substructure}
+
 def snap_groupnumbers(fofgroups: Dict[str, np.ndarray] = None):
 	"""
 
@@ -283,31 +279,27 @@ def cluster_partapertures(fofgroup: Dict[str, np.ndarray] = None, coordinatesAll
 	block_all = []
 	partTypes = ['0', '1', '4']
 	with h5.File(fofgroup['particlefiles'], 'r') as h5file:
+		header = {}
+		header['Hub']  = h5file['Header'].attrs['HubbleParam']
+		header['aexp'] = h5file['Header'].attrs['ExpansionFactor']
+		header['zred'] = h5file['Header'].attrs['Redshift']
+
 		for pt in partTypes:
 
 			Nparticles = h5file['Header'].attrs['NumPart_ThisFile'][int(pt)]
 			st, fh = split(Nparticles)
 			coords = coordinatesAll[partTypes.index(pt)][st:fh]
 
-			# Periodic boundary wrapping of particle coordinates
+			# Periodic box selection. The snapshot coordinates are comoving, so the
+			# FoF centre and radius (physical) are converted back to comoving units.
 			boxsize = h5file['Header'].attrs['BoxSize']
-			for coord_axis in range(3):
-				# Right boundary
-				if fofgroup['COP'][coord_axis] + 5 * fofgroup['R200'] > boxsize:
-					beyond_index = np.where(coords[:, coord_axis] < boxsize / 2)[0]
-					coords[beyond_index, coord_axis] += boxsize
-					del beyond_index
-				# Left boundary
-				elif fofgroup['COP'][coord_axis] - 5 * fofgroup['R200'] < 0.:
-					beyond_index = np.where(coords[:, coord_axis] > boxsize / 2)[0]
-					coords[beyond_index, coord_axis] -= boxsize
-					del beyond_index
-
-			block_idx = np.where(
-					(np.abs(coords[:, 0] - fofgroup['COP'][0]) < 5 * fofgroup['R200']) &
-					(np.abs(coords[:, 1] - fofgroup['COP'][1]) < 5 * fofgroup['R200']) &
-					(np.abs(coords[:, 2] - fofgroup['COP'][2]) < 5 * fofgroup['R200'])
-			)[0] + st
+			length_conversion = comoving_length(header, 1.)
+			block_idx = np.where(periodic_box_mask(
+					coords,
+					fofgroup['COP'] / length_conversion,
+					5 * fofgroup['R200'] / length_conversion,
+					boxsize=boxsize
+			))[0] + st
 			block_idx_comm = commune(block_idx)
 			block_all.append(block_idx_comm)
 			del block_idx_comm
@@ -387,26 +379,66 @@ def cluster_particles(fofgroup: Dict[str, np.ndarray] = None, groupNumbers: List
 
 			del subgroup_number, velocity, mass, coordinates, temperature, sphdensity, sphlength
 
-			# Periodic boundary wrapping of particle coordinates
-			coords = data_out[f'partType{pt}']['coordinates']
+			# Periodic boundary wrapping of particle coordinates (in place)
 			boxsize = comoving_length(header, h5file['Header'].attrs['BoxSize'])
-			for coord_axis in range(3):
-				# Right boundary
-				if fofgroup['COP'][coord_axis] + 5 * fofgroup['R200'] > boxsize:
-					beyond_index = np.where(coords[:, coord_axis] < boxsize / 2)[0]
-					coords[beyond_index, coord_axis] += boxsize
-					del beyond_index
-				# Left boundary
-				elif fofgroup['COP'][coord_axis] - 5 * fofgroup['R200'] < 0.:
-					beyond_index = np.where(coords[:, coord_axis] > boxsize / 2)[0]
-					coords[beyond_index, coord_axis] -= boxsize
-					del beyond_index
-
-			data_out[f'partType{pt}']['coordinates'] = coords
-			del coords, boxsize
+			periodic_recentre(data_out[f'partType{pt}']['coordinates'], fofgroup['COP'], boxsize)
+			del boxsize
 
 	return data_out
 
+def cluster_particle_chunks(fofgroup: Dict[str, np.ndarray] = None,
+                            groupNumbers: List[np.ndarray] = None,
+                            chunk_size: int = CHUNK_SIZE):
+	"""
+	Generator version of cluster_particles, used by the streaming reports.
+	Each core reads its share of the particles in chunks of at most
+	`chunk_size`, converted to physical units and wrapped around the centre
+	of potential. The chunks are not gathered across cores.
+
+	:param fofgroup: expect dict, as returned by fof_group
+	:param groupNumbers: expect list of np.ndarray, as returned by cluster_partapertures
+	:param chunk_size: expect int
+	:return: generator of (part_type, dict of np.ndarray) pairs
+	"""
+	header = {}
+	partTypes = ['0', '1', '4']
+	with h5.File(fofgroup['particlefiles'], 'r') as h5file:
+
+		header['Hub']  = h5file['Header'].attrs['HubbleParam']
+		header['aexp'] = h5file['Header'].attrs['ExpansionFactor']
+		header['zred'] = h5file['Header'].attrs['Redshift']
+		boxsize = comoving_length(header, h5file['Header'].attrs['BoxSize'])
+
+		for pt in partTypes:
+
+			# Let each CPU core import a portion of the pgn data
+			pgn = groupNumbers[partTypes.index(pt)]
+			st, fh = split(len(pgn))
+
+			for start in range(st, fh, chunk_size):
+				pgn_chunk = pgn[start:min(start + chunk_size, fh)]
+				data_out = {}
+				data_out['subgroupnumber'] = h5file[f'/PartType{pt}/SubGroupNumber'][pgn_chunk]
+				data_out['velocity']       = comoving_velocity(header, h5file[f'/PartType{pt}/Velocity'][pgn_chunk])
+				data_out['coordinates']    = comoving_length(header, h5file[f'/PartType{pt}/Coordinates'][pgn_chunk])
+				if pt == '1':
+					particle_mass_DM = h5file['Header'].attrs['MassTable'][1]
+					mass = np.ones(len(pgn_chunk), dtype=np.float32) * particle_mass_DM
+				else:
+					mass = h5file[f'/PartType{pt}/Mass'][pgn_chunk]
+				data_out['mass'] = comoving_mass(header, mass * 1.0e10)
+				if pt == '0':
+					den_conv = h5file[f'/PartType{pt}/Density'].attrs['CGSConversionFactor']
+					data_out['temperature'] = h5file[f'/PartType{pt}/Temperature'][pgn_chunk]
+					data_out['sphdensity']  = comoving_density(header, h5file[f'/PartType{pt}/Density'][pgn_chunk] * den_conv)
+				del pgn_chunk, mass
+
+				# Periodic boundary wrapping of particle coordinates (in place)
+				periodic_recentre(data_out['coordinates'], fofgroup['COP'], boxsize)
+				yield pt, data_out
+
+			del pgn
+
 def cluster_data(clusterID: int,
                  header: Dict[str, float] = None,
                  fofgroups: Dict[str, np.ndarray] = None,
@@ -433,6 +465,39 @@ def cluster_data(clusterID: int,
 		out[f'partType{pt}'] = {**part_data[f'partType{pt}']}
 	return out
 
+def cluster_data_streaming(clusterID: int,
+                           header: Dict[str, float] = None,
+                           fofgroups: Dict[str, np.ndarray] = None,
+                           coordinates: List[np.ndarray] = None,
+                           apertures: np.ndarray = None,
+                           chunk_size: int = CHUNK_SIZE):
+	"""
+	Streaming version of cluster_data: the particles are consumed in chunks
+	by the aperture accumulators (see import_toolkit.streaming) and never
+	gathered, so the memory used is bounded by `chunk_size`.
+
+	:param clusterID:
+	:param header:
+	:param fofgroups:
+	:param coordinates:
+	:param apertures: default = None (the grid of Cluster.generate_apertures)
+	:param chunk_size: expect int
+	:return: dict with the Header and FOF dicts, the apertures and the list
+		of aperture reports (see rotvel_correlation.alignment.save_report_streaming).
+	"""
+	pprint(f"[+] Running cluster {clusterID} (streaming)")
+	group_data  = fof_group(clusterID, fofgroups = fofgroups)
+	halo_partgn = cluster_partapertures(fofgroup=group_data, coordinatesAll=coordinates)
+	chunks      = cluster_particle_chunks(fofgroup=group_data, groupNumbers=halo_partgn, chunk_size=chunk_size)
+	apertures, reports = stream_report(chunks, group_data, apertures=apertures, comm=comm)
+
+	out = {}
+	out['Header'] = {**header}
+	out['FOF'] = {**group_data}
+	out['apertures'] = apertures
+	out['reports'] = reports
+	return out
+
 
 def glance_cluster(cluster_dict: dict, verbose: bool = False, indent: int = 1) -> None:
 	"""
@@ -14,9 +14,13 @@ They working principle is based on OOP class inheritance.
 -------------------------------------------------------------------
 """
 
+import weakref
+from functools import wraps
 import numpy as np
 from unyt import hydrogen_mass, boltzmann_constant, gravitational_constant, parsec, solar_mass
-from .memory import free_memory
+from .memory import BoundedCache
+from .geometry import radial_distance
+from .selection import Selection
 import warnings
 
 # Delete the units from Unyt constants
@@ -27,8 +31,37 @@ G_astro = float(gravitational_constant.in_units('(1e6*pc)*(km/s)**2/(1e10*solar_
 parsec = float((1*parsec).in_units('m').value)
 solar_mass = float(solar_mass.value)
 
+# Names of the particle selections of the reports (see Mixin.named_selection)
+report_selections = ('all', 'central', 'hot_gas', 'no_eos')
+
 class Mixin:
 
+    #####################################################
+    #													#
+    #				D E C O R A T O R S  				#
+    # 									 				#
+    #####################################################
+
+    def memoise_group_quantity(f):
+        """
+        This decorator caches the output of the group_* methods with signature
+        (out_allPartTypes, aperture_radius) in the particle cache, keyed by
+        (method, aperture_radius, out_allPartTypes, centre of potential).
+        Entries are dropped by the LRU eviction of the cache, by
+        invalidate_particle_cache and ignored when any particle array is replaced.
+        """
+        @wraps(f)
+        def decorated_function(self, out_allPartTypes: bool = False, aperture_radius: float = None):
+            if aperture_radius is None:
+                aperture_radius = self.r500
+                warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
+            centre = tuple(np.asarray(self.centre_of_potential, dtype=np.float64).tolist())
+            key = (f.__name__, 'all', centre, float(aperture_radius), bool(out_allPartTypes))
+            value = self._cached_group_data(key, lambda: f(self, out_allPartTypes=out_allPartTypes,
+                                                           aperture_radius=aperture_radius))
+            return np.copy(value)
+        return decorated_function
+
     @staticmethod
     def angle_between_vectors(v1, v2):
         """
@@ -49,16 +82,251 @@ class Mixin:
         return angle
 
     def radial_distance_CoP(self, coords):
-        coords = np.asarray(coords)
-        coordinates_radial = np.sqrt(
-            (coords[:, 0] - self.centre_of_potential[0]) ** 2 +
-            (coords[:, 1] - self.centre_of_potential[1]) ** 2 +
-            (coords[:, 2] - self.centre_of_potential[2]) ** 2
-        )
-        return coordinates_radial
+        # Periodic coordinates are already wrapped about the CoP at read time
+        return radial_distance(coords, self.centre_of_potential)
+
+    def particle_cache(self) -> BoundedCache:
+        """
+        Per-cluster cache of radial distances and aperture selections, created on first use.
+        """
+        if not hasattr(self, '_particle_cache'):
+            self._particle_cache = BoundedCache()
+        return self._particle_cache
+
+    def invalidate_particle_cache(self, part_type: str = None) -> None:
+        """
+        Drops the cached radii, aperture selections and group quantities, for one
+        particle type (and the quantities combining all types) or for all.
+        Entries are also ignored automatically when the particle arrays or the
+        centre of potential change, so this is only needed to release memory or
+        after modifying the arrays in place.
+        """
+        if part_type is None:
+            self.particle_cache().clear()
+        else:
+            self.particle_cache().discard(lambda key: key[1] in (part_type, 'all'))
+
+    def _cached_particle_data(self, key: tuple, part_type: str, compute, field: str = 'coordinates'):
+        """
+        Returns the cache entry for `key` if it was computed from the current
+        `field` array (default: coordinates) of `part_type`, otherwise computes
+        and stores it.
+        """
+        source = getattr(self, f'partType{part_type}_{field}')
+        cache = self.particle_cache()
+        entry = cache.get(key)
+        if entry is not None and entry[0]() is source:
+            return entry[1]
+        value = compute(source)
+        cache[key] = (weakref.ref(source), value)
+        return value
+
+    def particle_radii(self, part_type: str, centre: np.ndarray = None) -> np.ndarray:
+        """
+        Distance of the particles of a given type from the centre of potential.
+        Cached per (particle type, centre).
+
+        :param part_type: expect str, e.g. '0' for gas
+        :param centre: default = None (centre of potential), otherwise another centre
+        :return: np.ndarray of shape (N,)
+        """
+        if centre is None:
+            centre = tuple(np.asarray(self.centre_of_potential, dtype=np.float64).tolist())
+            return self._cached_particle_data(('radii', part_type, centre), part_type, self.radial_distance_CoP)
+        centre = tuple(np.asarray(centre, dtype=np.float64).tolist())
+        return self._cached_particle_data(('radii', part_type, centre), part_type,
+                                          lambda coords: radial_distance(coords, centre))
+
+    def aperture_index(self, part_type: str, aperture_radius: float) -> np.ndarray:
+        """
+        Indices of the particles of a given type within the aperture, i.e.
+        np.where(r < aperture_radius)[0]. Cached per (particle type, centre, aperture).
+
+        :param part_type: expect str, e.g. '0' for gas
+        :param aperture_radius: expect float
+        :return: np.ndarray of integers
+        """
+        centre = tuple(np.asarray(self.centre_of_potential, dtype=np.float64).tolist())
+        return self._cached_particle_data(('aperture_index', part_type, centre, float(aperture_radius)), part_type,
+                                          lambda coords: np.where(self.particle_radii(part_type) < aperture_radius)[0])
+
+    def particle_radial_order(self, part_type: str, centre: np.ndarray = None) -> np.ndarray:
+        """
+        Indices that sort the particles of a given type by distance from the
+        centre of potential, shared by the aperture moments and the radial
+        profiles. Cached per (particle type, centre).
+        For another centre, the particles are sorted starting from the order
+        about the centre of potential: for nearby centres the radii are then
+        almost sorted already and the (stable) merge sort runs in close to O(N).
+
+        :param part_type: expect str, e.g. '0' for gas
+        :param centre: default = None (centre of potential), otherwise another centre
+        :return: np.ndarray of integers with shape (N,)
+        """
+        cop = tuple(np.asarray(self.centre_of_potential, dtype=np.float64).tolist())
+        if centre is None or tuple(np.asarray(centre, dtype=np.float64).tolist()) == cop:
+            return self._cached_particle_data(('radial_order', part_type, cop), part_type,
+                                              lambda coords: np.argsort(self.particle_radii(part_type), kind='stable'))
+
+        def presorted_order(coords):
+            presort = self.particle_radial_order(part_type)
+            return presort[np.argsort(self.particle_radii(part_type, centre)[presort], kind='stable')]
+
+        centre = tuple(np.asarray(centre, dtype=np.float64).tolist())
+        return self._cached_particle_data(('radial_order', part_type, centre), part_type, presorted_order)
+
+    def particle_subgroup_order(self, part_type: str) -> np.ndarray:
+        """
+        Indices that stable-sort the particles of a given type by SubGroupNumber,
+        used by the subhalo-resolved reductions (see subhalos.SubhaloGroups).
+        Cached per particle type.
+
+        :param part_type: expect str, e.g. '0' for gas
+        :return: np.ndarray of integers with shape (N,)
+        """
+        return self._cached_particle_data(('subgroup_order', part_type), part_type,
+                                          lambda subgroupnumber: np.argsort(subgroupnumber, kind='stable'),
+                                          field='subgroupnumber')
+
+    def radius_selection(self, part_type: str, r_max: float, r_min: float = None) -> Selection:
+        """
+        Particles of a given type with r_min <= r < r_max from the centre of potential.
+        Without r_min, this is the aperture selection and reuses the cached aperture_index.
+
+        :param part_type: expect str, e.g. '0' for gas
+        :param r_max: expect float
+        :param r_min: default = None (no inner edge)
+        :return: selection.Selection
+        """
+        size = len(getattr(self, f'partType{part_type}_coordinates'))
+        if r_min is None:
+            return Selection.from_index(self.aperture_index(part_type, r_max), size)
+        radii = self.particle_radii(part_type)
+        return Selection.from_mask((radii >= r_min) & (radii < r_max))
+
+    def subgroup_selection(self, part_type: str, subgroupnumber: int = 0) -> Selection:
+        """
+        Particles of a given type with the given SubGroupNumber. The default
+        selects the fuzz, i.e. the particles not bound to substructures.
+        """
+        return Selection.from_mask(getattr(self, f'partType{part_type}_subgroupnumber') == subgroupnumber)
+
+    def temperature_selection(self, t_min: float = None, t_max: float = None) -> Selection:
+        """
+        Gas particles with t_min < T <= t_max. Either bound can be None.
+        """
+        temperature = getattr(self, 'partType0_temperature')
+        mask = np.ones(len(temperature), dtype=bool)
+        if t_min is not None:
+            mask &= temperature > t_min
+        if t_max is not None:
+            mask &= temperature <= t_max
+        return Selection.from_mask(mask)
+
+    def equation_of_state_selection(self) -> Selection:
+        """
+        Gas particles off the equation of state in the phase diagram, i.e. with
+        T > 10^4 K and log10(T) > log10(n_H) / 3 + 13 / 3.
+        """
+        density = self.density_units(getattr(self, 'partType0_sphdensity'), unit_system='nHcgs')
+        temperature = getattr(self, 'partType0_temperature')
+        log_temperature_cut = np.log10(density) / 3 + 13 / 3
+        return Selection.from_mask((temperature > 1e4) & (np.log10(temperature) > log_temperature_cut))
+
+    def named_selection(self, name: str, part_type: str) -> Selection:
+        """
+        The particle selections of the reports (see report_selections), by name:
+
+            'all'     : all the particles
+            'central' : the particles with SubGroupNumber = 0
+            'hot_gas' : the gas with T > 10^5 K, no other particle types
+            'no_eos'  : the gas off the equation of state (equation_of_state_selection),
+                        all the particles of the other types
+
+        :param name: expect str, one of report_selections
+        :param part_type: expect str, e.g. '0' for gas
+        :return: selection.Selection
+        """
+        size = len(getattr(self, f'partType{part_type}_coordinates'))
+        if name == 'all':
+            return Selection.everything(size)
+        elif name == 'central':
+            return self.subgroup_selection(part_type, 0)
+        elif name == 'hot_gas':
+            return self.temperature_selection(t_min=1e5) if part_type == '0' else ~Selection.everything(size)
+        elif name == 'no_eos':
+            return self.equation_of_state_selection() if part_type == '0' else Selection.everything(size)
+        raise ValueError(f"Selection {name} not recognised. Use one of {report_selections}.")
+
+    def _cached_group_data(self, key: tuple, compute):
+        """
+        Returns the cache entry for `key` if it was computed from the current
+        particle arrays of all types, otherwise computes and stores it.
+        """
+        arrays = tuple(getattr(self, f'partType{part_type}_{field}', None)
+                       for part_type in ['0', '1', '4']
+                       for field in ['coordinates', 'mass', 'velocity', 'temperature', 'subgroupnumber'])
+        cache = self.particle_cache()
+        entry = cache.get(key)
+        if entry is not None and all((ref() if ref is not None else None) is array for ref, array in zip(entry[0], arrays)):
+            return entry[1]
+        value = compute()
+        cache[key] = (tuple(weakref.ref(array) if array is not None else None for array in arrays), value)
+        return value
+
+    def group_moments(self, aperture_radius: float) -> np.ndarray:
+        """
+        Mass-weighted moments of the particles within the aperture, accumulated
+        once per particle type (see apertures.accumulate_moments) and summed for
+        the total. The group_* methods for the mass, centre of mass, zero momentum
+        frame, kinetic energy and angular momentum are derived from these.
+        Coordinates are relative to the centre of potential. Cached per (aperture, centre).
+
+        :param aperture_radius: expect float
+        :return: np.ndarray of shape (4, N_MOMENTS + 1), ordered as
+            [total, PartType0, PartType1, PartType4].
+        """
+        from .apertures import accumulate_moments, stack_moments
+
+        def compute():
+            moments = []
+            for part_type in ['0', '1', '4']:
+                assert hasattr(self, f'partType{part_type}_coordinates')
+                assert hasattr(self, f'partType{part_type}_velocity')
+                assert hasattr(self, f'partType{part_type}_mass')
+                selection = self.radius_selection(part_type, aperture_radius)
+                if selection.count == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
+                moments.append(accumulate_moments(
+                        getattr(self, f'partType{part_type}_mass'),
+                        getattr(self, f'partType{part_type}_coordinates'),
+                        getattr(self, f'partType{part_type}_velocity'),
+                        temperature=getattr(self, f'partType{part_type}_temperature', None) if part_type == '0' else None,
+                        subgroupnumber=getattr(self, f'partType{part_type}_subgroupnumber', None),
+                        centre=self.centre_of_potential,
+                        selection=selection
+                )[None, :])
+            return stack_moments(moments)[0]
+
+        centre = tuple(np.asarray(self.centre_of_potential, dtype=np.float64).tolist())
+        return self._cached_group_data(('group_moments', 'all', centre, float(aperture_radius)), compute)
+
+    def group_bulk_quantities(self, aperture_radius: float) -> dict:
+        """
+        Mass, centre of mass, zero momentum frame, kinetic energy and angular
+        momentum within the aperture, derived from group_moments (see
+        apertures.bulk_quantities_from_moments).
+
+        :param aperture_radius: expect float
+        :return: dict of np.ndarray, each ordered as [total, PartType0, PartType1, PartType4].
+        """
+        from .apertures import bulk_quantities_from_moments
+        return bulk_quantities_from_moments(self.group_moments(aperture_radius), self.centre_of_potential)
 
     @staticmethod
     def kinetic_energy(mass, vel):
+        from . import kernels
+        if kernels.NUMBA_AVAILABLE:
+            return kernels.kinetic_energy(mass, vel)
         mass = np.asarray(mass)
         vel = np.asarray(vel)
         ke = 0.5 * mass * np.linalg.norm(vel, axis = 1)**2
@@ -78,6 +346,9 @@ class Mixin:
         RETURNS: type = np.array of 3 doubles
         ACCESS DATA: e.g. group_CoM[0] for getting the x value
         """
+        from . import kernels
+        if kernels.NUMBA_AVAILABLE:
+            return kernels.centre_of_mass(mass, coords)
         mass   = np.asarray(mass)
         coords = np.asarray(coords)
         return np.sum(coords*mass[:, None], axis = 0)/np.sum(mass)
@@ -88,6 +359,9 @@ class Mixin:
         AIM: reads the FoF group central of mass from the path and file given
         RETURNS: type = np.array of 3 doubles
         """
+        from . import kernels
+        if kernels.NUMBA_AVAILABLE:
+            return kernels.zero_momentum_frame(mass, velocity)
         mass     = np.asarray(mass)
         velocity = np.asarray(velocity)
         return np.sum(velocity*mass[:, None], axis = 0)/np.sum(mass)
@@ -104,6 +378,9 @@ class Mixin:
             rest frame. I/e/ take out the bulk peculiar velocity to isolate the rotation.
         :return: np.array with the 3D components of the angular momentum vector.
         """
+        from . import kernels
+        if kernels.NUMBA_AVAILABLE:
+            return kernels.angular_momentum(mass, coords, velocity)
         mass = np.asarray(mass)
         coords = np.asarray(coords)
         velocity = np.asarray(velocity)
@@ -124,6 +401,9 @@ class Mixin:
 
 		:return: np.array with the 3x3 component inertia tensor.
 		"""
+        from . import kernels
+        if kernels.NUMBA_AVAILABLE:
+            return kernels.inertia_tensor(mass, coords)
         m = np.asarray(mass)
         coords = np.asarray(coords)
         x = coords[:, 0]
@@ -148,22 +428,34 @@ class Mixin:
     @staticmethod
     def principal_axes_ellipsoid(inertia_tensor: np.ndarray, eigenvalues: bool = False) -> np.ndarray:
         """
-        Compute the eigenvalues and eigenvectors of the inertia tensor for morphology studies
-        :param inertia_tensor:
-        :return:
+        Compute the eigenvalues and eigenvectors of the inertia tensor for morphology studies.
+        The tensor is symmetric, so the eigenvalues are real and returned in ascending order,
+        with the normalised eigenvectors as the columns of the matrix.
+        :param inertia_tensor: expect np.ndarray of shape (3, 3), or a stack (..., 3, 3)
+        :return: the eigenvectors, or the (eigenvalues, eigenvectors) tuple if eigenvalues=True
         """
-        eigensolution = np.linalg.eig(inertia_tensor)
+        eigensolution = np.linalg.eigh(inertia_tensor)
         return eigensolution if eigenvalues else eigensolution[1]
 
     def generate_apertures(self):
+        return self.aperture_grid(self.r200, self.r500, self.r2500)
+
+    @staticmethod
+    def aperture_grid(r200: float, r500: float, r2500: float) -> np.ndarray:
+        """
+        The 23 apertures of the cluster reports: 4 physical radii, 4 radii
+        scaled to R500 and R2500 and 15 logarithmically spaced radii between
+        R200 and 5 R200. Also used by the streaming reports, which only have
+        the FoF catalogue of the group.
+        """
         physical = [0.1, 0.2, 0.4, 0.8]
         manual = [
-                0.1*self.r500,
-                self.r2500,
-                1.5*self.r2500,
-                self.r500
+                0.1*r500,
+                r2500,
+                1.5*r2500,
+                r500
         ]
-        auto = np.logspace(np.log10(self.r200), np.log10(5 * self.r200), 15).tolist()
+        auto = np.logspace(np.log10(r200), np.log10(5 * r200), 15).tolist()
         all_apertures = physical+manual+auto
         return np.asarray(all_apertures)
 
@@ -198,16 +490,15 @@ class Mixin:
         assert hasattr(self, f'partType{part_type}_coordinates')
         assert hasattr(self, f'partType{part_type}_temperature')
         assert hasattr(self, f'partType{part_type}_mass')
-        radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-        aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-        free_memory(['radial_dist'])
-        mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-        temperature = getattr(self, f'partType{part_type}_temperature')[aperture_radius_index]
-        if mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-        if temperature.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-        mass = self.mass_units(mass, unit_system='SI')
-        return self.thermal_energy(mass, temperature)*np.power(10., -46)
+        selection = self.radius_selection(part_type, aperture_radius)
+        if selection.count == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
+        # The thermal energy is linear in m*T: reduce the selection without copying the fields
+        mass_temperature = selection.sum(getattr(self, f'partType{part_type}_temperature'),
+                                         weights=getattr(self, f'partType{part_type}_mass'))
+        mass_temperature = self.mass_units(mass_temperature, unit_system='SI')
+        return self.thermal_energy(mass_temperature, 1.)*np.power(10., -46)
     
+    @memoise_group_quantity
     def group_kinetic_energy(self,
                              out_allPartTypes: bool =False,
                              aperture_radius: float = None) -> np.ndarray:
@@ -231,58 +522,11 @@ class Mixin:
         :return: expected a numpy array of dimension 1 if all particletypes are combined, or
             dimension 2 if particle types are returned separately.
         """
-        if aperture_radius is None:
-            aperture_radius = self.r500
-            warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
-
-        if out_allPartTypes:
-
-            bulk_velocity = self.group_zero_momentum_frame(aperture_radius=aperture_radius)
-            kinetic_energy_PartTypes = np.zeros(0, dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_velocity')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass     = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                _velocity = getattr(self, f'partType{part_type}_velocity')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _velocity.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                _velocity = np.subtract(_velocity, bulk_velocity)
-                _mass     = self.mass_units(_mass, unit_system='SI')
-                _velocity = self.velocity_units(_velocity, unit_system='SI')
-                kinetic_energy = self.kinetic_energy(_mass, _velocity)
-                kinetic_energy_PartTypes = np.append(kinetic_energy_PartTypes, kinetic_energy)
-
-            return kinetic_energy_PartTypes*np.power(10., -46)
-
-        else:
-            bulk_velocity = self.group_zero_momentum_frame(aperture_radius=aperture_radius)
-            mass = np.zeros(0, dtype=np.float)
-            velocity = np.zeros((0, 3), dtype=np.float)
+        kinetic_energy = self.group_bulk_quantities(aperture_radius)['kinetic_energy']
+        return kinetic_energy[1:] if out_allPartTypes else kinetic_energy[0]
 
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_velocity')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass     = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                _velocity = getattr(self, f'partType{part_type}_velocity')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _velocity.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                mass = np.concatenate((mass, _mass), axis=0)
-                velocity = np.concatenate((velocity, _velocity), axis=0)
-
-            velocity = np.subtract(velocity, bulk_velocity)
-            mass     = self.mass_units(mass, unit_system='SI')
-            velocity = self.velocity_units(velocity, unit_system='SI')
-            return self.kinetic_energy(mass, velocity)*np.power(10., -46)
 
+    @memoise_group_quantity
     def group_mass_aperture(self,
                              out_allPartTypes: bool =False,
                              aperture_radius: float = None) -> np.ndarray:
@@ -300,43 +544,27 @@ class Mixin:
         :return: expected a numpy array of dimension 1 if all particletypes are combined, or
             dimension 2 if particle types are returned separately.
         """
-        if aperture_radius is None:
-            aperture_radius = self.r500
-            warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
-
-        if out_allPartTypes:
-
-            mass_PartTypes = np.zeros(0, dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-
-                sum_of_masses = np.sum(_mass)
-                mass_PartTypes = np.append(mass_PartTypes, sum_of_masses)
+        mass = self.group_bulk_quantities(aperture_radius)['aperture_mass']
+        return mass[1:] if out_allPartTypes else mass[0]
 
-            return mass_PartTypes
 
-        else:
-
-            mass   = np.zeros(0, dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                mass = np.append(mass, _mass)
+    def group_fuzz_mass(self, aperture_radius: float) -> np.ndarray:
+        """
+        Mass of the particles within the aperture with subgroupnumber = 0, for each
+        particle type, reduced over the combined aperture and subgroup selection.
 
-            return np.sum(mass)
+        :param aperture_radius: expect float
+        :return: np.ndarray of shape (3,), ordered as [PartType0, PartType1, PartType4].
+        """
+        fuzz_mass = np.zeros(3, dtype=np.float64)
+        for i, part_type in enumerate(['0', '1', '4']):
+            assert hasattr(self, f'partType{part_type}_coordinates')
+            assert hasattr(self, f'partType{part_type}_subgroupnumber')
+            assert hasattr(self, f'partType{part_type}_mass')
+            selection = self.radius_selection(part_type, aperture_radius) & self.subgroup_selection(part_type, 0)
+            if selection.count == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
+            fuzz_mass[i] = selection.sum(getattr(self, f'partType{part_type}_mass'))
+        return fuzz_mass
 
     def group_substructure_mass(self,
                              out_allPartTypes: bool =False,
@@ -365,47 +593,11 @@ class Mixin:
             aperture_radius = self.r500
             warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
 
+        fuzz_mass = self.group_fuzz_mass(aperture_radius)
+        total_mass = self.group_mass_aperture(out_allPartTypes=out_allPartTypes, aperture_radius=aperture_radius)
         if out_allPartTypes:
-
-            total_mass = self.group_mass_aperture(out_allPartTypes=True, aperture_radius=aperture_radius)
-            substructure_mass_PartTypes = np.zeros(0, dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_subgroupnumber')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                subgroupnumber = getattr(self, f'partType{part_type}_subgroupnumber')
-                aperture_radius_index = np.where((radial_dist < aperture_radius) & (subgroupnumber == 0))[0]
-                free_memory(['radial_dist', 'subgroupnumber'])
-                _mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-
-                fuzz_mass = np.sum(_mass)
-                substructure_mass = total_mass[['0', '1', '4'].index(part_type)] - fuzz_mass
-                substructure_mass_PartTypes = np.append(substructure_mass_PartTypes, substructure_mass)
-
-            return substructure_mass_PartTypes
-
-        else:
-
-            total_mass = self.group_mass_aperture(out_allPartTypes=False, aperture_radius=aperture_radius)
-            fuzz_mass = np.zeros(0, dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_subgroupnumber')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                subgroupnumber = getattr(self, f'partType{part_type}_subgroupnumber')
-                aperture_radius_index = np.where((radial_dist < aperture_radius) & (subgroupnumber == 0))[0]
-                free_memory(['radial_dist', 'subgroupnumber'])
-                _mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                fuzz_mass = np.append(fuzz_mass, _mass)
-
-            substructure_mass = total_mass - np.sum(fuzz_mass)
-            return substructure_mass
+            return total_mass - fuzz_mass
+        return total_mass - np.sum(fuzz_mass)
 
     def group_substructure_fraction(self,
                              out_allPartTypes: bool =False,
@@ -434,48 +626,13 @@ class Mixin:
             aperture_radius = self.r500
             warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
 
+        fuzz_mass = self.group_fuzz_mass(aperture_radius)
+        total_mass = self.group_mass_aperture(out_allPartTypes=out_allPartTypes, aperture_radius=aperture_radius)
         if out_allPartTypes:
+            return 1 - (fuzz_mass/total_mass)
+        return 1 - (np.sum(fuzz_mass)/total_mass)
 
-            total_mass = self.group_mass_aperture(out_allPartTypes=True, aperture_radius=aperture_radius)
-            substructure_frac_PartTypes = np.zeros(0, dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_subgroupnumber')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                subgroupnumber = getattr(self, f'partType{part_type}_subgroupnumber')
-                aperture_radius_index = np.where((radial_dist < aperture_radius) & (subgroupnumber == 0))[0]
-                free_memory(['radial_dist', 'subgroupnumber'])
-                _mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-
-                fuzz_mass = np.sum(_mass)
-                substructure_mass = 1 - (fuzz_mass/total_mass[['0', '1', '4', '5'].index(part_type)])
-                substructure_frac_PartTypes = np.append(substructure_frac_PartTypes, substructure_mass)
-
-            return substructure_frac_PartTypes
-
-        else:
-
-            total_mass = self.group_mass_aperture(out_allPartTypes=False, aperture_radius=aperture_radius)
-            fuzz_mass = np.zeros(0, dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_subgroupnumber')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                subgroupnumber = getattr(self, f'partType{part_type}_subgroupnumber')
-                aperture_radius_index = np.where((radial_dist < aperture_radius) & (subgroupnumber == 0))[0]
-                free_memory(['radial_dist', 'subgroupnumber'])
-                _mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                fuzz_mass = np.append(fuzz_mass, _mass)
-
-            substructure_fraction = 1 - (np.sum(fuzz_mass)/total_mass)
-            return substructure_fraction
-
+    @memoise_group_quantity
     def group_centre_of_mass(self,
                              out_allPartTypes: bool =False,
                              aperture_radius: float = None) -> np.ndarray:
@@ -494,49 +651,9 @@ class Mixin:
         :return: expected a numpy array of dimension 1 if all particletypes are combined, or
             dimension 2 if particle types are returned separately.
         """
-        if aperture_radius is None:
-            aperture_radius = self.r500
-            warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
-
-        if out_allPartTypes:
-
-            CoM_PartTypes = np.zeros((0, 3), dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass   = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                _coords = getattr(self, f'partType{part_type}_coordinates')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _coords.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
+        centre_of_mass = self.group_bulk_quantities(aperture_radius)['centre_of_mass']
+        return centre_of_mass[1:] if out_allPartTypes else centre_of_mass[0]
 
-                centre_of_mass = self.centre_of_mass(_mass, _coords)
-                CoM_PartTypes = np.concatenate((CoM_PartTypes, [centre_of_mass]), axis=0)
-
-            return CoM_PartTypes
-
-        else:
-
-            mass   = np.zeros(0, dtype=np.float)
-            coords = np.zeros((0, 3), dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass   = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                _coords = getattr(self, f'partType{part_type}_coordinates')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _coords.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                mass   = np.concatenate((mass, _mass), axis=0)
-                coords = np.concatenate((coords, _coords), axis=0)
-
-            return self.centre_of_mass(mass, coords)
 
     def group_dynamical_merging_index(self,
                              out_allPartTypes: bool = False,
@@ -572,6 +689,7 @@ class Mixin:
 
         return dynamical_merging_index
 
+    @memoise_group_quantity
     def group_zero_momentum_frame(self,
                              out_allPartTypes: bool = False,
                              aperture_radius: float = None) -> np.ndarray:
@@ -590,53 +708,12 @@ class Mixin:
         :return: expected a numpy array of dimension 1 if all particletypes are combined, or
             dimension 2 if particle types are returned separately.
         """
-        if aperture_radius is None:
-            aperture_radius = self.r500
-            warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
-
-        if out_allPartTypes:
-
-            ZMF_PartTypes = np.zeros((0, 3), dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_velocity')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass     = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                _velocity = getattr(self, f'partType{part_type}_velocity')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _velocity.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-
-                zmf = self.zero_momentum_frame(_mass, _velocity)
-                ZMF_PartTypes = np.concatenate((ZMF_PartTypes, [zmf]), axis=0)
-
-            return ZMF_PartTypes
+        zero_momentum_frame = self.group_bulk_quantities(aperture_radius)['zero_momentum_frame']
+        return zero_momentum_frame[1:] if out_allPartTypes else zero_momentum_frame[0]
 
-        else:
-
-            mass     = np.zeros(0, dtype=np.float)
-            velocity = np.zeros((0, 3), dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_velocity')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass     = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                _velocity = getattr(self, f'partType{part_type}_velocity')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _velocity.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                mass     = np.concatenate((mass, _mass), axis=0)
-                velocity = np.concatenate((velocity, _velocity), axis=0)
-
-            return self.zero_momentum_frame(mass, velocity)
 
 
+    @memoise_group_quantity
     def group_angular_momentum(self,
                              out_allPartTypes: bool = False,
                              aperture_radius: float = None) -> np.ndarray:
@@ -655,63 +732,9 @@ class Mixin:
         :return: expected a numpy array of dimension 1 if all particletypes are combined, or
             dimension 2 if particle types are returned separately.
         """
-        if aperture_radius is None:
-            aperture_radius = self.r500
-            warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
-
-        if out_allPartTypes:
-
-            ANG_PartTypes = np.zeros((0, 3), dtype=np.float)
+        angular_momentum = self.group_bulk_quantities(aperture_radius)['angular_momentum']
+        return angular_momentum[1:] if out_allPartTypes else angular_momentum[0]
 
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_velocity')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass     = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                _coords   = getattr(self, f'partType{part_type}_coordinates')[aperture_radius_index]
-                _velocity = getattr(self, f'partType{part_type}_velocity')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _coords.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _velocity.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-
-                # Rescale coordinates and velocity
-                _coords   = np.subtract(_coords, self.centre_of_potential)
-                _velocity = np.subtract(_velocity, self.group_zero_momentum_frame(aperture_radius=aperture_radius))
-                ang = self.angular_momentum(_mass, _coords, _velocity)
-                ANG_PartTypes = np.concatenate((ANG_PartTypes, [ang]), axis=0)
-
-            return ANG_PartTypes
-
-        else:
-
-            mass     = np.zeros(0, dtype=np.float)
-            coords   = np.zeros((0, 3), dtype=np.float)
-            velocity = np.zeros((0, 3), dtype=np.float)
-
-            for part_type in ['0', '1', '4']:
-                assert hasattr(self, f'partType{part_type}_coordinates')
-                assert hasattr(self, f'partType{part_type}_velocity')
-                assert hasattr(self, f'partType{part_type}_mass')
-                radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-                aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-                free_memory(['radial_dist'])
-                _mass     = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-                _coords   = getattr(self, f'partType{part_type}_coordinates')[aperture_radius_index]
-                _velocity = getattr(self, f'partType{part_type}_velocity')[aperture_radius_index]
-                if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _coords.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                if _velocity.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-                mass     = np.concatenate((mass, _mass), axis=0)
-                coords   = np.concatenate((coords, _coords), axis=0)
-                velocity = np.concatenate((velocity, _velocity), axis=0)
-
-            # Rescale coordinates and velocity
-            coords   = np.subtract(coords, self.centre_of_potential)
-            velocity = np.subtract(velocity, self.group_zero_momentum_frame(aperture_radius=aperture_radius))
-            return self.angular_momentum(mass, coords, velocity)
 
     def group_thermodynamic_merging_index(self,
                                       aperture_radius: float = None) -> np.ndarray:
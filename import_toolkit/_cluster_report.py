@@ -14,11 +14,43 @@ They working principle is based on OOP class inheritance.
 -------------------------------------------------------------------
 """
 
+import functools
 import numpy as np
-from typing import Dict, Union
+from typing import Callable, Dict, List, Union
 from unyt import hydrogen_mass, boltzmann_constant, gravitational_constant, parsec, solar_mass
 import warnings
 
+from .apertures import (
+	RadialMoments,
+	accumulate_moments,
+	dynamics_keys,
+	morphology_keys,
+	stack_moments,
+	dynamics_from_moments,
+	morphology_from_moments,
+	split_apertures,
+	report_warnings,
+	bulk_quantities_from_moments,
+	selection_enclosed_moments,
+)
+from ._cluster_profiler import report_selections
+from .profiles import RadialProfiles, profile_bins
+from .subhalos import SubhaloGroups, merge_subhalo_moments, subhalo_quantities_from_moments, catalogue_substructure
+from .gravity import (
+	THETA,
+	aperture_pair_energies,
+	potential_energy_from_pairs,
+	potential_energy_factor,
+	virial_ratio,
+	tree_accuracy,
+)
+from .shapes import TOLERANCE, MAX_ITERATIONS, iterative_shapes
+from .bootstrap import N_REPLICAS, bootstrap_enclosed_moments, stack_replica_moments, vectors_from_moments
+from .jackknife import N_BLOCKS, jackknife_blocks, leave_one_out, jackknife_error
+from .phase_table import TEMPERATURE_EDGES, PhaseTable
+from .centres import centre_names, shrinking_sphere, most_bound_particle
+from .sz import SZ_TEMPERATURE_CUT, LINES_OF_SIGHT, spherical_sz, cylindrical_sz, unit_lines_of_sight
+
 # Delete the units from Unyt constants
 hydrogen_mass = float(hydrogen_mass.value)
 boltzmann_constant = float(boltzmann_constant.value)
@@ -72,6 +104,9 @@ class Mixin:
 				triaxiality = (a**2-b**2)/(a**2-c**2)
 			-Circularity 1x np.float:
 				circularity = c/a
+			- Potential energy 1x np.float (see group_potential_energy)
+			- Virial ratio 1x np.float:
+				virial_ratio = 2 * kinetic_energy / |potential_energy|
 
 		Each of these datasets is structured as follows:
 
@@ -91,223 +126,11 @@ class Mixin:
 			aperture_radius = self.r500
 			warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:2.2f} Mpc.')
 
-		mass = np.zeros(0, dtype=np.float)
-		coords = np.zeros((0, 3), dtype=np.float)
-		velocity = np.zeros((0, 3), dtype=np.float)
-		temperature = np.zeros(0, dtype=np.float)
-
-		N_particles = np.zeros(0, dtype=np.int)
-		aperture_mass = np.zeros(0, dtype=np.float)
-		centre_of_mass = np.zeros((0, 3), dtype=np.float)
-		zero_momentum_frame = np.zeros((0, 3), dtype=np.float)
-		angular_momentum = np.zeros((0, 3), dtype=np.float)
-		angular_velocity = np.zeros((0, 3), dtype=np.float)
-		specific_angular_momentum = np.zeros(0, dtype=np.float)
-		circular_velocity = np.zeros(0, dtype=np.float)
-		spin_parameter = np.zeros(0, dtype=np.float)
-		substructure_mass = np.zeros(0, dtype=np.float)
-		substructure_fraction = np.zeros(0, dtype=np.float)
-		thermal_energy = np.zeros(0, dtype=np.float)
-		kinetic_energy = np.zeros(0, dtype=np.float)
-		dynamical_merging_index = np.zeros(0, dtype=np.float)
-		thermodynamic_merging_index = np.zeros(0, dtype=np.float)
-
-		for part_type in ['4', '1', '0']:
-			assert hasattr(self, f'partType{part_type}_coordinates')
-			assert hasattr(self, f'partType{part_type}_velocity')
-			assert hasattr(self, f'partType{part_type}_mass')
-			if part_type is '0': assert hasattr(self, f'partType{part_type}_temperature')
-			assert hasattr(self, f'partType{part_type}_subgroupnumber')
-			radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-			aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-			del radial_dist
-			_mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-			_velocity = getattr(self, f'partType{part_type}_velocity')[aperture_radius_index]
-			_coords = getattr(self, f'partType{part_type}_coordinates')[aperture_radius_index]
-			_temperature = getattr(self, f'partType{part_type}_temperature')[aperture_radius_index] if part_type is '0' else np.array([])
-			_subgroupnumber = getattr(self, f'partType{part_type}_subgroupnumber')[aperture_radius_index]
-			if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-			if _velocity.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-			if _coords.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-			if part_type is '0' and _temperature.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-			if _subgroupnumber.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-
-			mass = np.concatenate((mass, _mass), axis=0)
-			coords = np.concatenate((coords, _coords), axis=0)
-			velocity = np.concatenate((velocity, _velocity), axis=0)
-			temperature = np.concatenate((temperature, _temperature), axis=0)
-
-			_N_particles = len(_mass)
-			N_particles = np.append(N_particles, _N_particles)
-
-			_aperture_mass = np.sum(_mass)
-			aperture_mass = np.append(aperture_mass, _aperture_mass)
-
-			_coords_norm = np.subtract(_coords, self.centre_of_potential)
-			_centre_of_mass = self.centre_of_mass(_mass, _coords)
-			centre_of_mass = np.concatenate((centre_of_mass, _centre_of_mass[None, :]), axis=0)
-
-			_zero_momentum_frame = self.zero_momentum_frame(_mass, _velocity)
-			zero_momentum_frame = np.concatenate((zero_momentum_frame, _zero_momentum_frame[None, :]), axis=0)
-
-			_velocity_norm = np.subtract(_velocity, _zero_momentum_frame)
-			_angular_momentum = self.angular_momentum(_mass, _coords_norm, _velocity_norm)
-			angular_momentum = np.concatenate((angular_momentum, _angular_momentum[None, :]), axis=0)
-
-			_angular_velocity = np.linalg.inv(self.inertia_tensor(_mass, _coords_norm)) @ _angular_momentum
-			angular_velocity = np.concatenate((angular_velocity, _angular_velocity[None, :]), axis=0)
-
-			_specific_angular_momentum = np.linalg.norm(_angular_momentum) / _aperture_mass
-			specific_angular_momentum = np.append(specific_angular_momentum, _specific_angular_momentum)
-
-			_circular_velocity = np.sqrt(G_astro * _aperture_mass / aperture_radius)
-			circular_velocity = np.append(circular_velocity, _circular_velocity)
-
-			_spin_parameter = np.linalg.norm(_angular_momentum) / (_aperture_mass * aperture_radius * _circular_velocity * np.sqrt(2))
-			spin_parameter = np.append(spin_parameter, _spin_parameter)
-
-			sgn_index = np.where(_subgroupnumber == 0)[0]
-			_substructure_mass = _aperture_mass - np.sum(_mass[sgn_index])
-			substructure_mass = np.append(substructure_mass, _substructure_mass)
-
-			_substructure_fraction = _substructure_mass / _aperture_mass
-			substructure_fraction = np.append(substructure_fraction, _substructure_fraction)
-
-			_thermal_energy = self.thermal_energy(self.mass_units(_mass), _temperature) * np.power(10., -46) if part_type is '0' else 0.
-			thermal_energy = np.append(thermal_energy, _thermal_energy)
-
-			_kinetic_energy = self.kinetic_energy(self.mass_units(_mass), self.velocity_units(_velocity_norm)) * np.power(10., -46)
-			kinetic_energy = np.append(kinetic_energy, _kinetic_energy)
-
-			_dynamical_merging_index = np.linalg.norm(self.centre_of_potential - _centre_of_mass) / aperture_radius
-			dynamical_merging_index = np.append(dynamical_merging_index, _dynamical_merging_index)
-
-			_thermodynamic_merging_index = _kinetic_energy / _thermal_energy if part_type is '0' else 0.
-			thermodynamic_merging_index = np.append(thermodynamic_merging_index, _thermodynamic_merging_index)
-
-			del _mass
-			del _N_particles
-			del _velocity
-			del _coords
-			del _temperature
-			del _subgroupnumber
-			del _aperture_mass
-			del _coords_norm
-			del _centre_of_mass
-			del _zero_momentum_frame
-			del _velocity_norm
-			del _angular_momentum
-			del _angular_velocity
-			del _specific_angular_momentum
-			del _circular_velocity
-			del _spin_parameter
-			del sgn_index
-			del _substructure_mass
-			del _substructure_fraction
-			del _thermal_energy
-			del _kinetic_energy
-			del _dynamical_merging_index
-			del _thermodynamic_merging_index
-
-		_N_particles = len(mass)
-		N_particles = np.append(N_particles, _N_particles)
-
-		_aperture_mass = np.sum(mass)
-		aperture_mass = np.append(aperture_mass, _aperture_mass)
-
-		coords_norm = np.subtract(coords, self.centre_of_potential)
-		_centre_of_mass = self.centre_of_mass(mass, coords)
-		centre_of_mass = np.concatenate((centre_of_mass, _centre_of_mass[None, :]), axis=0)
-
-		_zero_momentum_frame = self.zero_momentum_frame(mass, velocity)
-		zero_momentum_frame = np.concatenate((zero_momentum_frame, _zero_momentum_frame[None, :]), axis=0)
-
-		velocity_norm = np.subtract(velocity, _zero_momentum_frame)
-		_angular_momentum = self.angular_momentum(mass, coords_norm, velocity_norm)
-		angular_momentum = np.concatenate((angular_momentum, _angular_momentum[None, :]), axis=0)
-
-		_angular_velocity = np.linalg.inv(self.inertia_tensor(mass, coords_norm)) @ _angular_momentum
-		angular_velocity = np.concatenate((angular_velocity, _angular_velocity[None, :]), axis=0)
-
-		_specific_angular_momentum = np.linalg.norm(_angular_momentum) / _aperture_mass
-		specific_angular_momentum = np.append(specific_angular_momentum, _specific_angular_momentum)
-
-		_circular_velocity = np.sqrt(G_astro * _aperture_mass / aperture_radius)
-		circular_velocity = np.append(circular_velocity, _circular_velocity)
-
-		_spin_parameter = np.linalg.norm(_angular_momentum) / (_aperture_mass * aperture_radius * _circular_velocity * np.sqrt(2))
-		spin_parameter = np.append(spin_parameter, _spin_parameter)
-
-		_substructure_mass = np.sum(substructure_mass)
-		substructure_mass = np.append(substructure_mass, _substructure_mass)
-
-		_substructure_fraction = _substructure_mass / _aperture_mass
-		substructure_fraction = np.append(substructure_fraction, _substructure_fraction)
-
-		_thermal_energy = np.sum(thermal_energy)
-		thermal_energy = np.append(thermal_energy, _thermal_energy)
-
-		_kinetic_energy = self.kinetic_energy(self.mass_units(mass), self.velocity_units(velocity_norm)) * np.power(10., -46)
-		kinetic_energy = np.append(kinetic_energy, _kinetic_energy)
-
-		_dynamical_merging_index = np.linalg.norm(self.centre_of_potential - _centre_of_mass) / aperture_radius
-		dynamical_merging_index = np.append(dynamical_merging_index, _dynamical_merging_index)
-
-		_thermodynamic_merging_index = np.sum(thermodynamic_merging_index)
-		thermodynamic_merging_index = np.append(thermodynamic_merging_index, _thermodynamic_merging_index)
-
-		del _N_particles
-		del mass
-		del coords
-		del velocity
-		del temperature
-		del _aperture_mass
-		del coords_norm
-		del _centre_of_mass
-		del _zero_momentum_frame
-		del velocity_norm
-		del _angular_momentum
-		del _angular_velocity
-		del _specific_angular_momentum
-		del _circular_velocity
-		del _spin_parameter
-		del _substructure_mass
-		del _substructure_fraction
-		del _thermal_energy
-		del _kinetic_energy
-		del _dynamical_merging_index
-		del _thermodynamic_merging_index
-
-		dynamic_dict = {
-				'N_particles'                : N_particles[::-1],
-				'aperture_mass'              : aperture_mass[::-1],
-				'centre_of_mass'             : centre_of_mass[::-1],
-				'zero_momentum_frame'        : zero_momentum_frame[::-1],
-				'angular_momentum'           : angular_momentum[::-1],
-				'angular_velocity'           : angular_velocity[::-1],
-				'specific_angular_momentum'  : specific_angular_momentum[::-1],
-				'circular_velocity'          : circular_velocity[::-1],
-				'spin_parameter'             : spin_parameter[::-1],
-				'substructure_mass'          : substructure_mass[::-1],
-				'substructure_fraction'      : substructure_fraction[::-1],
-				'thermal_energy'             : thermal_energy[::-1],
-				'kinetic_energy'             : kinetic_energy[::-1],
-				'dynamical_merging_index'    : dynamical_merging_index[::-1],
-				'thermodynamic_merging_index': thermodynamic_merging_index[::-1]
-		}
-
-		# WARNINGS
-		if dynamic_dict['N_particles'][0] == 0:
-			warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | N_particles is 0. No particles detected.')
-		if dynamic_dict['aperture_mass'][0] == 0:
-			warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | aperture_mass is 0. No mass enclosed.')
-		if dynamic_dict['dynamical_merging_index'][0] > 1:
-			warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | dynamical_merging_index larger than 1.')
-		if dynamic_dict['thermodynamic_merging_index'][0] > 1:
-			warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | thermodynamic_merging_index larger than 1.')
-		if dynamic_dict['substructure_fraction'][0] > 1:
-			warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | substructure_fraction larger than 1.')
-
+		report = self.group_report(aperture_radius=aperture_radius)
+		dynamic_dict = {key: report[key] for key in dynamics_keys}
+		dynamic_dict['potential_energy'] = self.aperture_potential_energy(aperture_radius)
+		dynamic_dict['virial_ratio'] = virial_ratio(dynamic_dict['kinetic_energy'], dynamic_dict['potential_energy'])
+		report_warnings(dynamic_dict, aperture_radius)
 		return dynamic_dict
 
 	def group_morphology(self, aperture_radius: float = None) -> Dict[str, np.ndarray]:
@@ -352,111 +175,769 @@ class Mixin:
 			aperture_radius = self.r500
 			warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
 
-		mass = np.zeros(0, dtype=np.float)
-		coords = np.zeros((0, 3), dtype=np.float)
-		inertia_tensor = np.zeros((0, 9), dtype=np.float)
-		eigenvalues = np.zeros((0, 3), dtype=np.float)
-		eigenvectors = np.zeros((0, 9), dtype=np.float)
-		triaxiality = np.zeros(0, dtype=np.float)
-		sphericity = np.zeros(0, dtype=np.float)
-		elongation = np.zeros(0, dtype=np.float)
+		report = self.group_report(aperture_radius=aperture_radius)
+		morphology_dict = {key: report[key] for key in morphology_keys}
+		report_warnings(morphology_dict, aperture_radius)
+		return morphology_dict
+
+	def group_report(self, aperture_radius: float = None) -> Dict[str, np.ndarray]:
+		"""
+		Fused kernel for group_dynamics and group_morphology. For each particle type,
+		the particles within the aperture are traversed once to accumulate all the
+		moments both methods need (see apertures.accumulate_moments); the two sets
+		of datasets are then derived from the shared moments, including the inertia
+		tensor used for both the angular velocity and the principal axes.
 
-		for part_type in ['4', '1', '0']:
+		:param aperture_radius: default = None (R500)
+		:return: dict with the keys of group_dynamics and group_morphology, each
+			structured as [total, PartType0, PartType1, PartType4].
+		"""
+		if aperture_radius is None:
+			aperture_radius = self.r500
+			warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
+
+		moments = []
+		for part_type in ['0', '1', '4']:
 			assert hasattr(self, f'partType{part_type}_coordinates')
+			assert hasattr(self, f'partType{part_type}_velocity')
 			assert hasattr(self, f'partType{part_type}_mass')
-			radial_dist = self.radial_distance_CoP(getattr(self, f'partType{part_type}_coordinates'))
-			aperture_radius_index = np.where(radial_dist < aperture_radius)[0]
-			del radial_dist
-			_mass = getattr(self, f'partType{part_type}_mass')[aperture_radius_index]
-			_coords = getattr(self, f'partType{part_type}_coordinates')[aperture_radius_index]
-			if _mass.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-			if _coords.__len__() == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
-			_coords = np.subtract(_coords, self.centre_of_potential)
-			mass = np.concatenate((mass, _mass), axis=0)
-			coords = np.concatenate((coords, _coords), axis=0)
-
-			_inertia_tensor = self.inertia_tensor(_mass, _coords)
-			inertia_tensor = np.concatenate((inertia_tensor, _inertia_tensor.ravel()[None, :]), axis=0)
-
-			_eigenvalues, _eigenvectors = self.principal_axes_ellipsoid(_inertia_tensor, eigenvalues=True)
-			_eigenvalues /= np.sum(_mass)
-			# Sort eigenvalues from largest to smallest
-			_eigenvalues_sorted = np.sort(_eigenvalues)[::-1]
-			_eigenvectors_sorted = np.zeros_like(_eigenvectors)
-			for counter, val in np.ndenumerate(_eigenvalues_sorted):
-				index = np.where(_eigenvalues == val)[0]
-				_eigenvectors_sorted[counter] = _eigenvectors[index]
-
-			eigenvalues = np.concatenate((eigenvalues, _eigenvalues_sorted[None, :]), axis=0)
-			eigenvectors = np.concatenate((eigenvectors, _eigenvectors_sorted.ravel()[None, :]), axis=0)
-
-			_triaxiality = (_eigenvalues_sorted[0] - _eigenvalues_sorted[1]) / (_eigenvalues_sorted[0] - _eigenvalues_sorted[2])
-			triaxiality = np.append(triaxiality, _triaxiality)
-
-			_sphericity = np.sqrt(_eigenvalues_sorted[2]) / np.sqrt(_eigenvalues_sorted[0])
-			sphericity = np.append(sphericity, _sphericity)
-
-			_elongation = np.sqrt(_eigenvalues_sorted[1]) / np.sqrt(_eigenvalues_sorted[0])
-			elongation = np.append(elongation, _elongation)
-
-			del _mass
-			del _coords
-			del _inertia_tensor
-			del _eigenvalues
-			del _eigenvalues_sorted
-			del _eigenvectors_sorted
-			del _triaxiality
-			del _sphericity
-			del _elongation
-
-		_inertia_tensor = self.inertia_tensor(mass, coords)
-		inertia_tensor = np.concatenate((inertia_tensor, _inertia_tensor.ravel()[None, :]), axis=0)
-
-		_eigenvalues, _eigenvectors = self.principal_axes_ellipsoid(_inertia_tensor, eigenvalues=True)
-		_eigenvalues /= np.sum(mass)
-		# Sort eigenvalues from largest to smallest
-		_eigenvalues_sorted = np.sort(_eigenvalues)[::-1]
-		_eigenvectors_sorted = np.zeros_like(_eigenvectors)
-		for counter, val in np.ndenumerate(_eigenvalues_sorted):
-			index = np.where(_eigenvalues == val)[0]
-			_eigenvectors_sorted[counter] = _eigenvectors[index]
-		eigenvalues = np.concatenate((eigenvalues, _eigenvalues_sorted[None, :]), axis=0)
-		eigenvectors = np.concatenate((eigenvectors, _eigenvectors_sorted.ravel()[None, :]), axis=0)
-
-		_triaxiality = (_eigenvalues_sorted[0] - _eigenvalues_sorted[1]) / (_eigenvalues_sorted[0] - _eigenvalues_sorted[2])
-		triaxiality = np.append(triaxiality, _triaxiality)
-
-		_sphericity = np.sqrt(_eigenvalues_sorted[2]) / np.sqrt(_eigenvalues_sorted[0])
-		sphericity = np.append(sphericity, _sphericity)
-
-		_elongation = np.sqrt(_eigenvalues_sorted[1]) / np.sqrt(_eigenvalues_sorted[0])
-		elongation = np.append(elongation, _elongation)
-
-		del mass
-		del coords
-		del _inertia_tensor
-		del _eigenvalues
-		del _eigenvalues_sorted
-		del _eigenvectors_sorted
-		del _triaxiality
-		del _sphericity
-		del _elongation
-
-		morphology_dict = {
-				'inertia_tensor': inertia_tensor[::-1],
-				'eigenvalues'   : eigenvalues[::-1],
-				'eigenvectors'  : eigenvectors[::-1],
-				'triaxiality'   : triaxiality[::-1],
-				'sphericity'    : sphericity[::-1],
-				'elongation'    : elongation[::-1],
+			assert hasattr(self, f'partType{part_type}_subgroupnumber')
+			if part_type == '0': assert hasattr(self, f'partType{part_type}_temperature')
+			selection = self.radius_selection(part_type, aperture_radius)
+			if selection.count == 0: warnings.warn(f"Array PartType{part_type} is empty - check filtering.")
+			moments.append(accumulate_moments(
+					getattr(self, f'partType{part_type}_mass'),
+					getattr(self, f'partType{part_type}_coordinates'),
+					getattr(self, f'partType{part_type}_velocity'),
+					temperature=getattr(self, f'partType{part_type}_temperature') if part_type == '0' else None,
+					subgroupnumber=getattr(self, f'partType{part_type}_subgroupnumber'),
+					centre=self.centre_of_potential,
+					selection=selection
+			)[None, :])
+
+		moments = stack_moments(moments)
+		report = {
+				**dynamics_from_moments(moments, [aperture_radius], self.centre_of_potential),
+				**morphology_from_moments(moments)
 		}
+		return split_apertures(report)[0]
 
-		# WARNINGS
-		if morphology_dict['triaxiality'][0] > 1:
-			warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | triaxiality larger than 1.')
-		if morphology_dict['sphericity'][0] > 1:
-			warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | sphericity larger than 1.')
-		if morphology_dict['elongation'][0] > 1:
-			warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | elongation larger than 1.')
+	def radial_moments(self, part_type: str) -> RadialMoments:
+		"""
+		Sorts the particles of one type by distance from the centre of potential
+		and builds their cumulative moments (see apertures.RadialMoments).
 
-		return morphology_dict
\ No newline at end of file
+		:param part_type: expect str
+			The particle type, e.g. '0' for gas.
+		:return: RadialMoments
+		"""
+		assert hasattr(self, f'partType{part_type}_coordinates')
+		assert hasattr(self, f'partType{part_type}_velocity')
+		assert hasattr(self, f'partType{part_type}_mass')
+		assert hasattr(self, f'partType{part_type}_subgroupnumber')
+		if part_type == '0': assert hasattr(self, f'partType{part_type}_temperature')
+		return RadialMoments(
+				self.particle_radii(part_type),
+				getattr(self, f'partType{part_type}_mass'),
+				getattr(self, f'partType{part_type}_coordinates'),
+				getattr(self, f'partType{part_type}_velocity'),
+				temperature=getattr(self, f'partType{part_type}_temperature') if part_type == '0' else None,
+				subgroupnumber=getattr(self, f'partType{part_type}_subgroupnumber'),
+				centre=self.centre_of_potential,
+				order=self.particle_radial_order(part_type)
+		)
+
+	def group_report_apertures(self,
+	                           apertures: np.ndarray = None,
+	                           potential_energy: bool = False) -> List[Dict[str, np.ndarray]]:
+		"""
+		Computes the group_dynamics and group_morphology datasets for a grid of
+		apertures at once. Each particle type is sorted by radius only once and all
+		apertures are then derived from the cumulative moments, instead of selecting
+		the particles again for every aperture and every method.
+
+		:param apertures: default = None (self.generate_apertures())
+		:param potential_energy: default = False
+			True adds potential_energy and virial_ratio (see group_potential_energy),
+			from an octree of all the particles: far slower than the moments.
+		:return: list of dict, one per aperture, with the same keys and
+			[total, PartType0, PartType1, PartType4] layout as
+			{**group_dynamics(r), **group_morphology(r)}, but potential_energy and
+			virial_ratio unless requested.
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+
+		moments = stack_moments([self.radial_moments(part_type).enclosed(apertures) for part_type in ['0', '1', '4']])
+		reports = split_apertures({
+				**dynamics_from_moments(moments, apertures, self.centre_of_potential),
+				**morphology_from_moments(moments)
+		})
+		if potential_energy:
+			for report, energy in zip(reports, self.group_potential_energy(apertures)):
+				report['potential_energy'] = energy
+				report['virial_ratio'] = virial_ratio(report['kinetic_energy'], energy)
+		for aperture_radius, report in zip(apertures, reports):
+			report_warnings(report, aperture_radius)
+		return reports
+
+	def group_report_selections(self,
+	                            selections: Union[List[str], Dict[str, Callable]] = report_selections,
+	                            apertures: np.ndarray = None) -> List[Dict[str, np.ndarray]]:
+		"""
+		Computes the group_report_apertures datasets for several particle selections
+		at once, e.g. all particles, the central subhalo only and the hot gas only.
+		Each particle type is traversed once in radial order for all the selections
+		(see apertures.selection_enclosed_moments), instead of once per selection.
+
+		:param selections: default = ('all', 'central', 'hot_gas', 'no_eos')
+			Either names of named_selection, or a dict {name: function}, where the
+			function takes the particle type (e.g. '0') and returns a selection.Selection.
+		:param apertures: default = None (self.generate_apertures())
+		:return: list of dict, one per aperture, with the keys of group_report_apertures
+			and a leading selection axis: each dataset has shape (N_selections, 4, ...),
+			and the `selections` dataset holds the names of the selections.
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+		if not isinstance(selections, dict):
+			selections = {name: functools.partial(self.named_selection, name) for name in selections}
+
+		moments = []
+		for part_type in ['0', '1', '4']:
+			assert hasattr(self, f'partType{part_type}_coordinates')
+			assert hasattr(self, f'partType{part_type}_velocity')
+			assert hasattr(self, f'partType{part_type}_mass')
+			assert hasattr(self, f'partType{part_type}_subgroupnumber')
+			if part_type == '0': assert hasattr(self, f'partType{part_type}_temperature')
+			moments.append(selection_enclosed_moments(
+					self.particle_radii(part_type),
+					getattr(self, f'partType{part_type}_mass'),
+					getattr(self, f'partType{part_type}_coordinates'),
+					getattr(self, f'partType{part_type}_velocity'),
+					apertures,
+					[select(part_type) for select in selections.values()],
+					temperature=getattr(self, f'partType{part_type}_temperature') if part_type == '0' else None,
+					subgroupnumber=getattr(self, f'partType{part_type}_subgroupnumber'),
+					centre=self.centre_of_potential,
+					order=self.particle_radial_order(part_type)
+			))
+
+		# (N_apertures, N_selections, 4, N_moments + 1)
+		moments = stack_moments(moments)
+		reports = split_apertures({
+				**dynamics_from_moments(moments, apertures, self.centre_of_potential),
+				**morphology_from_moments(moments)
+		})
+		for aperture_radius, report in zip(apertures, reports):
+			for s, name in enumerate(selections):
+				report_warnings({key: value[s] for key, value in report.items()}, aperture_radius, label=name)
+			report['selections'] = np.array(list(selections.keys()))
+		return reports
+
+	def group_centres(self,
+	                  centres: List[str] = centre_names,
+	                  radius: float = None,
+	                  theta: float = THETA,
+	                  softening: float = 0.) -> Dict[str, np.ndarray]:
+		"""
+		Computes several definitions of the centre of the cluster (see centres.py).
+		The particles of all types within `radius` of the centre of potential are
+		gathered once, from the cached aperture selections, and shared by the
+		shrinking sphere and the most-bound particle:
+
+			'cop'              : the centre of potential
+			'com'              : the centre of mass of the particles within R500
+			'shrinking_sphere' : the shrinking-sphere centre, from the sphere of `radius`
+			'most_bound'       : the DM particle with the deepest potential within
+			                     0.1 * radius of the centre of potential
+
+		:param centres: default = ('cop', 'com', 'shrinking_sphere', 'most_bound')
+		:param radius: default = None (R500)
+		:param theta: expect float, the opening angle of the octree
+		:param softening: expect float, Plummer softening length
+		:return: dict {name: np.ndarray with 3 components}
+		"""
+		if radius is None:
+			radius = self.r500
+		for name in centres:
+			if name not in centre_names:
+				raise ValueError(f"Centre {name} not recognised. Use one of {centre_names}.")
+
+		mass, coords, dark_matter = [], [], []
+		for part_type in ['0', '1', '4']:
+			assert hasattr(self, f'partType{part_type}_coordinates')
+			assert hasattr(self, f'partType{part_type}_mass')
+			index = self.aperture_index(part_type, radius)
+			mass.append(getattr(self, f'partType{part_type}_mass')[index])
+			coords.append(getattr(self, f'partType{part_type}_coordinates')[index])
+			dark_matter.append(np.full(len(index), part_type == '1'))
+		mass, coords, dark_matter = np.concatenate(mass), np.concatenate(coords), np.concatenate(dark_matter)
+
+		centre_dict = {}
+		for name in centres:
+			if name == 'cop':
+				centre_dict[name] = np.asarray(self.centre_of_potential, dtype=np.float64)
+			elif name == 'com':
+				selections = [self.radius_selection(part_type, self.r500) for part_type in ['0', '1', '4']]
+				total_mass = sum(selection.sum(getattr(self, f'partType{part_type}_mass'))
+				                 for selection, part_type in zip(selections, ['0', '1', '4']))
+				centre_dict[name] = sum(selection.sum(getattr(self, f'partType{part_type}_coordinates'),
+				                                      weights=getattr(self, f'partType{part_type}_mass'))
+				                        for selection, part_type in zip(selections, ['0', '1', '4'])) / total_mass
+			elif name == 'shrinking_sphere':
+				centre_dict[name] = shrinking_sphere(mass, coords, self.centre_of_potential, radius)[0]
+			elif name == 'most_bound':
+				core = np.linalg.norm(coords - self.centre_of_potential, axis=1) < 0.1 * radius
+				index = most_bound_particle(mass, coords, np.flatnonzero(dark_matter & core), theta=theta,
+				                            softening=softening)
+				centre_dict[name] = np.asarray(coords[index], dtype=np.float64)
+		return centre_dict
+
+	def group_report_centres(self,
+	                         centres: Union[List[str], Dict[str, np.ndarray]] = centre_names,
+	                         apertures: np.ndarray = None) -> List[Dict[str, np.ndarray]]:
+		"""
+		Computes the group_report_apertures datasets about several centres at once. The
+		particle arrays are loaded once: for each centre the radii are computed and the
+		particles are sorted starting from the cached order about the centre of potential
+		(see particle_radial_order), which is almost sorted for nearby centres.
+
+		:param centres: default = ('cop', 'com', 'shrinking_sphere', 'most_bound')
+			Either names of group_centres, or a dict {name: coordinates of the centre}.
+		:param apertures: default = None (self.generate_apertures())
+		:return: list of dict, one per aperture, with the keys of group_report_apertures
+			and a leading centre axis: each dataset has shape (N_centres, 4, ...). The
+			`centres` dataset holds the names and `centre_coordinates` the (N_centres, 3)
+			coordinates of the centres.
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+		if not isinstance(centres, dict):
+			centres = self.group_centres(centres)
+		centre_coordinates = np.array([np.asarray(centre, dtype=np.float64) for centre in centres.values()])
+
+		moments = []
+		for centre in centre_coordinates:
+			centre_moments = []
+			for part_type in ['0', '1', '4']:
+				assert hasattr(self, f'partType{part_type}_coordinates')
+				assert hasattr(self, f'partType{part_type}_velocity')
+				assert hasattr(self, f'partType{part_type}_mass')
+				assert hasattr(self, f'partType{part_type}_subgroupnumber')
+				if part_type == '0': assert hasattr(self, f'partType{part_type}_temperature')
+				centre_moments.append(RadialMoments(
+						self.particle_radii(part_type, centre),
+						getattr(self, f'partType{part_type}_mass'),
+						getattr(self, f'partType{part_type}_coordinates'),
+						getattr(self, f'partType{part_type}_velocity'),
+						temperature=getattr(self, f'partType{part_type}_temperature') if part_type == '0' else None,
+						subgroupnumber=getattr(self, f'partType{part_type}_subgroupnumber'),
+						centre=centre,
+						order=self.particle_radial_order(part_type, centre)
+				).enclosed(apertures))
+			moments.append(stack_moments(centre_moments))
+
+		# (N_apertures, N_centres, 4, N_moments + 1)
+		moments = np.stack(moments, axis=1)
+		reports = split_apertures({
+				**dynamics_from_moments(moments, apertures, centre_coordinates[:, None, :]),
+				**morphology_from_moments(moments)
+		})
+		for report in reports:
+			report['centres'] = np.array(list(centres.keys()))
+			report['centre_coordinates'] = centre_coordinates
+		return reports
+
+	def group_bulk_quantities_jackknife(self,
+	                                    apertures: np.ndarray = None,
+	                                    n_blocks: int = N_BLOCKS,
+	                                    method: str = 'spatial',
+	                                    seed: int = None) -> Dict[str, np.ndarray]:
+		"""
+		Delete-one-block jackknife errors of the bulk quantities (see
+		group_bulk_quantities) for a grid of apertures. The moments of every block
+		are accumulated in one pass over each particle type (see jackknife.py and
+		subhalos.SubhaloGroups, with the blocks in place of the subhalos) and every
+		leave-one-out sample is the total minus one block.
+
+		:param apertures: default = None (self.generate_apertures())
+		:param n_blocks: expect int
+		:param method: expect 'spatial' (azimuthal wedges) or 'random'
+		:param seed: default = None, otherwise int for the random blocks
+		:return: dict with keys aperture_mass_err, centre_of_mass_err,
+			zero_momentum_frame_err, kinetic_energy_err and angular_momentum_err, each
+			with leading dimensions (N_apertures, 4) and the second axis
+			[total, PartType0, PartType1, PartType4].
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+
+		rng = np.random.default_rng(seed)
+		groups = []
+		moments = []
+		for part_type in ['0', '1', '4']:
+			assert hasattr(self, f'partType{part_type}_coordinates')
+			assert hasattr(self, f'partType{part_type}_velocity')
+			assert hasattr(self, f'partType{part_type}_mass')
+			coords = getattr(self, f'partType{part_type}_coordinates')
+			group = SubhaloGroups(jackknife_blocks(coords, n_blocks=n_blocks, centre=self.centre_of_potential,
+			                                       method=method, rng=rng))
+			moments.append(group.enclosed_moments(
+					self.particle_radii(part_type),
+					apertures,
+					getattr(self, f'partType{part_type}_mass'),
+					coords,
+					getattr(self, f'partType{part_type}_velocity'),
+					centre=self.centre_of_potential
+			))
+			groups.append(group)
+
+		# (N_apertures, N_blocks, 4, N_moments + 1), aligned on the blocks of all types
+		_, moments = merge_subhalo_moments(groups, moments)
+		samples = bulk_quantities_from_moments(leave_one_out(moments, axis=1), self.centre_of_potential)
+		return {f'{key}_err': jackknife_error(value, axis=1) for key, value in samples.items()}
+
+	def group_report_bootstrap(self,
+	                           apertures: np.ndarray = None,
+	                           n_replicas: int = N_REPLICAS,
+	                           seed: int = None) -> Dict[str, np.ndarray]:
+		"""
+		Poisson bootstrap replicas of the vectors of group_report_apertures (zero
+		momentum frame, angular momentum, angular velocity and principal axes), for
+		the particle-level uncertainties of the alignment angles. Every particle gets
+		an independent Poisson(1) weight in each replica and all the replicas and
+		apertures are accumulated in one pass over the particles in radial order
+		(see bootstrap.py). The eigenvectors of each replica are signed consistently
+		with those of the report.
+
+		:param apertures: default = None (self.generate_apertures())
+		:param n_replicas: expect int
+		:param seed: default = None, otherwise int for reproducible replicas
+		:return: dict with keys zero_momentum_frame, angular_momentum, angular_velocity
+			(n_replicas, N_apertures, 4, 3) and eigenvectors (n_replicas, N_apertures, 4, 9),
+			the third axis being [total, PartType0, PartType1, PartType4].
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+
+		rng = np.random.default_rng(seed)
+		replicas = []
+		for part_type in ['0', '1', '4']:
+			assert hasattr(self, f'partType{part_type}_coordinates')
+			assert hasattr(self, f'partType{part_type}_velocity')
+			assert hasattr(self, f'partType{part_type}_mass')
+			replicas.append(bootstrap_enclosed_moments(
+					self.particle_radii(part_type),
+					getattr(self, f'partType{part_type}_mass'),
+					getattr(self, f'partType{part_type}_coordinates'),
+					getattr(self, f'partType{part_type}_velocity'),
+					apertures,
+					n_replicas=n_replicas,
+					centre=self.centre_of_potential,
+					order=self.particle_radial_order(part_type),
+					rng=rng
+			))
+
+		moments = stack_moments([self.radial_moments(part_type).enclosed(apertures) for part_type in ['0', '1', '4']])
+		reference_eigenvectors = morphology_from_moments(moments)['eigenvectors']
+		return vectors_from_moments(stack_replica_moments(replicas), reference_eigenvectors=reference_eigenvectors)
+
+	def group_subhalos(self, apertures: np.ndarray = None) -> Dict[str, np.ndarray]:
+		"""
+		Computes the mass, centre of mass, bulk velocity, angular momentum and number
+		of particles of every subhalo within every aperture. The particles of each type
+		are grouped by SubGroupNumber once (the order is cached, see
+		particle_subgroup_order) and all subhalos and apertures are reduced together
+		(see subhalos.SubhaloGroups). SubGroupNumber = 0 is the fuzz.
+
+		:param apertures: default = None (self.generate_apertures())
+		:return: dict with keys
+			'subgroupnumber'   : (N_subhalos,), the union over the particle types
+			'N_particles', 'mass'                                  : (N_apertures, N_subhalos, 4)
+			'centre_of_mass', 'bulk_velocity', 'angular_momentum' : (N_apertures, N_subhalos, 4, 3)
+			The third axis is [total, PartType0, PartType1, PartType4].
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+
+		groups = []
+		moments = []
+		for part_type in ['0', '1', '4']:
+			assert hasattr(self, f'partType{part_type}_coordinates')
+			assert hasattr(self, f'partType{part_type}_velocity')
+			assert hasattr(self, f'partType{part_type}_mass')
+			assert hasattr(self, f'partType{part_type}_subgroupnumber')
+			group = SubhaloGroups(getattr(self, f'partType{part_type}_subgroupnumber'),
+			                      order=self.particle_subgroup_order(part_type))
+			moments.append(group.enclosed_moments(
+					self.particle_radii(part_type),
+					apertures,
+					getattr(self, f'partType{part_type}_mass'),
+					getattr(self, f'partType{part_type}_coordinates'),
+					getattr(self, f'partType{part_type}_velocity'),
+					centre=self.centre_of_potential
+			))
+			groups.append(group)
+
+		subgroupnumber, moments = merge_subhalo_moments(groups, moments)
+		return {'subgroupnumber': subgroupnumber, **subhalo_quantities_from_moments(moments, self.centre_of_potential)}
+
+	def group_morphology_iterative(self,
+	                               apertures: np.ndarray = None,
+	                               tolerance: float = TOLERANCE,
+	                               max_iterations: int = MAX_ITERATIONS) -> Dict[str, np.ndarray]:
+		"""
+		Ellipsoidal shapes from the iterative reduced shape tensor (see shapes.py),
+		for a grid of apertures at once. Unlike group_morphology, which uses the
+		unweighted inertia tensor of a spherical aperture, the particles are selected
+		within an ellipsoid of semi-major axis R that follows the shape of the cluster
+		and are weighted by 1 / r_ell^2. The candidate particles of each aperture are
+		taken from the cached radial order (see particle_radial_order).
+
+		:param apertures: default = None (self.generate_apertures())
+		:param tolerance: expect float, relative tolerance on the axis ratios
+		:param max_iterations: expect int
+		:return: dict with keys N_particles, eigenvalues, eigenvectors, triaxiality,
+			sphericity, elongation, iterations and converged, each with leading dimensions
+			(N_apertures, 4) and the third axis [total, PartType0, PartType1, PartType4].
+			Apertures with fewer than shapes.MIN_PARTICLES particles are NaN.
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+
+		shapes = []
+		enclosed = {'radius': [], 'mass': [], 'coords': []}
+		for part_type in ['0', '1', '4']:
+			assert hasattr(self, f'partType{part_type}_coordinates')
+			assert hasattr(self, f'partType{part_type}_mass')
+			radius = self.particle_radii(part_type)
+			order = self.particle_radial_order(part_type)
+			shapes.append(iterative_shapes(
+					radius,
+					getattr(self, f'partType{part_type}_mass'),
+					getattr(self, f'partType{part_type}_coordinates'),
+					apertures,
+					centre=self.centre_of_potential,
+					order=order,
+					tolerance=tolerance,
+					max_iterations=max_iterations
+			))
+			# Particles within the largest aperture, for the combined shape
+			index = order[:np.searchsorted(radius[order], np.max(apertures), side='left')]
+			enclosed['radius'].append(radius[index])
+			enclosed['mass'].append(getattr(self, f'partType{part_type}_mass')[index])
+			enclosed['coords'].append(getattr(self, f'partType{part_type}_coordinates')[index])
+
+		shapes.insert(0, iterative_shapes(
+				*[np.concatenate(enclosed[field]) for field in ['radius', 'mass', 'coords']],
+				apertures,
+				centre=self.centre_of_potential,
+				tolerance=tolerance,
+				max_iterations=max_iterations
+		))
+		return {key: np.stack([shape[key] for shape in shapes], axis=1) for key in shapes[0]}
+
+	def _gravity_particles(self) -> tuple:
+		"""
+		Radii, masses, coordinates (relative to the centre of potential) and particle
+		type labels (0, 1, 2 for PartType0, PartType1, PartType4) of all the particles.
+		"""
+		fields = []
+		for label, part_type in enumerate(['0', '1', '4']):
+			assert hasattr(self, f'partType{part_type}_coordinates')
+			assert hasattr(self, f'partType{part_type}_mass')
+			mass = getattr(self, f'partType{part_type}_mass')
+			fields.append((
+					self.particle_radii(part_type),
+					mass,
+					getattr(self, f'partType{part_type}_coordinates') - self.centre_of_potential,
+					np.full(len(mass), label, dtype=np.int64)
+			))
+		return tuple(np.concatenate(field) for field in zip(*fields))
+
+	def group_potential_energy(self,
+	                           apertures: np.ndarray = None,
+	                           theta: float = THETA,
+	                           softening: float = 0.) -> np.ndarray:
+		"""
+		Gravitational potential energy of the particles within each aperture, from a
+		Barnes-Hut tree built once for all the apertures (see gravity.py). The energy
+		of each pair of particles is shared equally between their particle types, so
+		that the energies of the particle types add up to the total.
+
+		:param apertures: default = None (self.generate_apertures())
+		:param theta: expect float between 0 and 1, the opening angle of the tree
+		:param softening: expect float, Plummer softening length in Mpc
+		:return: np.ndarray of shape (N_apertures, 4), ordered as
+			[total, PartType0, PartType1, PartType4] and in the units of kinetic_energy.
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+		radius, mass, coords, labels = self._gravity_particles()
+		pairs = aperture_pair_energies(radius, mass, coords, labels, apertures, n_labels=3,
+		                               theta=theta, softening=softening)
+		potential_energy = potential_energy_from_pairs(pairs) * potential_energy_factor
+		# Memoise each aperture for aperture_potential_energy
+		for aperture_radius, energy in zip(apertures, potential_energy):
+			self._cached_group_data(self._potential_energy_key(aperture_radius, theta, softening), lambda: energy)
+		return potential_energy
+
+	def _potential_energy_key(self, aperture_radius: float, theta: float, softening: float) -> tuple:
+		centre = tuple(np.asarray(self.centre_of_potential, dtype=np.float64).tolist())
+		return 'group_potential_energy', 'all', centre, float(aperture_radius), float(theta), float(softening)
+
+	def aperture_potential_energy(self,
+	                              aperture_radius: float,
+	                              theta: float = THETA,
+	                              softening: float = 0.) -> np.ndarray:
+		"""
+		Potential energy within one aperture, read from the entry memoised by
+		group_potential_energy (e.g. by group_report_apertures for the whole grid),
+		otherwise computed from a tree for this aperture only.
+
+		:param aperture_radius: expect float
+		:return: np.ndarray of shape (4,), ordered as [total, PartType0, PartType1, PartType4].
+		"""
+		return np.copy(self._cached_group_data(
+				self._potential_energy_key(aperture_radius, theta, softening),
+				lambda: self.group_potential_energy([aperture_radius], theta=theta, softening=softening)[0]
+		))
+
+	def group_potential_energy_accuracy(self,
+	                                    aperture_radius: float = None,
+	                                    n_sample: int = 2000,
+	                                    theta: float = THETA,
+	                                    softening: float = 0.) -> float:
+		"""
+		Relative error of the tree potential energy with respect to the direct sum
+		over pairs, on a random subsample of the particles within the aperture
+		(see gravity.tree_accuracy).
+
+		:param aperture_radius: default = None (R500)
+		:param n_sample: expect int
+		:return: float
+		"""
+		if aperture_radius is None:
+			aperture_radius = self.r500
+			warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
+		radius, mass, coords, _ = self._gravity_particles()
+		inside = radius < aperture_radius
+		return tree_accuracy(mass[inside], coords[inside], n_sample=n_sample, theta=theta, softening=softening)
+
+	def group_substructure_catalogue(self, apertures: np.ndarray = None) -> Dict[str, np.ndarray]:
+		"""
+		Catalogue-only substructure fractions and dynamical merging indices, computed
+		from the subhalo table of the groups files (subhalo_mass,
+		subhalo_centre_of_potential and subhalo_centre_of_mass) without any particle
+		data. These follow the SUBHALO-BASED definition (see
+		subhalos.catalogue_substructure) and are meant for screening clusters before
+		the particle-level runs: the datasets are prefixed with `subhalo_` to keep
+		them apart from group_substructure_fraction and group_dynamical_merging_index.
+
+		:param apertures: default = None (self.generate_apertures())
+		:return: dict of np.ndarray with shape (N_apertures,)
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		assert hasattr(self, 'subhalo_mass')
+		assert hasattr(self, 'subhalo_centre_of_potential')
+		assert hasattr(self, 'subhalo_centre_of_mass')
+		return catalogue_substructure(
+				self.subhalo_mass,
+				self.subhalo_centre_of_potential,
+				self.subhalo_centre_of_mass,
+				self.centre_of_potential,
+				apertures
+		)
+
+	def group_phase_table(self,
+	                      radius_edges: np.ndarray = None,
+	                      temperature_edges: np.ndarray = TEMPERATURE_EDGES) -> PhaseTable:
+		"""
+		Builds the cumulative radius-temperature table of the gas (see phase_table.py),
+		from the cached radial order. The gas mass, thermal energy and momentum within
+		any aperture and above (or between) any temperature cuts are then lookups in
+		the table, e.g. group_phase_table().quantities(r500, t_min=1e5).
+
+		:param radius_edges: default = None
+			The apertures of self.generate_apertures() and 50 logarithmic radii
+			from 0.01 Mpc to the largest aperture.
+		:param temperature_edges: default = phase_table.TEMPERATURE_EDGES
+			61 logarithmic temperatures from 10^3 to 10^9 K.
+		:return: PhaseTable
+		"""
+		if radius_edges is None:
+			apertures = self.generate_apertures()
+			radius_edges = np.union1d(apertures, profile_bins(0.01, np.max(apertures), n_bins=49))
+		assert hasattr(self, 'partType0_coordinates')
+		assert hasattr(self, 'partType0_velocity')
+		assert hasattr(self, 'partType0_mass')
+		assert hasattr(self, 'partType0_temperature')
+		return PhaseTable.from_particles(
+				self.particle_radii('0'),
+				self.partType0_mass,
+				self.partType0_coordinates,
+				self.partType0_velocity,
+				self.partType0_temperature,
+				radius_edges,
+				temperature_edges=temperature_edges,
+				centre=self.centre_of_potential,
+				order=self.particle_radial_order('0')
+		)
+
+	def group_sz(self,
+	             apertures: np.ndarray = None,
+	             lines_of_sight: np.ndarray = LINES_OF_SIGHT,
+	             t_min: float = SZ_TEMPERATURE_CUT,
+	             depth: float = None) -> Dict[str, np.ndarray]:
+		"""
+		Integrated thermal and kinetic SZ signals, Y D_A^2 in Mpc^2, of the gas with
+		T > t_min, within spherical apertures (from the radial prefix sums, in the cached
+		radial order) and within cylinders of the same radii along each line of sight
+		(see sz.py). The kSZ uses the velocities in the frame of the simulation box.
+
+		:param apertures: default = None (self.generate_apertures())
+		:param lines_of_sight: default = sz.LINES_OF_SIGHT (x, y and z axes)
+			Otherwise array-like of shape (N_los, 3), normalised internally.
+		:param t_min: default = 10^5 K, as in the kSZ maps
+		:param depth: default = None (all the loaded particles), otherwise the
+			half-length of the cylinders along the line of sight
+		:return: dict with tSZ_sphere (N_apertures,), kSZ_sphere, tSZ_cylinder and
+			kSZ_cylinder (N_apertures, N_los) and the lines_of_sight (N_los, 3)
+		"""
+		if apertures is None:
+			apertures = self.generate_apertures()
+		apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+		assert hasattr(self, 'partType0_coordinates')
+		assert hasattr(self, 'partType0_velocity')
+		assert hasattr(self, 'partType0_mass')
+		assert hasattr(self, 'partType0_temperature')
+		fields = (self.partType0_mass, self.partType0_coordinates, self.partType0_velocity, self.partType0_temperature)
+		sphere = spherical_sz(self.particle_radii('0'), *fields, apertures, lines_of_sight=lines_of_sight, t_min=t_min,
+		                      centre=self.centre_of_potential, order=self.particle_radial_order('0'))
+		cylinder = cylindrical_sz(*fields, apertures, lines_of_sight=lines_of_sight, t_min=t_min,
+		                          centre=self.centre_of_potential, depth=depth)
+		return {
+				'tSZ_sphere'    : sphere['tSZ'],
+				'kSZ_sphere'    : sphere['kSZ'],
+				'tSZ_cylinder'  : cylinder['tSZ'],
+				'kSZ_cylinder'  : cylinder['kSZ'],
+				'lines_of_sight': unit_lines_of_sight(lines_of_sight),
+		}
+
+	def radial_profiles(self,
+	                    part_type: str = '0',
+	                    bins: Union[int, np.ndarray] = 25,
+	                    log: bool = True,
+	                    weighting: str = 'mass',
+	                    frame: str = 'cop',
+	                    align: str = 'total',
+	                    aperture_radius: float = None) -> Dict[str, np.ndarray]:
+		"""
+		Computes the radial profiles of one particle type. The particles are taken in
+		the cached radial order (see particle_radial_order) and every weighted field is
+		binned in the same reduceat pass (see profiles.RadialProfiles).
+		Velocities are measured in the rest frame of the cluster, i.e. relative to the
+		total zero momentum frame within `aperture_radius`.
+
+		:param part_type: default = '0' (gas)
+		:param bins: default = 25
+			Either the number of bins between 0.02 and 2 R500, or the bin edges.
+		:param log: default = True (logarithmic bins), otherwise linear
+		:param weighting: default = 'mass'
+			The weights of the means and dispersions: 'mass', 'volume' (m/rho, gas),
+			'emission' (m rho T^1/2, bremsstrahlung emission measure of the gas) or 'none'.
+		:param frame: default = 'cop'
+			'cop' is the simulation frame centred on the centre of potential.
+			'derotated' is also rotated so that the angular momentum of `align` within
+			`aperture_radius` is the z axis, as in testing/angular_momentum.derotate.
+		:param align: default = 'total', otherwise '0', '1' or '4'
+		:param aperture_radius: default = None (R500)
+		:return: dict of np.ndarray with shape (N_bins,), with keys:
+			bin_edges (N_bins + 1,), radius, N_particles, mass, cumulative_mass, density,
+			radial_velocity, rotational_velocity, velocity_dispersion and, for the gas,
+			temperature, temperature_dispersion, entropy. Each weighted field also has
+			its <field>_dispersion.
+		"""
+		if aperture_radius is None:
+			aperture_radius = self.r500
+			warnings.warn(f'Aperture radius set to default R_500,true. = {self.r500:.2f} Mpc.')
+		if np.ndim(bins) == 0:
+			bins = profile_bins(0.02 * self.r500, 2. * self.r500, int(bins), log=log)
+
+		assert hasattr(self, f'partType{part_type}_coordinates')
+		assert hasattr(self, f'partType{part_type}_velocity')
+		assert hasattr(self, f'partType{part_type}_mass')
+		if part_type == '0': assert hasattr(self, f'partType{part_type}_temperature')
+		if weighting in ['volume', 'emission']: assert part_type == '0' and hasattr(self, 'partType0_sphdensity')
+
+		binning = RadialProfiles(self.particle_radii(part_type), bins, order=self.particle_radial_order(part_type))
+		mass = binning.sorted(getattr(self, f'partType{part_type}_mass'))
+		coords = np.subtract(binning.sorted(getattr(self, f'partType{part_type}_coordinates')), self.centre_of_potential)
+
+		report = self.group_report(aperture_radius=aperture_radius)
+		velocity = np.subtract(binning.sorted(getattr(self, f'partType{part_type}_velocity')), report['zero_momentum_frame'][0])
+		if frame == 'derotated':
+			grouping = ['total', '0', '1', '4'].index(align)
+			rot_matrix = self.rotation_matrix_from_vectors(report['angular_momentum'][grouping], [0, 0, 1])
+			coords = self.apply_rotation_matrix(rot_matrix, coords)
+			velocity = self.apply_rotation_matrix(rot_matrix, velocity)
+		elif frame != 'cop':
+			raise ValueError(f"Frame {frame} not recognised. Use 'cop' or 'derotated'.")
+
+		with np.errstate(divide='ignore', invalid='ignore'):
+			radius = np.linalg.norm(coords, axis=1)
+			cylindrical_radius = np.hypot(coords[:, 0], coords[:, 1])
+			fields = {
+					'radial_velocity'    : np.einsum('ij,ij->i', coords, velocity) / radius,
+					'rotational_velocity': (coords[:, 0] * velocity[:, 1] - coords[:, 1] * velocity[:, 0]) / cylindrical_radius,
+					'velocity_x'         : velocity[:, 0],
+					'velocity_y'         : velocity[:, 1],
+					'velocity_z'         : velocity[:, 2],
+			}
+		if part_type == '0':
+			temperature = binning.sorted(self.partType0_temperature)
+			fields['temperature'] = temperature
+			if hasattr(self, 'partType0_sphdensity'):
+				density = binning.sorted(self.partType0_sphdensity)
+				fields['entropy'] = temperature * np.power(density, -2. / 3.)
+
+		if weighting == 'mass':
+			weights = mass
+		elif weighting == 'volume':
+			weights = mass / density
+		elif weighting == 'emission':
+			weights = mass * density * np.sqrt(temperature)
+		elif weighting == 'none':
+			weights = None
+		else:
+			raise ValueError(f"Weighting {weighting} not recognised. Use 'mass', 'volume', 'emission' or 'none'.")
+
+		profiles = binning.weighted_profiles(fields, weights=weights, presorted=True)
+		shell_mass = binning.bin_sum(mass, presorted=True)
+		velocity_dispersion = np.sqrt((profiles.pop('velocity_x_dispersion') ** 2 +
+		                               profiles.pop('velocity_y_dispersion') ** 2 +
+		                               profiles.pop('velocity_z_dispersion') ** 2) / 3.)
+		for axis in ['x', 'y', 'z']: profiles.pop(f'velocity_{axis}')
+		profiles.pop('weight')
+
+		profile_dict = {
+				'bin_edges'          : binning.bin_edges,
+				'radius'             : binning.bin_centres(log=log),
+				'N_particles'        : binning.counts,
+				'mass'               : shell_mass,
+				'cumulative_mass'    : binning.cumulative(mass, presorted=True),
+				'density'            : shell_mass / binning.shell_volume(),
+				'velocity_dispersion': velocity_dispersion,
+				**profiles
+		}
+		return profile_dict
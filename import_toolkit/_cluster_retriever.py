@@ -20,6 +20,7 @@ import h5py as h5
 import numpy as np
 from .memory import free_memory
 from .progressbar import ProgressBar
+from .geometry import periodic_recentre
 
 CHUNK_SIZE = 1000000
 
@@ -52,6 +53,50 @@ def natural_sort_key(s):
             for text in re.split(_nsre, s)]
 
 
+# Process-wide cache of the HDF5 header attributes, keyed by file path.
+# Each entry records the file modification time at the moment of reading,
+# so that a file rewritten on disk is read again on the next access.
+_header_cache = {}
+
+def read_header_attributes(file_path: str, group_name: str = 'Header') -> dict:
+    """
+    Returns the attributes of the `group_name` group (e.g. 'Header', 'Constants',
+    'Units') of an HDF5 file as a dictionary. The file is only opened the first time
+    a group is requested: later calls are served from the process-wide cache, as long
+    as the modification time of the file has not changed.
+
+    :param file_path: expect str
+        The path of the HDF5 file.
+    :param group_name: expect str
+        The name of the group whose attributes are requested.
+    :return: dict
+        The {attribute_name: attribute_value} dictionary. It is empty if the group
+        does not exist in the file.
+    """
+    file_path = os.path.abspath(file_path)
+    mtime = os.path.getmtime(file_path)
+    entry = _header_cache.get(file_path)
+    if entry is None or entry['mtime'] != mtime:
+        entry = {'mtime': mtime, 'groups': {}}
+        _header_cache[file_path] = entry
+
+    if group_name not in entry['groups']:
+        with h5.File(file_path, 'r') as h5file:
+            entry['groups'][group_name] = dict(h5file[group_name].attrs) if group_name in h5file else {}
+
+    return entry['groups'][group_name]
+
+def invalidate_header_cache(file_path: str = None) -> None:
+    """
+    Drops cached header attributes. If `file_path` is None the whole cache is
+    cleared, otherwise only the entry of that file is removed.
+    """
+    if file_path is None:
+        _header_cache.clear()
+    else:
+        _header_cache.pop(os.path.abspath(file_path), None)
+
+
 class Mixin:
 
     #####################################################
@@ -504,25 +549,19 @@ class Mixin:
         if self.simulation_name is 'bahamas':
             for file in kwargs['file_list_sorted']:
                 with h5.File(file, 'r') as h5file:
-                    boxsize = h5file['Header'].attrs['BoxSize']
                     part_coords = h5file[f'/PartType{part_type}/Coordinates'][part_gn_index]
                     coords = np.concatenate((coords, part_coords), axis=0)
                     yield ((counter + 1) / (length_operation))  # Give control back to decorator
                     counter += 1
 
-                ## Periodic boundary wrapping
-                for coord_axis in range(3):
-                    # Right boundary
-                    if self.centre_of_potential[coord_axis] + 5*self.r200 > boxsize:
-                        beyond_index = np.where(coords[:, coord_axis] < boxsize/2)[0]
-                        coords[beyond_index, coord_axis] = coords[beyond_index, coord_axis] + boxsize
-                        del beyond_index
-
-                    # Left boundary
-                    elif self.centre_of_potential[coord_axis] - 5*self.r200 < 0.:
-                        beyond_index = np.where(coords[:, coord_axis] > boxsize/2)[0]
-                        coords[beyond_index, coord_axis] = coords[beyond_index, coord_axis] - boxsize
-                        del beyond_index
+            ## Periodic boundary wrapping (minimum image about the centre of potential)
+            boxsize = read_header_attributes(kwargs['file_list_sorted'][0])['BoxSize']
+            boxsize = boxsize if self.comovingframe else self.comoving_length(boxsize)
+            coords = coords if self.comovingframe else self.comoving_length(coords)
+            periodic_recentre(coords, self.centre_of_potential, boxsize)
+            free_memory(['coords'], invert=True)
+            assert len(coords) > 0, "Array is empty."
+            return coords
 
         else:
             for file in kwargs['file_list_sorted']:
@@ -584,8 +623,7 @@ class Mixin:
         part_gn_index = getattr(self, f'partType{part_type}_groupnumber')
 
         if part_type == '1':
-            with h5.File(kwargs['file_list_sorted'][0], 'r') as h5file:
-                particle_mass_DM = h5file['Header'].attrs['MassTable'][1]
+            particle_mass_DM = read_header_attributes(kwargs['file_list_sorted'][0])['MassTable'][1]
             mass = np.ones(len(part_gn_index), dtype=np.float) * particle_mass_DM
         else:
             counter = 0
@@ -744,20 +782,31 @@ class Mixin:
 
     @data_subject(subject="particledata")
     def extract_header_attribute(self, element_number, *args, **kwargs):
-        # Import data from hdf5 file
-        h5file = h5.File(kwargs['file_list_sorted'][0], 'r')
-        h5dset = h5file["/Header"]
-        attr_name = list(h5dset.attrs.keys())[element_number]
-        attr_value = list(h5dset.attrs.values())[element_number]
-        h5file.close()
+        # Import data from the cached hdf5 header
+        header = read_header_attributes(kwargs['file_list_sorted'][0])
+        attr_name = list(header.keys())[element_number]
+        attr_value = list(header.values())[element_number]
         return attr_name, attr_value
 
     @data_subject(subject="particledata")
     def extract_header_attribute_name(self, element_name, *args, **kwargs):
-        # Import data from hdf5 file
-        h5file = h5.File(kwargs['file_list_sorted'][0], 'r')
-        h5dset = h5file["/Header"]
-        attr_name = h5dset.attrs.get(element_name, default=None)
-        attr_value = h5dset.attrs.get(element_name, default=None)
-        h5file.close()
-        return attr_name, attr_value
\ No newline at end of file
+        # Import data from the cached hdf5 header
+        header = read_header_attributes(kwargs['file_list_sorted'][0])
+        attr_name = header.get(element_name, None)
+        attr_value = header.get(element_name, None)
+        return attr_name, attr_value
+
+    @data_subject(subject="particledata")
+    def extract_header_group(self, group_name: str = 'Header', *args, **kwargs):
+        """
+        Returns a copy of all the attributes of `group_name` ('Header', 'Constants'
+        or 'Units') of the first particledata file, read through the header cache.
+        """
+        return dict(read_header_attributes(kwargs['file_list_sorted'][0], group_name))
+
+    def invalidate_header_cache(self) -> None:
+        """
+        Drops the cached header attributes of the particledata files of this cluster.
+        """
+        for file in self.partdata_filePaths():
+            invalidate_header_cache(file)
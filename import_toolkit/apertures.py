@@ -0,0 +1,460 @@
+"""
+------------------------------------------------------------------
+FILE:   apertures.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the aperture engine used by the cluster reports.
+The particles of each type are sorted by distance from the centre
+once, and the cumulative sums of the additive moments are stored:
+
+    m, m*x, m*v, m*(x cross v), m*(x outer x), m*v**2, m*T, m(fuzz)
+
+where x are the coordinates relative to the centre and m(fuzz) is
+the mass of particles with SubGroupNumber = 0. The moments within any
+spherical aperture r < R are then found with np.searchsorted and a
+single lookup, and all the quantities in group_dynamics and
+group_morphology are derived from these moments for a whole grid of
+apertures at once.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+from typing import Dict, List
+import warnings
+
+from .geometry import CHUNK_SIZE
+from .selection import Selection
+from ._cluster_profiler import Mixin as ProfilerMixin, G_astro
+from . import kernels
+
+# Columns of the moments table
+_M = 0
+_MX = slice(1, 4)
+_MV = slice(4, 7)
+_MXV = slice(7, 10)
+_MXX = slice(10, 16)    # xx, yy, zz, xy, xz, yz
+_MVV = 16
+_MT = 17
+_MFUZZ = 18
+N_MOMENTS = 19
+
+# Output datasets of group_dynamics and group_morphology
+dynamics_keys = (
+    'N_particles', 'aperture_mass', 'centre_of_mass', 'zero_momentum_frame', 'angular_momentum',
+    'angular_velocity', 'specific_angular_momentum', 'circular_velocity', 'spin_parameter',
+    'substructure_mass', 'substructure_fraction', 'thermal_energy', 'kinetic_energy',
+    'dynamical_merging_index', 'thermodynamic_merging_index',
+)
+morphology_keys = ('inertia_tensor', 'eigenvalues', 'eigenvectors', 'triaxiality', 'sphericity', 'elongation')
+
+# Energy units as in group_dynamics: SI, then scaled by 10^-46
+thermal_energy_factor = ProfilerMixin.thermal_energy(ProfilerMixin.mass_units(1.), 1.) * np.power(10., -46)
+kinetic_energy_factor = 0.5 * ProfilerMixin.mass_units(1.) * ProfilerMixin.velocity_units(1.) ** 2 * np.power(10., -46)
+
+
+def particle_moments(mass: np.ndarray,
+                     coords: np.ndarray,
+                     velocity: np.ndarray,
+                     temperature: np.ndarray = None,
+                     subgroupnumber: np.ndarray = None,
+                     centre: np.ndarray = None,
+                     out: np.ndarray = None) -> np.ndarray:
+    """
+    Moments of each particle, one row per particle (see the columns above).
+
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param velocity: expect np.ndarray of shape (N, 3)
+    :param temperature: default = None (no thermal energy)
+    :param subgroupnumber: default = None (all mass counted as substructure-free)
+    :param centre: default = None (coords are already relative to the centre)
+    :param out: default = None, otherwise np.ndarray of shape (N, N_MOMENTS) to fill
+    :return: np.ndarray of shape (N, N_MOMENTS)
+    """
+    m = np.asarray(mass, dtype=np.float64)
+    x = np.asarray(coords, dtype=np.float64)
+    if centre is not None:
+        x = x - np.asarray(centre, dtype=np.float64)
+    v = np.asarray(velocity, dtype=np.float64)
+    if out is None:
+        out = np.empty((len(m), N_MOMENTS), dtype=np.float64)
+    out[:, _M] = m
+    out[:, _MX] = x * m[:, None]
+    out[:, _MV] = v * m[:, None]
+    out[:, _MXV] = np.cross(x, out[:, _MV])
+    out[:, _MXX] = np.column_stack((x[:, 0] * x[:, 0], x[:, 1] * x[:, 1], x[:, 2] * x[:, 2],
+                                    x[:, 0] * x[:, 1], x[:, 0] * x[:, 2], x[:, 1] * x[:, 2])) * m[:, None]
+    out[:, _MVV] = np.einsum('ij,ij->i', v, v) * m
+    out[:, _MT] = 0. if temperature is None else np.asarray(temperature, dtype=np.float64) * m
+    out[:, _MFUZZ] = m if subgroupnumber is None else m * (np.asarray(subgroupnumber) == 0)
+    return out
+
+
+def accumulate_moments(mass: np.ndarray,
+                       coords: np.ndarray,
+                       velocity: np.ndarray,
+                       temperature: np.ndarray = None,
+                       subgroupnumber: np.ndarray = None,
+                       centre: np.ndarray = None,
+                       selection: Selection = None,
+                       chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Total moments of a set of particles, accumulated in one traversal of the
+    arrays (in chunks), without sorting. Used for single apertures.
+    The arguments are as in particle_moments. If numba is available, the
+    compiled kernels.moment_sums is used instead of the NumPy chunks.
+
+    :param selection: default = None (all particles), otherwise selection.Selection
+        Only the selected particles are accumulated, without filtering the
+        arrays: at most `chunk_size` particles are gathered at a time.
+    :return: np.ndarray of shape (N_MOMENTS + 1,), the last entry is the number of particles.
+    """
+    if selection is None:
+        selection = Selection.everything(len(mass))
+    total = np.zeros(N_MOMENTS + 1, dtype=np.float64)
+    if kernels.NUMBA_AVAILABLE:
+        total[:-1] = kernels.moment_sums(mass, coords, velocity, temperature=temperature,
+                                         subgroupnumber=subgroupnumber, centre=centre,
+                                         index=None if selection.is_everything else selection.index)
+        total[-1] = selection.count
+        return total
+
+    for block in selection.chunks(chunk_size):
+        total[:-1] += particle_moments(
+                mass[block],
+                coords[block],
+                velocity[block],
+                temperature=None if temperature is None else temperature[block],
+                subgroupnumber=None if subgroupnumber is None else subgroupnumber[block],
+                centre=centre
+        ).sum(axis=0)
+    total[-1] = selection.count
+    return total
+
+
+class RadialMoments:
+
+    def __init__(self,
+                 radius: np.ndarray,
+                 mass: np.ndarray,
+                 coords: np.ndarray,
+                 velocity: np.ndarray,
+                 temperature: np.ndarray = None,
+                 subgroupnumber: np.ndarray = None,
+                 centre: np.ndarray = None,
+                 order: np.ndarray = None,
+                 chunk_size: int = CHUNK_SIZE):
+        """
+        Sorts one particle set by radius and builds the cumulative moments.
+
+        :param radius: expect np.ndarray of shape (N,)
+            Distance of the particles from the centre.
+        :param mass: expect np.ndarray of shape (N,)
+        :param coords: expect np.ndarray of shape (N, 3)
+        :param velocity: expect np.ndarray of shape (N, 3)
+        :param temperature: default = None (no thermal energy, e.g. DM and stars)
+        :param subgroupnumber: default = None (all mass counted as substructure-free)
+        :param centre: default = None (coords are already relative to the centre)
+        :param order: default = None (computed), otherwise np.argsort(radius)
+        :param chunk_size: expect int
+            Number of particles processed at a time when filling the table.
+        """
+        if order is None:
+            order = np.argsort(radius, kind='stable')
+        self.radius = np.asarray(radius)[order]
+        self.prefix = np.zeros((len(order) + 1, N_MOMENTS), dtype=np.float64)
+
+        for start in range(0, len(order), chunk_size):
+            index = order[start:start + chunk_size]
+            particle_moments(
+                    mass[index],
+                    coords[index],
+                    velocity[index],
+                    temperature=None if temperature is None else temperature[index],
+                    subgroupnumber=None if subgroupnumber is None else subgroupnumber[index],
+                    centre=centre,
+                    out=self.prefix[start + 1:start + 1 + len(index)]
+            )
+
+        np.cumsum(self.prefix[1:], axis=0, out=self.prefix[1:])
+
+    def __len__(self):
+        return len(self.radius)
+
+    def aperture_index(self, aperture_radius) -> np.ndarray:
+        """
+        Number of particles with r < aperture_radius, for one or more apertures.
+        """
+        return np.searchsorted(self.radius, aperture_radius, side='left')
+
+    def enclosed(self, aperture_radius) -> np.ndarray:
+        """
+        Moments of the particles with r < aperture_radius.
+
+        :param aperture_radius: expect float or array-like of shape (N_apertures,)
+        :return: np.ndarray of shape (N_apertures, N_moments + 1), the last column
+            is the number of particles.
+        """
+        index = self.aperture_index(np.atleast_1d(aperture_radius))
+        return np.column_stack((self.prefix[index], index))
+
+
+def selection_enclosed_moments(radius: np.ndarray,
+                               mass: np.ndarray,
+                               coords: np.ndarray,
+                               velocity: np.ndarray,
+                               apertures: np.ndarray,
+                               selections: List[Selection],
+                               temperature: np.ndarray = None,
+                               subgroupnumber: np.ndarray = None,
+                               centre: np.ndarray = None,
+                               order: np.ndarray = None,
+                               chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Moments of the particles with r < R for several selections of the same particle
+    set, in one traversal of the arrays. The particles are taken in radial order, so
+    that the shells between consecutive apertures are contiguous ranges, and the
+    moments of every selection within a shell are the single matrix product
+
+        membership[:, shell] @ moments[shell]     (S x N_shell) by (N_shell x N_moments)
+
+    where membership is the (S, N) table of the selection masks. The moments of each
+    particle are then computed once, whatever the number of selections.
+
+    :param radius: expect np.ndarray of shape (N,)
+        Distance of the particles from the centre.
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param velocity: expect np.ndarray of shape (N, 3)
+    :param apertures: expect array-like of shape (N_apertures,), in any order
+    :param selections: expect list of S selection.Selection of the N particles
+    :param temperature: default = None (no thermal energy)
+    :param subgroupnumber: default = None (all mass counted as substructure-free)
+    :param centre: default = None (coords are already relative to the centre)
+    :param order: default = None (computed), otherwise np.argsort(radius)
+    :param chunk_size: expect int
+    :return: np.ndarray of shape (N_apertures, S, N_MOMENTS + 1), the last column
+        is the number of selected particles.
+    """
+    apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+    if order is None:
+        order = np.argsort(radius, kind='stable')
+    aperture_order = np.argsort(apertures, kind='stable')
+    n_inside = np.searchsorted(np.asarray(radius)[order], apertures[aperture_order], side='left')
+    # The particles of shell s are at positions bounds[s]:bounds[s + 1] of the radial order
+    bounds = np.concatenate(([0], n_inside))
+    index = order[:bounds[-1]]
+    membership = np.stack([selection.mask for selection in selections])
+
+    shells = np.zeros((len(apertures), len(selections), N_MOMENTS + 1), dtype=np.float64)
+    rows = np.ones((chunk_size, N_MOMENTS + 1), dtype=np.float64)
+    for start in range(0, len(index), chunk_size):
+        block = index[start:start + chunk_size]
+        particle_moments(
+                mass[block],
+                coords[block],
+                velocity[block],
+                temperature=None if temperature is None else temperature[block],
+                subgroupnumber=None if subgroupnumber is None else subgroupnumber[block],
+                centre=centre,
+                out=rows[:len(block), :N_MOMENTS]
+        )
+        weights = membership[:, block].astype(np.float64)
+        cuts = np.clip(bounds - start, 0, len(block))
+        for shell in np.flatnonzero(cuts[1:] > cuts[:-1]):
+            shells[shell] += weights[:, cuts[shell]:cuts[shell + 1]] @ rows[cuts[shell]:cuts[shell + 1]]
+
+    return np.cumsum(shells, axis=0)[np.argsort(aperture_order)]
+
+
+def stack_moments(moments_list: List[np.ndarray]) -> np.ndarray:
+    """
+    Stacks the enclosed moments of each particle type and prepends their sum.
+
+    :param moments_list: expect list of arrays of shape (N_apertures, ..., N_moments + 1)
+        In the output order of the reports: [PartType0, PartType1, PartType4].
+    :return: np.ndarray of shape (N_apertures, ..., 1 + N_types, N_moments + 1)
+        Ordered as [total, PartType0, PartType1, PartType4].
+    """
+    moments = np.stack(moments_list, axis=-2)
+    return np.concatenate((moments.sum(axis=-2, keepdims=True), moments), axis=-2)
+
+
+def inertia_tensor_from_moments(moments: np.ndarray) -> np.ndarray:
+    """
+    Inertia tensor about the centre, I = tr(S) 1 - S, with S = sum m x x^T.
+
+    :param moments: expect np.ndarray of shape (..., N_moments + 1)
+    :return: np.ndarray of shape (..., 3, 3)
+    """
+    mxx = moments[..., _MXX]
+    second_moment = np.empty(moments.shape[:-1] + (3, 3), dtype=np.float64)
+    second_moment[..., 0, 0] = mxx[..., 0]
+    second_moment[..., 1, 1] = mxx[..., 1]
+    second_moment[..., 2, 2] = mxx[..., 2]
+    second_moment[..., 0, 1] = second_moment[..., 1, 0] = mxx[..., 3]
+    second_moment[..., 0, 2] = second_moment[..., 2, 0] = mxx[..., 4]
+    second_moment[..., 1, 2] = second_moment[..., 2, 1] = mxx[..., 5]
+    trace = mxx[..., 0] + mxx[..., 1] + mxx[..., 2]
+    return trace[..., None, None] * np.identity(3) - second_moment
+
+
+def bulk_quantities_from_moments(moments: np.ndarray, centre: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Derives the outputs of the group_mass_aperture, group_centre_of_mass,
+    group_zero_momentum_frame, group_kinetic_energy and group_angular_momentum
+    methods of the profiler from the enclosed moments. As in those methods,
+    the kinetic energy and angular momentum of every grouping are measured in
+    the zero momentum frame of all the particles (the first grouping).
+
+    :param moments: expect np.ndarray of shape (..., N_groupings, N_moments + 1)
+        E.g. [total, PartType0, PartType1, PartType4] from stack_moments.
+    :param centre: expect np.ndarray with 3 components
+        The centre the coordinates were measured from (centre of potential).
+    :return: dict of arrays with leading dimensions (..., N_groupings)
+    """
+    mass = moments[..., _M]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zero_momentum_frame = moments[..., _MV] / mass[..., None]
+        centre_of_mass = moments[..., _MX] / mass[..., None] + np.asarray(centre, dtype=np.float64)
+    bulk_velocity = zero_momentum_frame[..., :1, :]
+    # 1/2 sum m |v - V|^2 = 1/2 (sum m v^2 - 2 V . sum m v + M V^2)
+    kinetic_energy = (moments[..., _MVV] - 2 * np.einsum('...i,...i', moments[..., _MV], bulk_velocity) +
+                      mass * np.einsum('...i,...i', bulk_velocity, bulk_velocity)) * kinetic_energy_factor
+    # sum m x cross (v - V) = sum m x cross v - (sum m x) cross V
+    angular_momentum = moments[..., _MXV] - np.cross(moments[..., _MX], bulk_velocity)
+    return {
+            'aperture_mass'      : mass,
+            'centre_of_mass'     : centre_of_mass,
+            'zero_momentum_frame': zero_momentum_frame,
+            'kinetic_energy'     : kinetic_energy,
+            'angular_momentum'   : angular_momentum,
+    }
+
+
+def dynamics_from_moments(moments: np.ndarray,
+                          aperture_radius: np.ndarray,
+                          centre: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Derives the group_dynamics datasets from the enclosed moments.
+
+    :param moments: expect np.ndarray of shape (N_apertures, ..., 4, N_moments + 1)
+        As returned by stack_moments, e.g. with a selection axis after the apertures.
+    :param aperture_radius: expect np.ndarray of shape (N_apertures,)
+    :param centre: expect np.ndarray with 3 components
+        The centre the coordinates were measured from (centre of potential).
+    :return: dict of arrays, each with the leading dimensions of `moments`
+    """
+    radius = np.asarray(aperture_radius, dtype=np.float64).reshape((-1,) + (1,) * (moments.ndim - 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mass = moments[..., _M]
+        mass_dipole = moments[..., _MX] / mass[..., None]
+        zero_momentum_frame = moments[..., _MV] / mass[..., None]
+
+        # L = sum m x cross (v - V) and E_kin = 0.5 sum m |v - V|^2 in the zero-momentum frame
+        angular_momentum = moments[..., _MXV] - np.cross(moments[..., _MX], zero_momentum_frame)
+        angular_momentum_norm = np.linalg.norm(angular_momentum, axis=-1)
+        kinetic_energy = (moments[..., _MVV] - mass * np.einsum('...i,...i', zero_momentum_frame, zero_momentum_frame))
+        kinetic_energy *= kinetic_energy_factor
+        thermal_energy = moments[..., _MT] * thermal_energy_factor
+
+        inertia_tensor = inertia_tensor_from_moments(moments)
+        angular_velocity = np.full_like(angular_momentum, np.nan)
+        invertible = np.abs(np.linalg.det(inertia_tensor)) > 0
+        angular_velocity[invertible] = np.linalg.solve(inertia_tensor[invertible],
+                                                       angular_momentum[invertible][..., None])[..., 0]
+
+        circular_velocity = np.sqrt(G_astro * mass / radius)
+        substructure_mass = mass - moments[..., _MFUZZ]
+
+        # Only the gas has thermal energy: the total is the gas value
+        thermodynamic_merging_index = np.zeros_like(mass)
+        thermodynamic_merging_index[..., 1] = kinetic_energy[..., 1] / thermal_energy[..., 1]
+        thermodynamic_merging_index[..., 0] = thermodynamic_merging_index[..., 1]
+
+        dynamic_dict = {
+                'N_particles'                : moments[..., -1].astype(np.int64),
+                'aperture_mass'              : mass,
+                'centre_of_mass'             : mass_dipole + np.asarray(centre),
+                'zero_momentum_frame'        : zero_momentum_frame,
+                'angular_momentum'           : angular_momentum,
+                'angular_velocity'           : angular_velocity,
+                'specific_angular_momentum'  : angular_momentum_norm / mass,
+                'circular_velocity'          : circular_velocity,
+                'spin_parameter'             : angular_momentum_norm / (mass * radius * circular_velocity * np.sqrt(2)),
+                'substructure_mass'          : substructure_mass,
+                'substructure_fraction'      : substructure_mass / mass,
+                'thermal_energy'             : thermal_energy,
+                'kinetic_energy'             : kinetic_energy,
+                'dynamical_merging_index'    : np.linalg.norm(mass_dipole, axis=-1) / radius,
+                'thermodynamic_merging_index': thermodynamic_merging_index
+        }
+    return dynamic_dict
+
+
+def morphology_from_moments(moments: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Derives the group_morphology datasets from the enclosed moments.
+
+    :param moments: expect np.ndarray of shape (..., N_moments + 1)
+        E.g. (N_apertures, 4, N_moments + 1) as returned by stack_moments, or
+        with a further leading dimension for a set of clusters.
+    :return: dict of arrays, each with the leading dimensions of `moments`
+    """
+    inertia_tensor = inertia_tensor_from_moments(moments)
+    mass = moments[..., _M]
+    valid = mass > 0
+
+    # One batched symmetric solve for all apertures and particle groupings
+    # (empty apertures are replaced by the identity and masked afterwards)
+    _eigenvalues, _eigenvectors = ProfilerMixin.principal_axes_ellipsoid(
+            np.where(valid[..., None, None], inertia_tensor, np.identity(3)), eigenvalues=True)
+
+    # Sort from largest to smallest eigenvalue: eigenvectors[..., k, :] is the
+    # (normalised) eigenvector of eigenvalues[..., k]
+    order = np.argsort(-_eigenvalues, axis=-1, kind='stable')
+    eigenvalues = np.take_along_axis(_eigenvalues, order, axis=-1)
+    eigenvectors = np.take_along_axis(np.swapaxes(_eigenvectors, -1, -2), order[..., None], axis=-2)
+    eigenvalues = np.where(valid[..., None], eigenvalues / np.where(valid, mass, 1.)[..., None], np.nan)
+    eigenvectors[~valid] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        morphology_dict = {
+                'inertia_tensor': inertia_tensor.reshape(mass.shape + (9,)),
+                'eigenvalues'   : eigenvalues,
+                'eigenvectors'  : eigenvectors.reshape(mass.shape + (9,)),
+                'triaxiality'   : (eigenvalues[..., 0] - eigenvalues[..., 1]) / (eigenvalues[..., 0] - eigenvalues[..., 2]),
+                'sphericity'    : np.sqrt(eigenvalues[..., 2]) / np.sqrt(eigenvalues[..., 0]),
+                'elongation'    : np.sqrt(eigenvalues[..., 1]) / np.sqrt(eigenvalues[..., 0]),
+        }
+    return morphology_dict
+
+
+def split_apertures(report: Dict[str, np.ndarray]) -> List[Dict[str, np.ndarray]]:
+    """
+    Converts a dict of (N_apertures, ...) arrays into a list of per-aperture dicts.
+    """
+    n_apertures = len(next(iter(report.values())))
+    return [{key: value[i] for key, value in report.items()} for i in range(n_apertures)]
+
+
+def report_warnings(report: Dict[str, np.ndarray], aperture_radius: float, label: str = None) -> None:
+    """
+    Same warnings as group_dynamics and group_morphology, for one aperture.
+    The label, e.g. the name of a particle selection, is appended to the messages.
+    """
+    for key, threshold, message in [
+        ('N_particles', None, 'N_particles is 0. No particles detected.'),
+        ('aperture_mass', None, 'aperture_mass is 0. No mass enclosed.'),
+        ('dynamical_merging_index', 1, 'dynamical_merging_index larger than 1.'),
+        ('thermodynamic_merging_index', 1, 'thermodynamic_merging_index larger than 1.'),
+        ('substructure_fraction', 1, 'substructure_fraction larger than 1.'),
+        ('triaxiality', 1, 'triaxiality larger than 1.'),
+        ('sphericity', 1, 'sphericity larger than 1.'),
+        ('elongation', 1, 'elongation larger than 1.'),
+    ]:
+        if key not in report:
+            continue
+        if (threshold is None and report[key][0] == 0) or (threshold is not None and report[key][0] > threshold):
+            warnings.warn(f'[-] Aperture: {aperture_radius:2.2f} Mpc | {message}' + (f' ({label})' if label else ''))
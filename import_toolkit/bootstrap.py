@@ -0,0 +1,162 @@
+"""
+------------------------------------------------------------------
+FILE:   bootstrap.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the Poisson bootstrap of the aperture moments,
+used for the particle-level uncertainties of the alignment angles.
+Each replica k assigns an independent Poisson(1) weight w_ki to
+every particle i. All the moments of apertures.particle_moments are
+linear in the weights, so the moments of all the replicas within a
+spherical shell are the single matrix product
+
+    W[:, shell] @ moments[shell]     (K x N_shell) by (N_shell x N_moments)
+
+The particles are taken in radial order, so that the shells between
+consecutive apertures are contiguous ranges, and in chunks, so that
+the weights are never stored for all the particles at once. The
+enclosed moments of the replicas are the cumulative sums over the
+shells, and the vectors of the reports (zero momentum frame, angular
+momentum, angular velocity and principal axes) are derived from them
+for all replicas and apertures at once.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+from typing import Dict
+
+from .apertures import (
+    N_MOMENTS,
+    _M,
+    _MX,
+    _MV,
+    _MXV,
+    particle_moments,
+    inertia_tensor_from_moments,
+    morphology_from_moments,
+)
+
+# Default number of replicas and of particles weighted at a time
+N_REPLICAS = 200
+BOOTSTRAP_CHUNK_SIZE = 20000
+
+# Cumulative distribution of Poisson(1), in units of 2^-32, for the draws by inversion
+_poisson_cdf = np.cumsum(np.exp(-1.) / np.cumprod(np.r_[1., np.arange(1., 16.)]))
+_poisson_thresholds = np.floor(_poisson_cdf[:-1] * 2. ** 32).astype(np.uint32)
+
+
+def poisson_weights(rng: np.random.Generator, n_replicas: int, n: int) -> np.ndarray:
+    """
+    Poisson(1) weights, drawn by inversion of 32-bit random integers: about twice
+    as fast as rng.poisson, with probabilities exact to 2^-32.
+
+    :param rng: expect np.random.Generator
+    :param n_replicas: expect int
+    :param n: expect int, the number of particles
+    :return: np.ndarray of shape (n_replicas, n)
+    """
+    draws = rng.integers(0, 2 ** 32, size=(n_replicas, n), dtype=np.uint32)
+    return np.searchsorted(_poisson_thresholds, draws, side='right').astype(np.float64)
+
+def bootstrap_enclosed_moments(radius: np.ndarray,
+                               mass: np.ndarray,
+                               coords: np.ndarray,
+                               velocity: np.ndarray,
+                               apertures: np.ndarray,
+                               n_replicas: int = N_REPLICAS,
+                               centre: np.ndarray = None,
+                               order: np.ndarray = None,
+                               rng: np.random.Generator = None,
+                               chunk_size: int = BOOTSTRAP_CHUNK_SIZE) -> np.ndarray:
+    """
+    Moments of the particles with r < R in each Poisson bootstrap replica.
+
+    :param radius: expect np.ndarray of shape (N,)
+        Distance of the particles from the centre.
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param velocity: expect np.ndarray of shape (N, 3)
+    :param apertures: expect array-like of shape (N_apertures,), in any order
+    :param n_replicas: expect int
+    :param centre: default = None (coords are already relative to the centre)
+    :param order: default = None (computed), otherwise np.argsort(radius)
+    :param rng: default = None (np.random.default_rng()), otherwise np.random.Generator
+    :param chunk_size: expect int
+        Number of particles weighted at a time: the weights take
+        8 * n_replicas * chunk_size bytes.
+    :return: np.ndarray of shape (n_replicas, N_apertures, N_MOMENTS + 1), the
+        last column is the (weighted) number of particles.
+    """
+    apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+    if order is None:
+        order = np.argsort(radius, kind='stable')
+    if rng is None:
+        rng = np.random.default_rng()
+    aperture_order = np.argsort(apertures, kind='stable')
+    n_inside = np.searchsorted(np.asarray(radius)[order], apertures[aperture_order], side='left')
+    # The particles of shell s are at positions bounds[s]:bounds[s + 1] of the radial order
+    bounds = np.concatenate(([0], n_inside))
+    index = order[:bounds[-1]]
+
+    shells = np.zeros((len(apertures), n_replicas, N_MOMENTS + 1), dtype=np.float64)
+    rows = np.ones((chunk_size, N_MOMENTS + 1), dtype=np.float64)
+    for start in range(0, len(index), chunk_size):
+        block = index[start:start + chunk_size]
+        particle_moments(mass[block], coords[block], velocity[block], centre=centre,
+                         out=rows[:len(block), :N_MOMENTS])
+        weights = poisson_weights(rng, n_replicas, len(block))
+        cuts = np.clip(bounds - start, 0, len(block))
+        for shell in np.flatnonzero(cuts[1:] > cuts[:-1]):
+            shells[shell] += weights[:, cuts[shell]:cuts[shell + 1]] @ rows[cuts[shell]:cuts[shell + 1]]
+
+    enclosed = np.cumsum(shells, axis=0)[np.argsort(aperture_order)]
+    return np.swapaxes(enclosed, 0, 1)
+
+def stack_replica_moments(moments_list: list) -> np.ndarray:
+    """
+    Stacks the replica moments of each particle type and prepends their sum.
+
+    :param moments_list: expect list of arrays of shape (n_replicas, N_apertures, N_moments + 1)
+    :return: np.ndarray of shape (n_replicas, N_apertures, 1 + N_types, N_moments + 1)
+        Ordered as [total, PartType0, PartType1, PartType4].
+    """
+    moments = np.stack(moments_list, axis=-2)
+    return np.concatenate((moments.sum(axis=-2, keepdims=True), moments), axis=-2)
+
+
+def vectors_from_moments(moments: np.ndarray, reference_eigenvectors: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """
+    Derives the vectors used by the alignment angles from the enclosed moments, as
+    in apertures.dynamics_from_moments and apertures.morphology_from_moments.
+
+    :param moments: expect np.ndarray of shape (..., N_moments + 1)
+    :param reference_eigenvectors: default = None, otherwise np.ndarray broadcastable to (..., 9)
+        The eigenvectors are only defined up to a sign: each one is flipped to
+        point in the same direction as the reference (e.g. the eigenvectors of the
+        report), so that the replicas of the angles are comparable.
+    :return: dict with keys zero_momentum_frame, angular_momentum, angular_velocity
+        (..., 3) and eigenvectors (..., 9), with the leading dimensions of `moments`
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mass = moments[..., _M]
+        zero_momentum_frame = moments[..., _MV] / mass[..., None]
+        angular_momentum = moments[..., _MXV] - np.cross(moments[..., _MX], zero_momentum_frame)
+        inertia_tensor = inertia_tensor_from_moments(moments)
+        angular_velocity = np.full_like(angular_momentum, np.nan)
+        invertible = np.abs(np.linalg.det(inertia_tensor)) > 0
+        angular_velocity[invertible] = np.linalg.solve(inertia_tensor[invertible],
+                                                       angular_momentum[invertible][..., None])[..., 0]
+
+    eigenvectors = morphology_from_moments(moments)['eigenvectors']
+    if reference_eigenvectors is not None:
+        eigenvectors = eigenvectors.reshape(mass.shape + (3, 3))
+        reference = np.broadcast_to(reference_eigenvectors, mass.shape + (9,)).reshape(mass.shape + (3, 3))
+        sign = np.where(np.einsum('...ij,...ij->...i', eigenvectors, reference) < 0, -1., 1.)
+        eigenvectors = (eigenvectors * sign[..., None]).reshape(mass.shape + (9,))
+    return {
+            'zero_momentum_frame': zero_momentum_frame,
+            'angular_momentum'   : angular_momentum,
+            'angular_velocity'   : angular_velocity,
+            'eigenvectors'       : eigenvectors,
+    }
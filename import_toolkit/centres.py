@@ -0,0 +1,132 @@
+"""
+------------------------------------------------------------------
+FILE:   centres.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the alternative centres of the clusters, used to
+evaluate the aperture reports about several centre definitions:
+
+    'cop'              : the centre of potential of the FoF catalogue
+    'com'              : the centre of mass within R500 of the CoP
+    'shrinking_sphere' : the shrinking-sphere centre (Power et al. 2003)
+    'most_bound'       : the DM particle with the deepest potential
+
+The shrinking sphere iterates the centre of mass of the particles
+within a sphere, reducing the radius by a constant factor at every
+step until few particles are left. The particles of each sphere are
+a subset of a larger candidate sphere, which is only rebuilt when
+its radius is more than twice the current one: the candidates shrink
+geometrically with the sphere and the whole iteration costs O(N).
+The potential of the most-bound particle uses the Barnes-Hut octree
+of gravity.py, built once on the particles within the outer radius.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+
+from .gravity import THETA, LEAF_SIZE, Octree, tree_potential
+
+# Names of the centres of the reports (see Cluster.group_centres)
+centre_names = ('cop', 'com', 'shrinking_sphere', 'most_bound')
+
+# Shrinking sphere: radius reduction per iteration and stopping criteria
+SHRINK_FACTOR = 0.975
+SHRINK_MIN_PARTICLES = 1000
+SHRINK_MIN_FRACTION = 0.01
+SHRINK_MAX_ITERATIONS = 1000
+
+
+def shrinking_sphere(mass: np.ndarray,
+                     coords: np.ndarray,
+                     centre: np.ndarray,
+                     radius: float,
+                     shrink_factor: float = SHRINK_FACTOR,
+                     min_particles: int = SHRINK_MIN_PARTICLES,
+                     min_fraction: float = SHRINK_MIN_FRACTION,
+                     max_iterations: int = SHRINK_MAX_ITERATIONS) -> tuple:
+    """
+    Shrinking-sphere centre of a set of particles. Starting from the sphere of
+    `radius` about `centre`, the centre is moved to the centre of mass of the
+    particles within the sphere and the radius is multiplied by `shrink_factor`,
+    until the sphere holds fewer than max(min_particles, min_fraction * N_0)
+    particles, N_0 being the number in the first sphere.
+
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param centre: expect np.ndarray with 3 components, the first guess
+    :param radius: expect float, the radius of the first sphere
+    :param shrink_factor: expect float between 0 and 1
+    :param min_particles: expect int
+    :param min_fraction: expect float
+    :param max_iterations: expect int
+    :return: (centre, radius, iterations), the centre of mass of the last sphere
+        with enough particles, its radius and the number of iterations.
+    """
+    if not 0. < shrink_factor < 1.:
+        raise ValueError(f"The shrink factor must be between 0 and 1, got {shrink_factor}.")
+    mass = np.asarray(mass, dtype=np.float64)
+    # Coordinates relative to the first guess, so that the candidates are gathered once
+    origin = np.asarray(centre, dtype=np.float64)
+    x = np.asarray(coords, dtype=np.float64) - origin
+    candidates = np.flatnonzero(np.einsum('ij,ij->i', x, x) < radius ** 2)
+    anchor, anchor_radius = np.zeros(3), float(radius)
+    n_min = max(min_particles, min_fraction * len(candidates))
+
+    centre, inside = np.zeros(3), candidates
+    iteration = 0
+    while iteration < max_iterations:
+        total_mass = np.sum(mass[inside])
+        if len(inside) < n_min or total_mass <= 0:
+            break
+        centre = mass[inside] @ x[inside] / total_mass
+        iteration += 1
+        radius *= shrink_factor
+
+        # Rebuild the candidates when the sphere leaves them or is much smaller
+        offset = np.linalg.norm(centre - anchor)
+        if offset + radius > anchor_radius:
+            block = x - centre
+            candidates = np.flatnonzero(np.einsum('ij,ij->i', block, block) < (2 * radius) ** 2)
+            anchor, anchor_radius = centre, 2 * radius
+        elif offset + 2 * radius <= anchor_radius / 2:
+            block = x[candidates] - centre
+            candidates = candidates[np.einsum('ij,ij->i', block, block) < (2 * radius) ** 2]
+            anchor, anchor_radius = centre, 2 * radius
+
+        block = x[candidates] - centre
+        inside = candidates[np.einsum('ij,ij->i', block, block) < radius ** 2]
+
+    return centre + origin, radius / shrink_factor if iteration else radius, iteration
+
+def most_bound_particle(mass: np.ndarray,
+                        coords: np.ndarray,
+                        targets: np.ndarray,
+                        tree: Octree = None,
+                        theta: float = THETA,
+                        softening: float = 0.,
+                        leaf_size: int = LEAF_SIZE) -> int:
+    """
+    The particle with the deepest gravitational potential among the targets, due to
+    all the particles. The potential is computed with the Barnes-Hut octree.
+
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param targets: expect np.ndarray of integers, the candidate particles
+    :param tree: default = None (built), otherwise the Octree of `coords`, to reuse it
+    :param theta: expect float between 0 and 1, the opening angle
+    :param softening: expect float, Plummer softening length
+    :param leaf_size: expect int
+    :return: int, the index of the most-bound particle in the input arrays
+    """
+    targets = np.asarray(targets, dtype=np.int64)
+    if len(targets) == 0:
+        raise ValueError("No candidate particles for the most-bound particle.")
+    if tree is None:
+        tree = Octree(coords, leaf_size=leaf_size)
+    # Position of each particle in the tree order
+    rank = np.empty(len(tree.order), dtype=np.int64)
+    rank[tree.order] = np.arange(len(tree.order))
+    potential = tree_potential(tree, rank[targets], np.asarray(mass, dtype=np.float64)[tree.order],
+                               np.zeros(len(tree.order), dtype=np.int64), 1, theta=theta, softening=softening)
+    return int(targets[np.argmax(potential[:, 0])])
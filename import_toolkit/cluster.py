@@ -256,23 +256,17 @@ class Cluster(simulation.Simulation,
 				elif field == 'groupnumber' and not hasattr(self, part_type + '_' + field):
 					setattr(self, part_type + '_' + field, self.group_number_part(part_type[-1]))
 
-			radial_dist = self.radial_distance_CoP(getattr(self, f'{part_type}_coordinates'))
-			clean_radius_index = np.where(radial_dist < 5 * self.r200)[0]
+			selection = self.radius_selection(part_type[-1], 5 * self.r200)
 			if (part_type == 'partType0' and
 					hasattr(self, 'partType0_sphdensity') and
 					hasattr(self, 'partType0_temperature')):
-				density = self.density_units(getattr(self, 'partType0_sphdensity'), unit_system='nHcgs')
-				temperature = getattr(self, 'partType0_temperature')
-				log_temperature_cut = np.log10(density) / 3 + 13 / 3
-				equation_of_state_index = np.where((temperature > 1e4) & (np.log10(temperature) > log_temperature_cut))[0]
-				del density, temperature, log_temperature_cut
-				intersected_index = np.intersect1d(clean_radius_index, equation_of_state_index)
-			else:
-				intersected_index = clean_radius_index
-			for field in self.requires[part_type]:
-				if 'groupnumber' not in field:
-					filtered_attribute = getattr(self, part_type + '_' + field)[intersected_index]
-					setattr(self, part_type + '_' + field, filtered_attribute)
+				selection &= self.equation_of_state_selection()
+			# The fields are only copied if some particles are cut out
+			if selection.count < selection.size:
+				for field in self.requires[part_type]:
+					if 'groupnumber' not in field:
+						setattr(self, part_type + '_' + field, selection.apply(getattr(self, part_type + '_' + field)))
+			self.invalidate_particle_cache(part_type[-1])
 
 		for subhalo_key in requires_subhalos:
 			for field in self.requires[subhalo_key]:
@@ -334,23 +328,16 @@ class Cluster(simulation.Simulation,
 					setattr(self, part_type + '_' + field, data[f'partType{part_type[-1]}'][field])
 
 			# Filter the arrays according to phase diagram and 5xR200 radius
-			radial_dist = self.radial_distance_CoP(getattr(self, f'{part_type}_coordinates'))
-			clean_radius_index = np.where(radial_dist < 5 * self.r200)[0]
+			selection = self.radius_selection(part_type[-1], 5 * self.r200)
 			if (part_type == 'partType0' and
 					hasattr(self, 'partType0_sphdensity') and
 					hasattr(self, 'partType0_temperature')):
-				density = self.density_units(getattr(self, 'partType0_sphdensity'), unit_system='nHcgs')
-				temperature = getattr(self, 'partType0_temperature')
-				log_temperature_cut = np.log10(density) / 3 + 13 / 3
-				equation_of_state_index = np.where((temperature > 1e4) & (np.log10(temperature) > log_temperature_cut))[0]
-				del density, temperature, log_temperature_cut
-				intersected_index = np.intersect1d(clean_radius_index, equation_of_state_index)
-			else:
-				intersected_index = clean_radius_index
-
-			# Filter arrays accordintg to previous rules
-			for field in data[part_type]:
-				filtered_attribute = getattr(self, part_type + '_' + field)[intersected_index]
-				setattr(self, part_type + '_' + field, filtered_attribute)
+				selection &= self.equation_of_state_selection()
+
+			# Filter arrays accordintg to previous rules, only if some particles are cut out
+			if selection.count < selection.size:
+				for field in data[part_type]:
+					setattr(self, part_type + '_' + field, selection.apply(getattr(self, part_type + '_' + field)))
+			self.invalidate_particle_cache(part_type[-1])
 
 		return self
\ No newline at end of file
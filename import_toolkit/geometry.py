@@ -0,0 +1,152 @@
+"""
+------------------------------------------------------------------
+FILE:   geometry.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides vectorised geometry routines for (N, 3) particle
+coordinate arrays, shared by the readers (BAHAMAS, MACSIS, C-EAGLE)
+and by the cluster.Cluster class.
+Periodic boundaries are handled with the minimum-image convention.
+All routines work through the arrays in chunks of CHUNK_SIZE rows,
+so that the temporaries never exceed the size of one chunk.
+The angle routines at the bottom work on stacks of vectors (e.g. the
+angular momenta of all particle types, apertures and clusters) and
+return all the angles with one broadcasted operation.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+
+CHUNK_SIZE = 1000000
+
+
+def periodic_recentre(coords: np.ndarray,
+                      centre: np.ndarray,
+                      boxsize: float,
+                      chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Wraps the particle coordinates IN PLACE to the periodic image closest to
+    the centre, i.e. each coordinate is shifted by an integer number of box
+    lengths so that |x - centre| <= boxsize/2 on every axis.
+    The coordinates keep the original frame of reference (they are not
+    centred on `centre`), so they can still be compared with the centre of
+    potential and the FoF catalogues.
+
+    :param coords: expect np.ndarray of shape (N, 3), floating point
+        The particle coordinates. The array is modified in place.
+    :param centre: expect array-like with 3 components
+        The reference point, e.g. the centre of potential of the cluster.
+    :param boxsize: expect float
+        The side of the periodic box, in the same units as `coords`.
+    :param chunk_size: expect int
+        Number of rows processed at a time.
+    :return: np.ndarray
+        The same `coords` array, for convenience.
+    """
+    centre = np.asarray(centre, dtype=coords.dtype)
+    for start in range(0, len(coords), chunk_size):
+        block = coords[start:start + chunk_size]
+        block -= centre
+        block -= boxsize * np.rint(block / boxsize)
+        block += centre
+    return coords
+
+
+def radial_distance(coords: np.ndarray,
+                    centre: np.ndarray,
+                    boxsize: float = None,
+                    chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Computes the distance of each particle from the centre. If `boxsize` is
+    given, the minimum-image (periodic) distance is returned.
+
+    :param coords: expect array-like of shape (N, 3)
+    :param centre: expect array-like with 3 components
+    :param boxsize: default = None (no periodic boundaries)
+    :param chunk_size: expect int
+    :return: np.ndarray of shape (N,)
+    """
+    coords = np.asarray(coords)
+    centre = np.asarray(centre, dtype=np.float64)
+    distance = np.empty(len(coords), dtype=np.result_type(coords.dtype, np.float64))
+    for start in range(0, len(coords), chunk_size):
+        block = np.subtract(coords[start:start + chunk_size], centre)
+        if boxsize is not None:
+            block -= boxsize * np.rint(block / boxsize)
+        np.sqrt(np.einsum('ij,ij->i', block, block), out=distance[start:start + chunk_size])
+    return distance
+
+
+def periodic_box_mask(coords: np.ndarray,
+                      centre: np.ndarray,
+                      half_side: float,
+                      boxsize: float = None,
+                      chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Selects the particles within a cube of side 2*half_side centred on
+    `centre`, accounting for the periodic boundaries if `boxsize` is given.
+    The coordinates are not modified.
+
+    :param coords: expect array-like of shape (N, 3)
+    :param centre: expect array-like with 3 components
+    :param half_side: expect float
+        Half of the side of the cube, e.g. 5*R200.
+    :param boxsize: default = None (no periodic boundaries)
+    :param chunk_size: expect int
+    :return: np.ndarray of booleans with shape (N,)
+    """
+    coords = np.asarray(coords)
+    centre = np.asarray(centre, dtype=np.float64)
+    mask = np.empty(len(coords), dtype=np.bool_)
+    for start in range(0, len(coords), chunk_size):
+        block = np.subtract(coords[start:start + chunk_size], centre)
+        if boxsize is not None:
+            block -= boxsize * np.rint(block / boxsize)
+        np.abs(block, out=block)
+        np.all(block < half_side, axis=1, out=mask[start:start + chunk_size])
+    return mask
+
+
+def vector_angles(vectors1: np.ndarray, vectors2: np.ndarray, cosine: bool = False) -> np.ndarray:
+    """
+    Computes the angles between corresponding vectors of two stacks.
+    The angle is found as atan2(|v1 x v2|, v1 . v2), which is accurate for
+    (anti-)parallel vectors, where the arccos of the cosine loses precision.
+
+    :param vectors1: expect array-like of shape (..., 3)
+    :param vectors2: expect array-like of shape (..., 3), broadcastable to vectors1
+    :param cosine: default = False
+        If True, returns the cosine of the angle (clipped to [-1, 1]), as
+        _cluster_profiler.Mixin.angle_between_vectors, instead of degrees.
+    :return: np.ndarray of shape (...)
+        The angles in degrees, or their cosine. NaN where one of the vectors is null.
+    """
+    vectors1 = np.asarray(vectors1, dtype=np.float64)
+    vectors2 = np.asarray(vectors2, dtype=np.float64)
+    dot = np.einsum('...i,...i->...', vectors1, vectors2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if cosine:
+            norms = np.linalg.norm(vectors1, axis=-1) * np.linalg.norm(vectors2, axis=-1)
+            return np.clip(dot / np.where(norms > 0, norms, np.nan), -1., 1.)
+        null = (np.linalg.norm(vectors1, axis=-1) == 0) | (np.linalg.norm(vectors2, axis=-1) == 0)
+        angle = np.degrees(np.arctan2(np.linalg.norm(np.cross(vectors1, vectors2), axis=-1), dot))
+        return np.where(null, np.nan, angle)
+
+
+def pairwise_angles(vectors1: np.ndarray, vectors2: np.ndarray, cosine: bool = False) -> np.ndarray:
+    """
+    Computes the angles between all pairs of vectors of two stacks, e.g.
+    the alignment matrix of the angular momenta of the particle types
+    for all apertures and clusters at once.
+
+    :param vectors1: expect array-like of shape (..., A, 3)
+    :param vectors2: expect array-like of shape (..., B, 3)
+        The leading dimensions must broadcast with those of vectors1.
+    :param cosine: default = False (see vector_angles)
+    :return: np.ndarray of shape (..., A, B)
+        Element [..., i, j] is the angle between vectors1[..., i, :] and vectors2[..., j, :].
+    """
+    vectors1 = np.asarray(vectors1, dtype=np.float64)
+    vectors2 = np.asarray(vectors2, dtype=np.float64)
+    return vector_angles(vectors1[..., :, None, :], vectors2[..., None, :, :], cosine=cosine)
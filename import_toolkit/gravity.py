@@ -0,0 +1,450 @@
+"""
+------------------------------------------------------------------
+FILE:   gravity.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the gravitational potential energy of the
+particles within a grid of apertures, computed with a Barnes-Hut
+octree instead of the direct O(N^2) sum over pairs.
+The octree is built once, on the particles within the largest
+aperture sorted along a Morton (Z-order) curve, so that every node
+is a contiguous range of particles and its monopole (mass and centre
+of mass) for any subset of the particles is a difference of
+cumulative sums. The apertures are nested: sorting them by radius,
+each particle is assigned to the shell between two consecutive
+apertures and only interacts with the particles of its own and the
+inner shells. Every particle is then walked through the same tree
+exactly once, and the energies of all apertures are the cumulative
+sums over the shells. The monopoles of the inner shells are carried
+from one shell to the next, so that each particle is added to the
+node monopoles only once:
+
+    W(< R_k) = - G sum_{shells s <= k} sum_{i in s} m_i (phi_inner(i) + phi_s(i) / 2)
+
+A node is accepted as a monopole if size < theta * distance from
+its geometric centre (theta < 1), otherwise it is opened. With numba
+the walk runs in parallel over the particles, otherwise the same
+walk is vectorised with NumPy on chunks of particles.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+
+from ._cluster_profiler import Mixin as ProfilerMixin, G_astro
+from . import kernels
+
+if kernels.NUMBA_AVAILABLE:
+    from numba import njit, prange
+
+# Opening angle and maximum number of particles in a leaf
+THETA = 0.5
+LEAF_SIZE = 16
+# Bits per dimension of the Morton keys, i.e. maximum depth of the tree
+MORTON_BITS = 21
+# Number of particles walked together by the NumPy version
+WALK_CHUNK_SIZE = 4096
+
+# Datasets added to group_dynamics
+gravity_keys = ('potential_energy', 'virial_ratio')
+
+# Energy units as in group_dynamics: from 10^10 M_sun (km/s)^2 to SI, then scaled by 10^-46
+potential_energy_factor = ProfilerMixin.mass_units(1.) * ProfilerMixin.velocity_units(1.) ** 2 * np.power(10., -46)
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """
+    Inserts two zero bits between each of the lowest 21 bits of the values.
+    """
+    v = values.astype(np.uint64) & np.uint64(0x1fffff)
+    for shift, mask in [(32, 0x1f00000000ffff), (16, 0x1f0000ff0000ff), (8, 0x100f00f00f00f00f),
+                        (4, 0x10c30c30c30c30c3), (2, 0x1249249249249249)]:
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+def _ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Concatenation of np.arange(start, start + count) for each start and count.
+    """
+    offsets = np.cumsum(counts) - counts
+    return np.arange(np.sum(counts), dtype=np.int64) + np.repeat(starts - offsets, counts)
+
+
+class Octree:
+
+    def __init__(self, coords: np.ndarray, leaf_size: int = LEAF_SIZE):
+        """
+        Builds the octree of a set of particles, one level at a time.
+        The particles are stored in the tree (Morton) order: the particles of
+        node n are coords[start[n]:end[n]], and its children are the nodes
+        child_first[n] to child_first[n] + child_count[n] (none for leaves).
+
+        :param coords: expect np.ndarray of shape (N, 3)
+        :param leaf_size: expect int
+            Nodes with at most `leaf_size` particles are not split further.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        n = len(coords)
+        lower = coords.min(axis=0) if n > 0 else np.zeros(3)
+        size = float(np.max(np.ptp(coords, axis=0))) if n > 0 else 0.
+        size = size * (1. + 1e-9) if size > 0 else 1.
+
+        cells = np.minimum(((coords - lower) / size * (1 << MORTON_BITS)).astype(np.int64), (1 << MORTON_BITS) - 1)
+        keys = (_spread_bits(cells[:, 0]) << np.uint64(2)) | (_spread_bits(cells[:, 1]) << np.uint64(1)) | \
+               _spread_bits(cells[:, 2])
+        self.order = np.argsort(keys, kind='stable')
+        self.coords = coords[self.order]
+        keys = keys[self.order]
+
+        level = {'start': np.array([0]), 'end': np.array([n]), 'centre': (lower + 0.5 * size)[None, :],
+                 'size': np.array([size])}
+        levels = []
+        n_nodes = 1
+        for depth in range(MORTON_BITS + 1):
+            counts = level['end'] - level['start']
+            level['child_first'] = np.full(len(counts), -1, dtype=np.int64)
+            level['child_count'] = np.zeros(len(counts), dtype=np.int64)
+            levels.append(level)
+            parents = np.flatnonzero(counts > leaf_size)
+            if depth == MORTON_BITS or len(parents) == 0:
+                break
+
+            # Runs of the same octant within the particles of each parent node
+            particles = _ranges(level['start'][parents], counts[parents])
+            owner = np.repeat(parents, counts[parents])
+            octant = ((keys[particles] >> np.uint64(3 * (MORTON_BITS - depth - 1))) & np.uint64(7)).astype(np.int64)
+            is_first = np.ones(len(particles), dtype=bool)
+            is_first[1:] = (octant[1:] != octant[:-1]) | (owner[1:] != owner[:-1])
+            first = np.flatnonzero(is_first)
+            child_owner = owner[first]
+            child_count = np.bincount(child_owner, minlength=len(counts))
+            level['child_count'] = child_count.astype(np.int64)
+            level['child_first'][parents] = n_nodes + np.cumsum(child_count)[parents] - child_count[parents]
+            n_nodes += len(first)
+
+            bits = np.column_stack(((octant[first] >> 2) & 1, (octant[first] >> 1) & 1, octant[first] & 1))
+            half = 0.5 * level['size'][child_owner]
+            level = {
+                    'start' : particles[first],
+                    'end'   : particles[np.append(first[1:], len(particles)) - 1] + 1,
+                    'centre': level['centre'][child_owner] + (bits - 0.5) * half[:, None],
+                    'size'  : half,
+            }
+
+        self.start = np.concatenate([level['start'] for level in levels]).astype(np.int64)
+        self.end = np.concatenate([level['end'] for level in levels]).astype(np.int64)
+        self.centre = np.concatenate([level['centre'] for level in levels])
+        self.size = np.concatenate([level['size'] for level in levels])
+        self.child_first = np.concatenate([level['child_first'] for level in levels])
+        self.child_count = np.concatenate([level['child_count'] for level in levels])
+        # First node of each level, and the leaf of each particle in tree order
+        self.level_first = np.cumsum([0] + [len(level['start']) for level in levels])
+        leaves = np.flatnonzero(self.child_count == 0)
+        counts = self.end[leaves] - self.start[leaves]
+        self.leaf = np.empty(n, dtype=np.int64)
+        self.leaf[_ranges(self.start[leaves], counts)] = np.repeat(leaves, counts)
+
+    def __len__(self):
+        return len(self.start)
+
+    def node_monopoles(self,
+                       mass: np.ndarray,
+                       group: np.ndarray,
+                       n_groups: int,
+                       particles: np.ndarray = None) -> np.ndarray:
+        """
+        Mass and mass-weighted coordinates of the particles of each group in each node.
+        The particles are binned into their leaves in one pass, and each level of
+        nodes is then the sum of its children, from the deepest level up.
+
+        :param mass: expect np.ndarray of shape (N,), in tree order
+        :param group: expect np.ndarray of integers with shape (N,), in tree order
+            Particles with negative groups are left out.
+        :param n_groups: expect int
+        :param particles: default = None (all), otherwise the indices in tree order
+            of the only particles to add
+        :return: np.ndarray of shape (N_nodes, n_groups, 4)
+        """
+        if particles is None:
+            particles = np.arange(len(mass))
+        particles = particles[group[particles] >= 0]
+        bins = self.leaf[particles] * n_groups + group[particles]
+        weights = np.column_stack((mass[particles], self.coords[particles] * mass[particles, None]))
+        monopoles = np.column_stack([np.bincount(bins, weights=weights[:, i], minlength=len(self) * n_groups)
+                                     for i in range(4)]).reshape(len(self), n_groups, 4)
+        for depth in range(len(self.level_first) - 3, -1, -1):
+            parents = np.arange(self.level_first[depth], self.level_first[depth + 1])
+            parents = parents[self.child_count[parents] > 0]
+            if len(parents) == 0:
+                continue
+            children = monopoles[self.level_first[depth + 1]:self.level_first[depth + 2]]
+            monopoles[parents] = np.add.reduceat(children, self.child_first[parents] - self.level_first[depth + 1])
+        return monopoles
+
+
+if kernels.NUMBA_AVAILABLE:
+
+    @njit(parallel=True, cache=True)
+    def _tree_potential(targets, coords, mass, group, start, end, centre, size, child_first, child_count,
+                        monopoles, active, theta2, softening2):
+        n_groups = monopoles.shape[1]
+        phi = np.zeros((targets.shape[0], n_groups))
+        for t in prange(targets.shape[0]):
+            i = targets[t]
+            stack = np.empty(512, dtype=np.int64)
+            stack[0] = 0
+            top = 1
+            while top > 0:
+                top -= 1
+                node = stack[top]
+                if child_count[node] == 0:
+                    for j in range(start[node], end[node]):
+                        if j == i or group[j] < 0:
+                            continue
+                        dx = coords[j, 0] - coords[i, 0]
+                        dy = coords[j, 1] - coords[i, 1]
+                        dz = coords[j, 2] - coords[i, 2]
+                        phi[t, group[j]] += mass[j] / np.sqrt(dx * dx + dy * dy + dz * dz + softening2)
+                    continue
+                dx = centre[node, 0] - coords[i, 0]
+                dy = centre[node, 1] - coords[i, 1]
+                dz = centre[node, 2] - coords[i, 2]
+                if size[node] * size[node] < theta2 * (dx * dx + dy * dy + dz * dz):
+                    for g in range(n_groups):
+                        m = monopoles[node, g, 0]
+                        if m > 0:
+                            dx = monopoles[node, g, 1] / m - coords[i, 0]
+                            dy = monopoles[node, g, 2] / m - coords[i, 1]
+                            dz = monopoles[node, g, 3] / m - coords[i, 2]
+                            phi[t, g] += m / np.sqrt(dx * dx + dy * dy + dz * dz + softening2)
+                    continue
+                for child in range(child_first[node], child_first[node] + child_count[node]):
+                    if active[child]:
+                        stack[top] = child
+                        top += 1
+        return phi
+
+
+def _tree_potential_numpy(targets, tree, mass, group, monopoles, active, theta2, softening2):
+    """
+    NumPy version of the tree walk: the (particle, node) pairs of a chunk of
+    particles are advanced one level at a time.
+    """
+    n_groups = monopoles.shape[1]
+    phi = np.zeros((len(targets), n_groups), dtype=np.float64)
+    for first in range(0, len(targets), WALK_CHUNK_SIZE):
+        block = targets[first:first + WALK_CHUNK_SIZE]
+        flat = np.zeros(len(block) * n_groups, dtype=np.float64)
+        pair_target = np.arange(len(block))
+        pair_node = np.zeros(len(block), dtype=np.int64)
+        while len(pair_target) > 0:
+            x = tree.coords[block[pair_target]]
+            leaf = tree.child_count[pair_node] == 0
+            distance2 = np.sum((tree.centre[pair_node] - x) ** 2, axis=1)
+            accept = ~leaf & (tree.size[pair_node] ** 2 < theta2 * distance2)
+
+            # Monopoles of the accepted nodes
+            node_mass = monopoles[pair_node[accept], :, 0]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                node_com = monopoles[pair_node[accept], :, 1:] / node_mass[..., None]
+                separation = np.sqrt(np.sum((node_com - x[accept][:, None, :]) ** 2, axis=-1) + softening2)
+                contribution = np.where(node_mass > 0, node_mass / separation, 0.)
+            bins = pair_target[accept][:, None] * n_groups + np.arange(n_groups)
+            flat += np.bincount(bins.ravel(), weights=contribution.ravel(), minlength=len(flat))
+
+            # Direct sums over the particles of the leaves
+            counts = tree.end[pair_node[leaf]] - tree.start[pair_node[leaf]]
+            j = _ranges(tree.start[pair_node[leaf]], counts)
+            t = np.repeat(pair_target[leaf], counts)
+            keep = (j != block[t]) & (group[j] >= 0)
+            j, t = j[keep], t[keep]
+            separation = np.sqrt(np.sum((tree.coords[j] - tree.coords[block[t]]) ** 2, axis=1) + softening2)
+            flat += np.bincount(t * n_groups + group[j], weights=mass[j] / separation, minlength=len(flat))
+
+            # Open the remaining nodes
+            opened = ~leaf & ~accept
+            counts = tree.child_count[pair_node[opened]]
+            children = _ranges(tree.child_first[pair_node[opened]], counts)
+            t = np.repeat(pair_target[opened], counts)
+            pair_target, pair_node = t[active[children]], children[active[children]]
+        phi[first:first + len(block)] = flat.reshape(len(block), n_groups)
+    return phi
+
+def tree_potential(tree: Octree,
+                   targets: np.ndarray,
+                   mass: np.ndarray,
+                   group: np.ndarray,
+                   n_groups: int,
+                   theta: float = THETA,
+                   softening: float = 0.,
+                   monopoles: np.ndarray = None) -> np.ndarray:
+    """
+    Potential (without the factor -G) at the target particles, due to each group of
+    particles separately:
+
+        phi_g(i) = sum_{j in g, j != i} m_j / sqrt(|x_i - x_j|^2 + softening^2)
+
+    :param tree: expect Octree
+    :param targets: expect np.ndarray of integers, indices in tree order
+    :param mass: expect np.ndarray of shape (N,), in tree order
+    :param group: expect np.ndarray of integers with shape (N,), in tree order
+        Particles with negative groups exert no force.
+    :param n_groups: expect int
+    :param theta: expect float between 0 and 1, the opening angle
+    :param softening: expect float, Plummer softening length
+    :param monopoles: default = None (computed), otherwise tree.node_monopoles(mass, group, n_groups)
+    :return: np.ndarray of shape (N_targets, n_groups)
+    """
+    if not 0. < theta < 1.:
+        raise ValueError(f"The opening angle must be between 0 and 1, got {theta}.")
+    mass = np.asarray(mass, dtype=np.float64)
+    group = np.asarray(group, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if monopoles is None:
+        monopoles = tree.node_monopoles(mass, group, n_groups)
+    active = monopoles[:, :, 0].sum(axis=1) > 0
+    if not kernels.NUMBA_AVAILABLE:
+        return _tree_potential_numpy(targets, tree, mass, group, monopoles, active, theta ** 2, softening ** 2)
+    return _tree_potential(targets, tree.coords, mass, group, tree.start, tree.end, tree.centre, tree.size,
+                           tree.child_first, tree.child_count, monopoles, active, theta ** 2, softening ** 2)
+
+
+def aperture_pair_energies(radius: np.ndarray,
+                           mass: np.ndarray,
+                           coords: np.ndarray,
+                           labels: np.ndarray,
+                           apertures: np.ndarray,
+                           n_labels: int = None,
+                           theta: float = THETA,
+                           softening: float = 0.,
+                           leaf_size: int = LEAF_SIZE) -> np.ndarray:
+    """
+    Sums of m_i m_j / |x_i - x_j| over the pairs of particles within each aperture,
+    split by the labels (e.g. the particle types) of the two particles. The tree is
+    built once for all apertures (see the description of the file).
+
+    :param radius: expect np.ndarray of shape (N,)
+        Distance of the particles from the centre of the apertures.
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param labels: expect np.ndarray of integers with shape (N,), from 0 to n_labels - 1
+    :param apertures: expect array-like of shape (N_apertures,), in any order
+    :param n_labels: default = None (labels.max() + 1)
+    :param theta: expect float, the opening angle
+    :param softening: expect float, Plummer softening length
+    :param leaf_size: expect int
+    :return: np.ndarray of shape (N_apertures, n_labels, n_labels)
+        Each pair is counted once, in either [a, b] or [b, a]: only the symmetric
+        part is meaningful (see potential_energy_from_pairs).
+    """
+    apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+    labels = np.asarray(labels, dtype=np.int64)
+    if n_labels is None:
+        n_labels = int(labels.max()) + 1 if len(labels) > 0 else 1
+    aperture_order = np.argsort(apertures, kind='stable')
+    edges = apertures[aperture_order]
+    pairs = np.zeros((len(edges), n_labels, n_labels), dtype=np.float64)
+
+    # Number of apertures with R <= r: the particle is enclosed by all the others
+    shell = np.searchsorted(edges, np.asarray(radius), side='right')
+    inside = np.flatnonzero(shell < len(edges))
+    if len(inside) > 0:
+        tree = Octree(np.asarray(coords)[inside], leaf_size=leaf_size)
+        mass = np.asarray(mass, dtype=np.float64)[inside][tree.order]
+        shell = shell[inside][tree.order]
+        labels = labels[inside][tree.order]
+        # Sources: group 2 * label for the inner shells, 2 * label + 1 for the same shell
+        monopoles = np.zeros((len(tree), 2 * n_labels, 4), dtype=np.float64)
+        shell_order = np.argsort(shell, kind='stable')
+        shell_first = np.searchsorted(shell[shell_order], np.arange(len(edges) + 1))
+        for k in range(len(edges)):
+            targets = np.sort(shell_order[shell_first[k]:shell_first[k + 1]])
+            if len(targets) == 0:
+                continue
+            monopoles[:, 1::2] = tree.node_monopoles(mass, labels, n_labels, particles=targets)
+            group = np.where(shell < k, 2 * labels, 2 * labels + 1)
+            group[shell > k] = -1
+            phi = tree_potential(tree, targets, mass, group, 2 * n_labels, theta=theta, softening=softening,
+                                 monopoles=monopoles)
+            energy = mass[targets, None] * (phi[:, 0::2] + 0.5 * phi[:, 1::2])
+            np.add.at(pairs[k], labels[targets], energy)
+            monopoles[:, 0::2] += monopoles[:, 1::2]
+
+    pairs = np.cumsum(pairs, axis=0)
+    return pairs[np.argsort(aperture_order)]
+
+def potential_energy_from_pairs(pairs: np.ndarray) -> np.ndarray:
+    """
+    Potential energy of all the particles and of each label, from the pair sums of
+    aperture_pair_energies, in units of 10^10 M_sun (km/s)^2. The energy of each
+    pair is shared equally between the labels of the two particles, so that the
+    energies of the labels add up to the total.
+
+    :param pairs: expect np.ndarray of shape (..., n_labels, n_labels)
+    :return: np.ndarray of shape (..., 1 + n_labels), ordered as [total, label 0, label 1, ...]
+    """
+    total = -G_astro * pairs.sum(axis=(-1, -2))
+    labels = -0.5 * G_astro * (pairs.sum(axis=-1) + pairs.sum(axis=-2))
+    return np.concatenate((total[..., None], labels), axis=-1)
+
+def virial_ratio(kinetic_energy: np.ndarray, potential_energy: np.ndarray) -> np.ndarray:
+    """
+    Virial ratio 2K / |W|, equal to 1 for a system in virial equilibrium.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 2. * np.asarray(kinetic_energy) / np.abs(potential_energy)
+
+
+def direct_potential_energy(mass: np.ndarray,
+                            coords: np.ndarray,
+                            softening: float = 0.,
+                            chunk_size: int = 2048) -> float:
+    """
+    Potential energy of a set of particles by direct summation over all pairs, in
+    units of 10^10 M_sun (km/s)^2. O(N^2): only use on small sets of particles,
+    e.g. to check the accuracy of the tree.
+
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param softening: expect float, Plummer softening length
+    :param chunk_size: expect int, number of rows of the distance matrix at a time
+    :return: float
+    """
+    mass = np.asarray(mass, dtype=np.float64)
+    coords = np.asarray(coords, dtype=np.float64)
+    energy = 0.
+    for start in range(0, len(mass), chunk_size):
+        block = slice(start, start + chunk_size)
+        separation2 = np.sum((coords[block, None, :] - coords[None, :, :]) ** 2, axis=-1) + softening ** 2
+        rows = np.arange(start, min(start + chunk_size, len(mass)))
+        separation2[rows - start, rows] = np.inf
+        energy += np.sum(mass[block, None] * mass[None, :] / np.sqrt(separation2))
+    return -0.5 * G_astro * energy
+
+def tree_accuracy(mass: np.ndarray,
+                  coords: np.ndarray,
+                  n_sample: int = 2000,
+                  theta: float = THETA,
+                  softening: float = 0.,
+                  seed: int = None) -> float:
+    """
+    Relative error of the tree potential energy with respect to the direct sum, on
+    a random subsample of the particles. The subsample has the same spatial
+    distribution as the full set, so that its error is representative.
+
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param n_sample: expect int
+    :param theta: expect float, the opening angle
+    :param softening: expect float, Plummer softening length
+    :param seed: default = None, otherwise int for the random subsample
+    :return: float, |W_tree - W_direct| / |W_direct|
+    """
+    mass = np.asarray(mass)
+    sample = np.random.RandomState(seed).choice(len(mass), min(n_sample, len(mass)), replace=False)
+    mass, coords = mass[sample], np.asarray(coords)[sample]
+    pairs = aperture_pair_energies(np.zeros(len(mass)), mass, coords, np.zeros(len(mass), dtype=np.int64), [1.],
+                                   theta=theta, softening=softening)
+    tree_energy = potential_energy_from_pairs(pairs)[0, 0]
+    direct_energy = direct_potential_energy(mass, coords, softening=softening)
+    return float(np.abs(tree_energy - direct_energy) / np.abs(direct_energy))
@@ -0,0 +1,75 @@
+"""
+------------------------------------------------------------------
+FILE:   jackknife.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the delete-one-block jackknife errors of the
+aperture quantities. The particles are split into N_b blocks, either
+spatial (azimuthal wedges about the centre, so that every block
+spans all the apertures) or random. The additive moments of
+apertures.particle_moments are accumulated once per block and per
+aperture (one np.bincount per column, as for the subhalos), and the
+moments with block b left out are the total minus the moments of
+block b. The quantities of all the N_b leave-one-out samples and all
+the apertures then follow from the usual moment formulae, and
+
+    error = sqrt( (N_b - 1) / N_b * sum_b (theta_b - mean(theta))^2 )
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+
+# Default number of jackknife blocks
+N_BLOCKS = 16
+
+
+def jackknife_blocks(coords: np.ndarray,
+                     n_blocks: int = N_BLOCKS,
+                     centre: np.ndarray = None,
+                     method: str = 'spatial',
+                     rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Assigns each particle to a jackknife block.
+
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param n_blocks: expect int
+    :param centre: default = None (coords are already relative to the centre)
+    :param method: expect 'spatial' or 'random'
+        'spatial' splits the particles in n_blocks azimuthal wedges of equal
+        angle about the z axis through the centre, 'random' draws the blocks at random.
+    :param rng: default = None (np.random.default_rng()), only for method = 'random'
+    :return: np.ndarray of integers with shape (N,), from 0 to n_blocks - 1
+    """
+    coords = np.asarray(coords)
+    if method == 'random':
+        if rng is None:
+            rng = np.random.default_rng()
+        return rng.integers(0, n_blocks, len(coords))
+    elif method == 'spatial':
+        x = coords[:, 0] - (0. if centre is None else centre[0])
+        y = coords[:, 1] - (0. if centre is None else centre[1])
+        wedge = np.floor((np.arctan2(y, x) + np.pi) / (2 * np.pi) * n_blocks).astype(np.int64)
+        return np.minimum(wedge, n_blocks - 1)
+    raise ValueError(f"Jackknife blocks method {method} not recognised. Use 'spatial' or 'random'.")
+
+def leave_one_out(moments: np.ndarray, axis: int = 0) -> np.ndarray:
+    """
+    Moments with each block left out, from the moments of the blocks.
+
+    :param moments: expect np.ndarray with the blocks along `axis`
+    :return: np.ndarray of the same shape
+    """
+    return np.sum(moments, axis=axis, keepdims=True) - moments
+
+def jackknife_error(estimates: np.ndarray, axis: int = 0) -> np.ndarray:
+    """
+    Jackknife standard error from the leave-one-out estimates.
+
+    :param estimates: expect np.ndarray with the N_b leave-one-out estimates along `axis`
+    :return: np.ndarray with `axis` removed
+    """
+    estimates = np.asarray(estimates, dtype=np.float64)
+    n_blocks = estimates.shape[axis]
+    deviation = estimates - np.mean(estimates, axis=axis, keepdims=True)
+    return np.sqrt((n_blocks - 1) / n_blocks * np.sum(deviation ** 2, axis=axis))
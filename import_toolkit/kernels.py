@@ -0,0 +1,219 @@
+"""
+------------------------------------------------------------------
+FILE:   kernels.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides compiled versions of the particle reductions of
+the profiler (centre of mass, zero momentum frame, angular momentum,
+inertia tensor and kinetic energy), together with the fused kernel
+that accumulates all the aperture moments in one pass.
+The compiled kernels loop over the particles once, accumulating in
+double precision without allocating (N, 3) temporaries, and split the
+particles in blocks that are reduced in parallel with numba.prange.
+The static methods of _cluster_profiler dispatch to these kernels when
+numba is available. Numba is an optional dependency: if it cannot be
+imported, the functions in this file are the NumPy versions of
+_cluster_profiler.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+
+from ._cluster_profiler import Mixin as ProfilerMixin
+
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Number of particles below which the compiled kernels run on a single block
+MIN_BLOCK_SIZE = 50000
+
+
+def _number_of_blocks(n: int) -> int:
+    return int(max(1, min(numba.get_num_threads() * 4, n // MIN_BLOCK_SIZE)))
+
+def _as_centre(centre) -> np.ndarray:
+    return np.zeros(3, dtype=np.float64) if centre is None else np.asarray(centre, dtype=np.float64)
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(parallel=True, cache=True)
+    def _weighted_sum(mass, vectors, n_blocks):
+        n = mass.shape[0]
+        block_size = (n + n_blocks - 1) // n_blocks
+        partial = np.zeros((n_blocks, 4))
+        for b in prange(n_blocks):
+            for i in range(b * block_size, min(n, (b + 1) * block_size)):
+                m = np.float64(mass[i])
+                partial[b, 0] += m
+                partial[b, 1] += m * vectors[i, 0]
+                partial[b, 2] += m * vectors[i, 1]
+                partial[b, 3] += m * vectors[i, 2]
+        return partial.sum(axis=0)
+
+    @njit(parallel=True, cache=True)
+    def _angular_momentum(mass, coords, velocity, n_blocks):
+        n = mass.shape[0]
+        block_size = (n + n_blocks - 1) // n_blocks
+        partial = np.zeros((n_blocks, 3))
+        for b in prange(n_blocks):
+            for i in range(b * block_size, min(n, (b + 1) * block_size)):
+                m = np.float64(mass[i])
+                x, y, z = coords[i, 0], coords[i, 1], coords[i, 2]
+                vx, vy, vz = velocity[i, 0], velocity[i, 1], velocity[i, 2]
+                partial[b, 0] += m * (y * vz - z * vy)
+                partial[b, 1] += m * (z * vx - x * vz)
+                partial[b, 2] += m * (x * vy - y * vx)
+        return partial.sum(axis=0)
+
+    @njit(parallel=True, cache=True)
+    def _second_moments(mass, coords, n_blocks):
+        n = mass.shape[0]
+        block_size = (n + n_blocks - 1) // n_blocks
+        partial = np.zeros((n_blocks, 6))
+        for b in prange(n_blocks):
+            for i in range(b * block_size, min(n, (b + 1) * block_size)):
+                m = np.float64(mass[i])
+                x, y, z = coords[i, 0], coords[i, 1], coords[i, 2]
+                partial[b, 0] += m * x * x
+                partial[b, 1] += m * y * y
+                partial[b, 2] += m * z * z
+                partial[b, 3] += m * x * y
+                partial[b, 4] += m * x * z
+                partial[b, 5] += m * y * z
+        return partial.sum(axis=0)
+
+    @njit(parallel=True, cache=True)
+    def _kinetic_energy(mass, velocity, n_blocks):
+        n = mass.shape[0]
+        block_size = (n + n_blocks - 1) // n_blocks
+        partial = np.zeros(n_blocks)
+        for b in prange(n_blocks):
+            for i in range(b * block_size, min(n, (b + 1) * block_size)):
+                vx, vy, vz = velocity[i, 0], velocity[i, 1], velocity[i, 2]
+                partial[b] += 0.5 * np.float64(mass[i]) * (vx * vx + vy * vy + vz * vz)
+        return partial.sum()
+
+    @njit(parallel=True, cache=True)
+    def _moment_sums(mass, coords, velocity, temperature, subgroupnumber, centre, index, indexed, n_blocks):
+        n = index.shape[0] if indexed else mass.shape[0]
+        block_size = (n + n_blocks - 1) // n_blocks
+        has_temperature = temperature.shape[0] > 0
+        has_subgroupnumber = subgroupnumber.shape[0] > 0
+        partial = np.zeros((n_blocks, 19))
+        for b in prange(n_blocks):
+            acc = np.zeros(19)
+            for j in range(b * block_size, min(n, (b + 1) * block_size)):
+                i = index[j] if indexed else j
+                m = np.float64(mass[i])
+                x = coords[i, 0] - centre[0]
+                y = coords[i, 1] - centre[1]
+                z = coords[i, 2] - centre[2]
+                mvx = m * velocity[i, 0]
+                mvy = m * velocity[i, 1]
+                mvz = m * velocity[i, 2]
+                acc[0] += m
+                acc[1] += m * x
+                acc[2] += m * y
+                acc[3] += m * z
+                acc[4] += mvx
+                acc[5] += mvy
+                acc[6] += mvz
+                acc[7] += y * mvz - z * mvy
+                acc[8] += z * mvx - x * mvz
+                acc[9] += x * mvy - y * mvx
+                acc[10] += m * x * x
+                acc[11] += m * y * y
+                acc[12] += m * z * z
+                acc[13] += m * x * y
+                acc[14] += m * x * z
+                acc[15] += m * y * z
+                acc[16] += mvx * velocity[i, 0] + mvy * velocity[i, 1] + mvz * velocity[i, 2]
+                if has_temperature:
+                    acc[17] += m * temperature[i]
+                if not has_subgroupnumber or subgroupnumber[i] == 0:
+                    acc[18] += m
+            partial[b] = acc
+        return partial.sum(axis=0)
+
+
+def centre_of_mass(mass: np.ndarray, coords: np.ndarray) -> np.ndarray:
+    """
+    Compiled version of _cluster_profiler.Mixin.centre_of_mass.
+    """
+    if not NUMBA_AVAILABLE:
+        return ProfilerMixin.centre_of_mass(mass, coords)
+    mass, coords = np.asarray(mass), np.asarray(coords)
+    sums = _weighted_sum(mass, coords, _number_of_blocks(len(mass)))
+    return sums[1:] / sums[0]
+
+def zero_momentum_frame(mass: np.ndarray, velocity: np.ndarray) -> np.ndarray:
+    """
+    Compiled version of _cluster_profiler.Mixin.zero_momentum_frame.
+    """
+    if not NUMBA_AVAILABLE:
+        return ProfilerMixin.zero_momentum_frame(mass, velocity)
+    mass, velocity = np.asarray(mass), np.asarray(velocity)
+    sums = _weighted_sum(mass, velocity, _number_of_blocks(len(mass)))
+    return sums[1:] / sums[0]
+
+def angular_momentum(mass: np.ndarray, coords: np.ndarray, velocity: np.ndarray) -> np.ndarray:
+    """
+    Compiled version of _cluster_profiler.Mixin.angular_momentum.
+    """
+    if not NUMBA_AVAILABLE:
+        return ProfilerMixin.angular_momentum(mass, coords, velocity)
+    mass, coords, velocity = np.asarray(mass), np.asarray(coords), np.asarray(velocity)
+    return _angular_momentum(mass, coords, velocity, _number_of_blocks(len(mass)))
+
+def inertia_tensor(mass: np.ndarray, coords: np.ndarray) -> np.ndarray:
+    """
+    Compiled version of _cluster_profiler.Mixin.inertia_tensor.
+    """
+    if not NUMBA_AVAILABLE:
+        return ProfilerMixin.inertia_tensor(mass, coords)
+    mass, coords = np.asarray(mass), np.asarray(coords)
+    xx, yy, zz, xy, xz, yz = _second_moments(mass, coords, _number_of_blocks(len(mass)))
+    return np.array([
+            [yy + zz, -xy, -xz],
+            [-xy, xx + zz, -yz],
+            [-xz, -yz, xx + yy],
+    ])
+
+def kinetic_energy(mass: np.ndarray, velocity: np.ndarray) -> float:
+    """
+    Compiled version of _cluster_profiler.Mixin.kinetic_energy.
+    """
+    if not NUMBA_AVAILABLE:
+        return ProfilerMixin.kinetic_energy(mass, velocity)
+    mass, velocity = np.asarray(mass), np.asarray(velocity)
+    return float(_kinetic_energy(mass, velocity, _number_of_blocks(len(mass))))
+
+def moment_sums(mass: np.ndarray,
+                coords: np.ndarray,
+                velocity: np.ndarray,
+                temperature: np.ndarray = None,
+                subgroupnumber: np.ndarray = None,
+                centre: np.ndarray = None,
+                index: np.ndarray = None) -> np.ndarray:
+    """
+    Sums of the aperture moments of a set of particles, in the column order
+    of apertures.particle_moments. Requires numba: use
+    apertures.accumulate_moments, which falls back to NumPy.
+    If `index` is given, only those particles are reduced, reading them
+    in place (see selection.Selection) instead of gathering them first.
+
+    :return: np.ndarray of shape (19,)
+    """
+    mass, coords, velocity = np.asarray(mass), np.asarray(coords), np.asarray(velocity)
+    temperature = np.zeros(0) if temperature is None else np.asarray(temperature)
+    subgroupnumber = np.zeros(0, dtype=np.int64) if subgroupnumber is None else np.asarray(subgroupnumber)
+    indexed = index is not None
+    index = np.zeros(0, dtype=np.int64) if index is None else np.asarray(index, dtype=np.int64)
+    return _moment_sums(mass, coords, velocity, temperature, subgroupnumber, _as_centre(centre), index, indexed,
+                        _number_of_blocks(len(index) if indexed else len(mass)))
@@ -11,6 +11,7 @@ Future implementations:
     - MPI meta-methods and multi-threading
 -------------------------------------------------------------------
 """
+from collections import OrderedDict
 from mpi4py import MPI
 import networkx
 
@@ -34,6 +35,69 @@ def free_memory(var_list, invert=False):
                 del globals()[name]
 
 
+def _nbytes(value) -> int:
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return int(getattr(value, 'nbytes', 0))
+
+class BoundedCache:
+    """
+    Dictionary with least-recently-used eviction, bounded both in number of
+    entries and in the total size of the numpy arrays it holds.
+    Used by cluster.Cluster to keep radial distances and aperture selections
+    between calls of the group_* methods.
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 2 ** 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def get(self, key, default=None):
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        self.misses += 1
+        return default
+
+    def __setitem__(self, key, value) -> None:
+        self.pop(key)
+        self._data[key] = value
+        self.nbytes += _nbytes(value)
+        # Evict the least recently used entries, but never the one just inserted
+        while len(self._data) > 1 and (len(self._data) > self.max_entries or self.nbytes > self.max_bytes):
+            _, evicted = self._data.popitem(last=False)
+            self.nbytes -= _nbytes(evicted)
+
+    def pop(self, key, default=None):
+        if key in self._data:
+            value = self._data.pop(key)
+            self.nbytes -= _nbytes(value)
+            return value
+        return default
+
+    def discard(self, predicate) -> None:
+        """
+        Removes all entries whose key satisfies predicate(key).
+        """
+        for key in [key for key in self._data if predicate(key)]:
+            self.pop(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.nbytes = 0
+
+
 def dict_key_finder(dictionary : dict, search: str) -> list:
     search_output = []
     for key in list(dictionary.keys()):
@@ -1,12 +1,171 @@
-import sys
 import os
-import itertools
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import h5py
 import yaml
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
-from import_toolkit.cluster import Cluster
+# Subject directories that make an entry of the sample complete
+completeness_subjects = {'groups': 'eagle_subfind_tab_', 'particledata': 'eagle_subfind_particles_'}
+
+
+def _halo_path(simulation_obj, halo_id: int) -> str:
+    """
+    Data directory of a halo, as in Cluster.path_from_cluster_name, without building a Cluster.
+    """
+    if simulation_obj.simulation_name == 'bahamas':
+        return simulation_obj.pathData
+    return os.path.join(simulation_obj.pathData,
+                        simulation_obj.cluster_prefix + simulation_obj.halo_Num(halo_id),
+                        'data')
+
+def _subject_dirname(simulation_obj, subject: str, redshift: str) -> str:
+    """
+    Name of the subject directory at a redshift, as in _cluster_retriever.Mixin.data_subject.
+    """
+    redshift_index = simulation_obj.zcat['z_IDNumber'][simulation_obj.redshiftAllowed.index(redshift)]
+    dirname = f"{subject}_{redshift_index}"
+    if simulation_obj.simulation_name in ['celr_e', 'ceagle']:
+        dirname += f"_{redshift}"
+    return dirname
+
+def _scan_subject(path: str, prefix: str) -> tuple:
+    """
+    Counts the files starting with `prefix` in a directory and sums their sizes.
+    :return: (number of files, total size in bytes)
+    """
+    count, size = 0, 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith(prefix) and entry.is_file():
+                count += 1
+                size += entry.stat().st_size
+    return count, size
+
+def _scan_directory(simulation_obj, path: str, previous: dict = None) -> tuple:
+    """
+    Scans one data directory for all redshifts. Only one listing of the directory
+    is made; the subject directories are listed only if their modification time
+    differs from the one recorded in the `previous` scan.
+    :param previous: default = None, otherwise dict with the file_counts, file_sizes
+        and mtimes of the same directory, each with shape (N_redshifts, N_subjects)
+    :return: (file_counts, file_sizes, mtimes), each with shape (N_redshifts, N_subjects)
+    """
+    subjects = list(completeness_subjects.keys())
+    shape = (len(simulation_obj.redshiftAllowed), len(subjects))
+    file_counts = np.zeros(shape, dtype=np.int64)
+    file_sizes = np.zeros(shape, dtype=np.int64)
+    mtimes = np.zeros(shape, dtype=np.float64)
+
+    try:
+        with os.scandir(path) as entries:
+            subject_dirs = {entry.name: entry for entry in entries if entry.is_dir()}
+    except (FileNotFoundError, NotADirectoryError):
+        return file_counts, file_sizes, mtimes
+
+    for z_index, redshift in enumerate(simulation_obj.redshiftAllowed):
+        for s_index, subject in enumerate(subjects):
+            entry = subject_dirs.get(_subject_dirname(simulation_obj, subject, redshift))
+            if entry is None:
+                continue
+            mtimes[z_index, s_index] = entry.stat().st_mtime
+            if previous is not None and previous['mtimes'][z_index, s_index] == mtimes[z_index, s_index]:
+                file_counts[z_index, s_index] = previous['file_counts'][z_index, s_index]
+                file_sizes[z_index, s_index] = previous['file_sizes'][z_index, s_index]
+            else:
+                file_counts[z_index, s_index], file_sizes[z_index, s_index] = _scan_subject(
+                        entry.path, completeness_subjects[subject])
+    return file_counts, file_sizes, mtimes
+
+def _previous_row(previous: dict, position: int) -> dict:
+    """
+    The entries of a previous scan for the halo at `position` along the cluster axis.
+    """
+    if previous is None:
+        return None
+    return {key: previous[key][position] for key in ['file_counts', 'file_sizes', 'mtimes']}
+
+def scan_completeness(simulation_obj, previous: dict = None, max_workers: int = 16) -> dict:
+    """
+    Walks the simulation tree with os.scandir, in parallel across halo directories,
+    and returns what clusters and redshifts are present in the simulation archive.
+    No HDF5 file is opened.
+    An entry is complete if both its groups and particledata directories contain
+    at least one subfind file.
+    For periodic volumes (setup = 'volume', e.g. BAHAMAS) all the halos share the
+    snapshot directories of the box: these are scanned once and the result is
+    broadcast along the cluster axis.
+
+    :param simulation_obj: expect Simulation (or Cluster) object
+    :param previous: expect dict returned by a previous call (or load_completeness_scan)
+        If given, only the subject directories modified since are listed again. A
+        directory changes its modification time when files are added, removed or
+        renamed, but not when a file is rewritten in place: the size of such a file
+        is only updated by a scan without `previous`.
+    :param max_workers: expect int
+        Number of threads scanning the halo directories.
+    :return: dict
+        'completeness'  bool array (N_clusters, N_redshifts)
+        'file_counts'   int array (N_clusters, N_redshifts, 2), number of groups and particledata files
+        'file_sizes'    int array (N_clusters, N_redshifts, 2), total size in bytes
+        'mtimes'        float array (N_clusters, N_redshifts, 2), modification time of the directories
+    """
+    n_clusters = len(simulation_obj.clusterIDAllowed)
+    if previous is not None and previous['mtimes'].shape[:2] != (n_clusters, len(simulation_obj.redshiftAllowed)):
+        previous = None
+
+    scan = {}
+    if getattr(simulation_obj, 'setup', None) == 'volume':
+        result = _scan_directory(simulation_obj, simulation_obj.pathData, _previous_row(previous, 0))
+        for key, value in zip(['file_counts', 'file_sizes', 'mtimes'], result):
+            scan[key] = np.broadcast_to(value, (n_clusters,) + value.shape)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                    lambda position: _scan_directory(simulation_obj,
+                                                     _halo_path(simulation_obj,
+                                                                simulation_obj.clusterIDAllowed[position]),
+                                                     _previous_row(previous, position)),
+                    range(n_clusters)))
+        scan['file_counts'] = np.asarray([result[0] for result in results])
+        scan['file_sizes'] = np.asarray([result[1] for result in results])
+        scan['mtimes'] = np.asarray([result[2] for result in results])
+    scan['completeness'] = np.all(scan['file_counts'] > 0, axis=2)
+    return scan
+
+def save_completeness_scan(simulation_obj, scan: dict) -> None:
+    """
+    Saves the completeness matrix as <simulation_name>_sample_completeness.npy, as read by
+    simulation.Simulation, and the full scan as <simulation_name>_sample_scan.npz.
+    """
+    np.save(os.path.join(simulation_obj.CURRENT_PATH, f'{simulation_obj.simulation_name}_sample_completeness.npy'),
+            scan['completeness'])
+    np.savez(os.path.join(simulation_obj.CURRENT_PATH, f'{simulation_obj.simulation_name}_sample_scan.npz'), **scan)
+
+def load_completeness_scan(simulation_obj) -> dict:
+    file_path = os.path.join(simulation_obj.CURRENT_PATH, f'{simulation_obj.simulation_name}_sample_scan.npz')
+    if not os.path.isfile(file_path):
+        return None
+    with np.load(file_path) as data:
+        return {key: data[key] for key in data.files}
+
+def update_completeness(simulation_obj, max_workers: int = 16) -> dict:
+    """
+    Rescans the simulation tree incrementally from the last saved scan, saves the
+    result and prints the entries whose completeness changed.
+    """
+    previous = load_completeness_scan(simulation_obj)
+    scan = scan_completeness(simulation_obj, previous=previous, max_workers=max_workers)
+    if previous is not None and previous['completeness'].shape == scan['completeness'].shape:
+        changed = previous['completeness'] != scan['completeness']
+        if getattr(simulation_obj, 'setup', None) == 'volume':
+            # All the rows are the same: report the snapshots once
+            changed[1:] = False
+        for position, z_index in zip(*np.where(changed)):
+            print(f"[+] {simulation_obj.simulation_name} halo {simulation_obj.clusterIDAllowed[position]} "
+                  f"{simulation_obj.redshiftAllowed[z_index]}: "
+                  f"{previous['completeness'][position, z_index]} -> {scan['completeness'][position, z_index]}")
+    save_completeness_scan(simulation_obj, scan)
+    return scan
 
 def check_dirs(simulation_obj) -> np.ndarray:
     """
@@ -14,16 +173,9 @@ def check_dirs(simulation_obj) -> np.ndarray:
     are present in the simulation archive.
     :return:
     """
-    iterator = itertools.product(simulation_obj.clusterIDAllowed, simulation_obj.redshiftAllowed)
-    check_matrix = np.zeros((len(simulation_obj.clusterIDAllowed), len(simulation_obj.redshiftAllowed)), dtype=np.bool)
-    for process_n, (halo_id, halo_z) in enumerate(list(iterator)):
-        cluster = Cluster(simulation_name=simulation_obj.simulation_name,
-                          clusterID=halo_id,
-                          redshift=halo_z)
-        test = cluster.is_cluster() * cluster.is_redshift()
-        check_matrix[halo_id][simulation_obj.redshiftAllowed.index(halo_z)] = test
-        if not test:
-            print(process_n, halo_id, halo_z)
+    check_matrix = scan_completeness(simulation_obj)['completeness']
+    for position, z_index in zip(*np.where(~check_matrix)):
+        print(simulation_obj.clusterIDAllowed[position], simulation_obj.redshiftAllowed[z_index])
     return check_matrix
 
 
@@ -0,0 +1,194 @@
+"""
+------------------------------------------------------------------
+FILE:   phase_table.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the radius-temperature table of the gas, for the
+phase-split aperture queries (e.g. the hot gas with T > 10^5 K of
+the kSZ maps). The additive moments of apertures.particle_moments
+are binned once in (radius, temperature), with one np.bincount per
+column, and accumulated outwards in radius and downwards in
+temperature, so that
+
+    table[i, 0]     = moments of the gas with r < radius_edges[i]
+    table[i, j + 1] = moments of the gas with r < radius_edges[i]
+                      and T > temperature_edges[j]
+
+Any query for an aperture and a temperature cut (or band) is then
+a lookup in the table, independent of the number of particles: it
+is exact on the edges of the table and interpolated bilinearly in
+(log r, log T) between them. The table only holds a few MB and is
+stored with the FOF outputs, so that later phase-split studies
+need no particle data.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+import h5py as h5
+from typing import Dict
+
+from .geometry import CHUNK_SIZE
+from .apertures import N_MOMENTS, _M, _MX, _MV, _MXV, _MT, particle_moments, thermal_energy_factor
+
+# Default temperature edges, including the 10^5, 10^6 and 10^7 K cuts exactly
+TEMPERATURE_EDGES = np.logspace(3, 9, 61)
+
+
+def _log_interpolation(edges: np.ndarray, value: np.ndarray) -> tuple:
+    """
+    Lower index and weight of the upper neighbour of `value` on the edges, in log space.
+    Values outside the edges are clipped to the first or last edge.
+    """
+    log_edges = np.log10(edges)
+    x = np.log10(np.clip(value, edges[0], edges[-1]))
+    if len(edges) == 1:
+        return np.zeros_like(x, dtype=np.int64), np.zeros_like(x)
+    index = np.clip(np.searchsorted(log_edges, x, side='right') - 1, 0, len(edges) - 2)
+    width = log_edges[index + 1] - log_edges[index]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(width > 0, (x - log_edges[index]) / width, 0.)
+    return index, weight
+
+
+class PhaseTable:
+
+    def __init__(self, radius_edges: np.ndarray, temperature_edges: np.ndarray, table: np.ndarray):
+        """
+        Cumulative radius-temperature table of the gas moments. Use PhaseTable.from_particles
+        or PhaseTable.from_hdf5.
+
+        :param radius_edges: expect sorted np.ndarray of shape (N_r,)
+        :param temperature_edges: expect sorted np.ndarray of shape (N_T,)
+        :param table: expect np.ndarray of shape (N_r, N_T + 1, N_MOMENTS + 1)
+        """
+        self.radius_edges = np.asarray(radius_edges, dtype=np.float64)
+        self.temperature_edges = np.asarray(temperature_edges, dtype=np.float64)
+        self.table = np.asarray(table, dtype=np.float64)
+
+    @classmethod
+    def from_particles(cls,
+                       radius: np.ndarray,
+                       mass: np.ndarray,
+                       coords: np.ndarray,
+                       velocity: np.ndarray,
+                       temperature: np.ndarray,
+                       radius_edges: np.ndarray,
+                       temperature_edges: np.ndarray = TEMPERATURE_EDGES,
+                       centre: np.ndarray = None,
+                       order: np.ndarray = None,
+                       chunk_size: int = CHUNK_SIZE) -> 'PhaseTable':
+        """
+        Builds the table from the gas particles. Only the particles within the largest
+        radius are read, in radial order and in chunks.
+
+        :param radius: expect np.ndarray of shape (N,)
+            Distance of the particles from the centre.
+        :param mass: expect np.ndarray of shape (N,)
+        :param coords: expect np.ndarray of shape (N, 3)
+        :param velocity: expect np.ndarray of shape (N, 3)
+        :param temperature: expect np.ndarray of shape (N,)
+        :param radius_edges: expect array-like, the apertures of the table
+        :param temperature_edges: expect array-like, the temperature cuts of the table
+        :param centre: default = None (coords are already relative to the centre)
+        :param order: default = None (computed), otherwise np.argsort(radius)
+        :param chunk_size: expect int
+        :return: PhaseTable
+        """
+        radius_edges = np.sort(np.asarray(radius_edges, dtype=np.float64))
+        temperature_edges = np.sort(np.asarray(temperature_edges, dtype=np.float64))
+        n_columns = len(temperature_edges) + 1
+        n_bins = len(radius_edges) * n_columns
+        bins_table = np.zeros((n_bins, N_MOMENTS + 1), dtype=np.float64)
+
+        if order is None:
+            order = np.argsort(radius, kind='stable')
+        index = order[:np.searchsorted(np.asarray(radius)[order], radius_edges[-1], side='left')]
+        for start in range(0, len(index), chunk_size):
+            block = index[start:start + chunk_size]
+            # Number of radius edges <= r and of temperature edges < T
+            shell = np.searchsorted(radius_edges, radius[block], side='right')
+            phase = np.searchsorted(temperature_edges, temperature[block], side='left')
+            bins = shell * n_columns + phase
+            rows = particle_moments(mass[block], coords[block], velocity[block], temperature=temperature[block],
+                                    centre=centre)
+            for column in range(N_MOMENTS):
+                bins_table[:, column] += np.bincount(bins, weights=rows[:, column], minlength=n_bins)
+            bins_table[:, -1] += np.bincount(bins, minlength=n_bins)
+
+        table = np.cumsum(bins_table.reshape(len(radius_edges), n_columns, N_MOMENTS + 1), axis=0)
+        table = np.cumsum(table[:, ::-1], axis=1)[:, ::-1]
+        return cls(radius_edges, temperature_edges, table)
+
+    @classmethod
+    def from_hdf5(cls, filename: str) -> 'PhaseTable':
+        """
+        Reads a table stored by the FOF outputs (see to_dict).
+        """
+        with h5.File(filename, 'r') as f:
+            return cls(f['radius_edges'][()], f['temperature_edges'][()], f['table'][()])
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        """
+        The datasets of the table, in the {path: array} format of the FOF outputs.
+        """
+        return {
+                '/radius_edges'     : self.radius_edges,
+                '/temperature_edges': self.temperature_edges,
+                '/table'            : self.table,
+        }
+
+    def _column(self, radius_index: np.ndarray, radius_weight: np.ndarray, t_min: float = None) -> np.ndarray:
+        """
+        Moments with T > t_min (all temperatures if t_min is None), interpolated in radius and temperature.
+        """
+        lower, upper = self.table[radius_index], self.table[radius_index + (radius_weight > 0)]
+        if t_min is None:
+            columns, weight = np.array([0, 0]), 0.
+        else:
+            index, weight = _log_interpolation(self.temperature_edges, t_min)
+            columns = np.array([index + 1, index + 1 + (weight > 0)])
+        by_radius = lower * (1. - radius_weight)[..., None, None] + upper * radius_weight[..., None, None]
+        return by_radius[..., columns[0], :] * (1. - weight) + by_radius[..., columns[1], :] * weight
+
+    def enclosed(self, aperture_radius, t_min: float = None, t_max: float = None) -> np.ndarray:
+        """
+        Moments of the gas with r < aperture_radius and t_min < T <= t_max.
+
+        :param aperture_radius: expect float or array-like of shape (N_apertures,)
+        :param t_min: default = None (no lower cut)
+        :param t_max: default = None (no upper cut)
+        :return: np.ndarray of shape (N_MOMENTS + 1,), or (N_apertures, N_MOMENTS + 1),
+            the last column is the number of particles.
+        """
+        radius_index, radius_weight = _log_interpolation(self.radius_edges, np.asarray(aperture_radius,
+                                                                                       dtype=np.float64))
+        moments = self._column(radius_index, radius_weight, t_min)
+        if t_max is not None:
+            moments = moments - self._column(radius_index, radius_weight, t_max)
+        return moments
+
+    def quantities(self, aperture_radius, t_min: float = None, t_max: float = None) -> Dict[str, np.ndarray]:
+        """
+        Gas mass, thermal energy, momentum, bulk velocity and angular momentum (in the
+        frame of the selected gas, about the centre) for an aperture and temperature
+        cut, in the units of the group_* methods.
+
+        :param aperture_radius: expect float or array-like of shape (N_apertures,)
+        :param t_min: default = None (no lower cut)
+        :param t_max: default = None (no upper cut)
+        :return: dict of np.ndarray
+        """
+        moments = self.enclosed(aperture_radius, t_min=t_min, t_max=t_max)
+        mass = moments[..., _M]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            zero_momentum_frame = moments[..., _MV] / mass[..., None]
+        return {
+                'N_particles'        : moments[..., -1],
+                'mass'               : mass,
+                'thermal_energy'     : moments[..., _MT] * thermal_energy_factor,
+                'momentum'           : moments[..., _MV],
+                'zero_momentum_frame': zero_momentum_frame,
+                'angular_momentum'   : moments[..., _MXV] - np.cross(moments[..., _MX],
+                                                                     np.nan_to_num(zero_momentum_frame)),
+        }
@@ -0,0 +1,152 @@
+"""
+------------------------------------------------------------------
+FILE:   profiles.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the radial profile engine used by the cluster
+reports. The particles of one type are sorted by distance from the
+centre once (the order is cached by the cluster), the bin edges are
+located with np.searchsorted and the particles of each bin are then
+contiguous: any number of weighted fields is binned with a single
+np.add.reduceat call over the stacked columns
+
+    w, w*f_1, w*f_1**2, w*f_2, w*f_2**2, ...
+
+from which the weighted means and dispersions of all the fields in
+all the bins follow.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+from typing import Dict
+
+
+def profile_bins(r_min: float, r_max: float, n_bins: int = 25, log: bool = True) -> np.ndarray:
+    """
+    Edges of the radial bins.
+
+    :param r_min: expect float, the inner edge (> 0 for logarithmic bins)
+    :param r_max: expect float, the outer edge
+    :param n_bins: expect int
+    :param log: default = True (logarithmic spacing), otherwise linear
+    :return: np.ndarray of shape (n_bins + 1,)
+    """
+    if log:
+        return np.logspace(np.log10(r_min), np.log10(r_max), n_bins + 1)
+    return np.linspace(r_min, r_max, n_bins + 1)
+
+
+class RadialProfiles:
+
+    def __init__(self, radius: np.ndarray, bin_edges: np.ndarray, order: np.ndarray = None):
+        """
+        Locates the bins of one particle set.
+
+        :param radius: expect np.ndarray of shape (N,)
+            Distance of the particles from the centre.
+        :param bin_edges: expect array-like of shape (N_bins + 1,), increasing
+        :param order: default = None (computed), otherwise np.argsort(radius)
+            The radial order of the particles, usually cached by the cluster.
+        """
+        self.bin_edges = np.asarray(bin_edges, dtype=np.float64)
+        if order is None:
+            order = np.argsort(radius, kind='stable')
+        index = np.searchsorted(np.asarray(radius)[order], self.bin_edges, side='left')
+        # Only the particles within the outer edge are gathered
+        self.order = order[:index[-1]]
+        self.index = index
+        self.counts = np.diff(index)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def sorted(self, values: np.ndarray) -> np.ndarray:
+        """
+        The values of the particles within the outer edge, in radial order.
+        The particles within the inner edge come first.
+        """
+        return np.asarray(values)[self.order]
+
+    def bin_sum(self, values: np.ndarray, presorted: bool = False) -> np.ndarray:
+        """
+        Sum of the values of the particles in each bin.
+
+        :param values: expect np.ndarray of shape (N,) or (N, k)
+        :param presorted: default = False
+            If True, `values` were already passed through self.sorted.
+        :return: np.ndarray of shape (N_bins,) or (N_bins, k)
+        """
+        values = np.asarray(values) if presorted else self.sorted(values)
+        sums = np.zeros((len(self),) + values.shape[1:], dtype=np.result_type(values.dtype, np.float64))
+        if len(values) == 0:
+            return sums
+        # Trailing bins starting at the end of the array are empty
+        n_valid = np.searchsorted(self.index[:-1], len(values), side='left')
+        sums[:n_valid] = np.add.reduceat(values, self.index[:n_valid], axis=0)
+        # reduceat returns the element at the start index for empty bins
+        sums[self.counts == 0] = 0.
+        return sums
+
+    def inner_sum(self, values: np.ndarray, presorted: bool = False) -> np.ndarray:
+        """
+        Sum of the values of the particles within the inner edge.
+        """
+        values = np.asarray(values) if presorted else self.sorted(values)
+        return values[:self.index[0]].sum(axis=0)
+
+    def cumulative(self, values: np.ndarray, presorted: bool = False) -> np.ndarray:
+        """
+        Sum of the values of the particles within the outer edge of each bin.
+        """
+        values = np.asarray(values) if presorted else self.sorted(values)
+        return self.inner_sum(values, presorted=True) + np.cumsum(self.bin_sum(values, presorted=True), axis=0)
+
+    def shell_volume(self) -> np.ndarray:
+        return 4. / 3. * np.pi * np.diff(self.bin_edges ** 3)
+
+    def bin_centres(self, log: bool = True) -> np.ndarray:
+        """
+        Geometric (log = True) or arithmetic mid-points of the bins.
+        """
+        if log:
+            return np.sqrt(self.bin_edges[1:] * self.bin_edges[:-1])
+        return 0.5 * (self.bin_edges[1:] + self.bin_edges[:-1])
+
+    def weighted_profiles(self,
+                          fields: Dict[str, np.ndarray],
+                          weights: np.ndarray = None,
+                          presorted: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Weighted means and dispersions of any number of fields, from a
+        single reduceat pass over the stacked columns.
+
+        :param fields: expect dict of np.ndarray with shape (N,)
+        :param weights: default = None (unweighted), otherwise np.ndarray of shape (N,)
+        :param presorted: default = False (see bin_sum)
+        :return: dict with keys
+            '<field>'            : weighted mean in each bin
+            '<field>_dispersion' : weighted standard deviation in each bin
+            'weight'             : the sum of the weights in each bin
+            Empty bins are NaN.
+        """
+        columns = np.empty((len(self.order), 1 + 2 * len(fields)), dtype=np.float64)
+        if weights is None:
+            columns[:, 0] = 1.
+        else:
+            columns[:, 0] = np.asarray(weights) if presorted else self.sorted(weights)
+        for i, values in enumerate(fields.values()):
+            values = np.asarray(values) if presorted else self.sorted(values)
+            np.multiply(columns[:, 0], values, out=columns[:, 1 + 2 * i])
+            np.multiply(columns[:, 1 + 2 * i], values, out=columns[:, 2 + 2 * i])
+
+        sums = self.bin_sum(columns, presorted=True)
+        profiles = {'weight': sums[:, 0]}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalised = sums[:, 1:] / sums[:, :1]
+            for i, field in enumerate(fields.keys()):
+                mean = normalised[:, 2 * i]
+                variance = np.maximum(normalised[:, 2 * i + 1] - mean ** 2, 0.)
+                profiles[field] = np.where(sums[:, 0] > 0, mean, np.nan)
+                profiles[f'{field}_dispersion'] = np.where(sums[:, 0] > 0, np.sqrt(variance), np.nan)
+        return profiles
@@ -0,0 +1,167 @@
+"""
+------------------------------------------------------------------
+FILE:   selection.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the particle selections used by the cluster
+reports. A Selection refers to the particles of one type through
+either a sorted index array or a boolean mask (whichever it was
+built from, the other is derived on demand) and selections are
+combined with the operators
+
+    a & b,    a | b,    ~a
+
+so that e.g. the fuzz particles within an aperture are
+
+    cluster.radius_selection('0', r) & cluster.subgroup_selection('0', 0)
+
+The fields are never filtered into new arrays: the reductions take
+the selection directly (Selection.sum, apertures.accumulate_moments
+and the compiled kernels) and only gather bounded chunks of
+particles at a time, so that only the results are materialised.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+
+from .geometry import CHUNK_SIZE
+
+
+class Selection:
+
+    def __init__(self, size: int, mask: np.ndarray = None, index: np.ndarray = None):
+        """
+        Selection of the particles of an array of length `size`. If neither
+        `mask` nor `index` are given, all the particles are selected.
+        Use the constructors Selection.everything, from_mask and from_index.
+
+        :param size: expect int
+        :param mask: default = None, otherwise np.ndarray of bool with shape (size,)
+        :param index: default = None, otherwise sorted np.ndarray of unique integers
+        """
+        if mask is not None and len(mask) != size:
+            raise ValueError(f"Mask of length {len(mask)} for {size} particles.")
+        self.size = int(size)
+        self._mask = mask
+        self._index = index
+
+    @classmethod
+    def everything(cls, size: int) -> 'Selection':
+        return cls(size)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> 'Selection':
+        mask = np.asarray(mask, dtype=bool)
+        return cls(len(mask), mask=mask)
+
+    @classmethod
+    def from_index(cls, index: np.ndarray, size: int) -> 'Selection':
+        return cls(size, index=np.asarray(index))
+
+    @property
+    def is_everything(self) -> bool:
+        return self._mask is None and self._index is None
+
+    @property
+    def mask(self) -> np.ndarray:
+        if self._mask is None:
+            self._mask = np.ones(self.size, dtype=bool) if self._index is None else np.zeros(self.size, dtype=bool)
+            if self._index is not None:
+                self._mask[self._index] = True
+        return self._mask
+
+    @property
+    def index(self) -> np.ndarray:
+        if self._index is None:
+            self._index = np.arange(self.size) if self._mask is None else np.flatnonzero(self._mask)
+        return self._index
+
+    @property
+    def count(self) -> int:
+        """
+        Number of selected particles.
+        """
+        if self._index is not None:
+            return len(self._index)
+        if self._mask is not None:
+            return int(np.count_nonzero(self._mask))
+        return self.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _check_size(self, other: 'Selection') -> None:
+        if self.size != other.size:
+            raise ValueError(f"Cannot combine selections of {self.size} and {other.size} particles.")
+
+    def __and__(self, other: 'Selection') -> 'Selection':
+        self._check_size(other)
+        if self.is_everything:
+            return other
+        if other.is_everything:
+            return self
+        if self._mask is None and other._mask is None:
+            return Selection(self.size, index=np.intersect1d(self._index, other._index, assume_unique=True))
+        return Selection(self.size, mask=self.mask & other.mask)
+
+    def __or__(self, other: 'Selection') -> 'Selection':
+        self._check_size(other)
+        if self.is_everything or other.is_everything:
+            return Selection.everything(self.size)
+        if self._mask is None and other._mask is None:
+            return Selection(self.size, index=np.union1d(self._index, other._index))
+        return Selection(self.size, mask=self.mask | other.mask)
+
+    def __invert__(self) -> 'Selection':
+        return Selection(self.size, mask=~self.mask)
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE):
+        """
+        Yields the selected particles in blocks of at most `chunk_size`,
+        as slices (everything) or index arrays, for indexing the fields.
+        """
+        if self.is_everything:
+            for start in range(0, self.size, chunk_size):
+                yield slice(start, min(start + chunk_size, self.size))
+        elif self._index is not None:
+            for start in range(0, len(self._index), chunk_size):
+                yield self._index[start:start + chunk_size]
+        else:
+            for start in range(0, self.size, chunk_size):
+                yield start + np.flatnonzero(self._mask[start:start + chunk_size])
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """
+        The values of the selected particles, as a new array. Only use where the
+        selected values are needed, e.g. to store the filtered fields.
+        """
+        return values if self.is_everything else np.asarray(values)[self.index]
+
+    def sum(self, values: np.ndarray, weights: np.ndarray = None, chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+        """
+        Sum of the (weighted) values of the selected particles, in double precision.
+        Boolean masks are reduced in place with np.add.reduce(..., where=mask),
+        index arrays in gathered chunks: the temporaries are bounded by `chunk_size`.
+
+        :param values: expect np.ndarray of shape (size,) or (size, k)
+        :param weights: default = None, otherwise np.ndarray of shape (size,)
+        :param chunk_size: expect int
+        :return: float or np.ndarray of shape (k,)
+        """
+        values = np.asarray(values)
+        total = np.zeros(values.shape[1:], dtype=np.float64)
+        if self._mask is not None and self._index is None:
+            for start in range(0, self.size, chunk_size):
+                block = slice(start, start + chunk_size)
+                where = self._mask[block].reshape((-1,) + (1,) * (values.ndim - 1))
+                block_values = values[block] if weights is None else \
+                    np.multiply(values[block].T, weights[block], dtype=np.float64).T
+                total += np.add.reduce(block_values, axis=0, where=where, dtype=np.float64)
+            return total if values.ndim > 1 else float(total)
+
+        for block in self.chunks(chunk_size):
+            block_values = values[block] if weights is None else \
+                np.multiply(values[block].T, weights[block], dtype=np.float64).T
+            total += np.sum(block_values, axis=0, dtype=np.float64)
+        return total if values.ndim > 1 else float(total)
@@ -0,0 +1,161 @@
+"""
+------------------------------------------------------------------
+FILE:   shapes.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the iterative measurement of the ellipsoidal
+shapes of the clusters, using the reduced shape tensor
+
+    S_ij = sum m x_i x_j / r_ell^2 / sum m,
+    r_ell^2 = x'^2 + (y' / q)^2 + (z' / s)^2
+
+where (x', y', z') are the coordinates in the frame of the principal
+axes of the current ellipsoid, with axis ratios q = b/a and s = c/a.
+Starting from the sphere of radius R, the particles inside the
+ellipsoid r_ell < R are selected, the principal axes and the axis
+ratios are updated from the eigensystem of S and the procedure is
+repeated until the axis ratios converge. The semi-major axis is kept
+equal to R, so that the ellipsoid always lies within the spherical
+aperture: the candidates of every iteration are the particles with
+r < R, which are a prefix of the particles sorted by radius (the
+radial order cached by the cluster, shared with the apertures and
+the profiles). Each iteration then costs O(N_in), independently of
+the total number of particles.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+from typing import Dict
+
+# Shape iterations: relative tolerance on the axis ratios and maximum number of iterations
+TOLERANCE = 1e-3
+MAX_ITERATIONS = 100
+# Minimum number of particles in the ellipsoid for a shape measurement
+MIN_PARTICLES = 10
+
+# Output datasets of iterative_shapes
+shape_keys = ('N_particles', 'eigenvalues', 'eigenvectors', 'triaxiality', 'sphericity', 'elongation',
+              'iterations', 'converged')
+
+
+def reduced_shape_tensor(mass: np.ndarray,
+                         coords: np.ndarray,
+                         axes: np.ndarray,
+                         axis_ratios: np.ndarray,
+                         semi_major_axis: float) -> tuple:
+    """
+    Reduced shape tensor of the particles within an ellipsoid.
+
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3), relative to the centre
+    :param axes: expect np.ndarray of shape (3, 3)
+        The principal axes of the ellipsoid, one per row, from the major to the minor.
+    :param axis_ratios: expect np.ndarray of shape (2,), i.e. (q, s)
+    :param semi_major_axis: expect float
+    :return: (tensor, N_particles), the tensor with shape (3, 3)
+    """
+    rotated = coords @ axes.T
+    ellipsoidal_radius2 = rotated[:, 0] ** 2 + (rotated[:, 1] / axis_ratios[0]) ** 2 + \
+                          (rotated[:, 2] / axis_ratios[1]) ** 2
+    inside = np.flatnonzero((ellipsoidal_radius2 < semi_major_axis ** 2) & (ellipsoidal_radius2 > 0))
+    weights = mass[inside] / ellipsoidal_radius2[inside]
+    tensor = (coords[inside] * weights[:, None]).T @ coords[inside]
+    total_mass = np.sum(mass[inside], dtype=np.float64)
+    return tensor / total_mass if total_mass > 0 else tensor, len(inside)
+
+def iterative_shape(mass: np.ndarray,
+                    coords: np.ndarray,
+                    semi_major_axis: float,
+                    tolerance: float = TOLERANCE,
+                    max_iterations: int = MAX_ITERATIONS) -> Dict[str, np.ndarray]:
+    """
+    Iterative shape of one set of particles (see the description of the file).
+
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3), relative to the centre
+        Only the particles within the sphere of radius `semi_major_axis` are
+        needed: the other ones are never selected.
+    :param semi_major_axis: expect float
+    :param tolerance: expect float
+        The iterations stop when both axis ratios change by less than this
+        fraction of their values.
+    :param max_iterations: expect int
+    :return: dict with the keys of shape_keys, for one set of particles.
+        The eigenvalues are sorted from the largest, with the corresponding
+        eigenvectors as the rows of a (3, 3) matrix.
+    """
+    mass = np.asarray(mass, dtype=np.float64)
+    coords = np.asarray(coords, dtype=np.float64)
+    axes = np.identity(3)
+    axis_ratios = np.ones(2)
+    eigenvalues = np.full(3, np.nan)
+    n_particles = 0
+    converged = False
+    iteration = 0
+    while iteration < max_iterations and not converged:
+        iteration += 1
+        tensor, n_particles = reduced_shape_tensor(mass, coords, axes, axis_ratios, semi_major_axis)
+        if n_particles < MIN_PARTICLES:
+            break
+        _eigenvalues, _eigenvectors = np.linalg.eigh(tensor)
+        eigenvalues, axes = _eigenvalues[::-1], _eigenvectors[:, ::-1].T
+        if eigenvalues[2] <= 0:
+            break
+        previous, axis_ratios = axis_ratios, np.sqrt(eigenvalues[1:] / eigenvalues[0])
+        converged = bool(np.all(np.abs(axis_ratios - previous) < tolerance * axis_ratios))
+
+    if n_particles < MIN_PARTICLES or not eigenvalues[2] > 0:
+        eigenvalues, axes, axis_ratios = np.full(3, np.nan), np.full((3, 3), np.nan), np.full(2, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        triaxiality = (1. - axis_ratios[0] ** 2) / (1. - axis_ratios[1] ** 2)
+    return {
+            'N_particles' : n_particles,
+            'eigenvalues' : eigenvalues,
+            'eigenvectors': axes.ravel(),
+            'triaxiality' : triaxiality,
+            'sphericity'  : axis_ratios[1],
+            'elongation'  : axis_ratios[0],
+            'iterations'  : iteration,
+            'converged'   : converged,
+    }
+
+def iterative_shapes(radius: np.ndarray,
+                     mass: np.ndarray,
+                     coords: np.ndarray,
+                     apertures: np.ndarray,
+                     centre: np.ndarray = None,
+                     order: np.ndarray = None,
+                     tolerance: float = TOLERANCE,
+                     max_iterations: int = MAX_ITERATIONS) -> Dict[str, np.ndarray]:
+    """
+    Iterative shapes of one set of particles within a grid of apertures. The particles
+    are sorted by radius once, and only the particles within the largest aperture are
+    gathered: the candidates of aperture R are then the first searchsorted(r, R) ones.
+
+    :param radius: expect np.ndarray of shape (N,)
+        Distance of the particles from the centre.
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param apertures: expect array-like of shape (N_apertures,), in any order
+    :param centre: default = None (coords are already relative to the centre)
+    :param order: default = None (computed), otherwise np.argsort(radius)
+    :param tolerance: expect float
+    :param max_iterations: expect int
+    :return: dict with the keys of shape_keys, each with leading dimension N_apertures
+    """
+    apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+    if order is None:
+        order = np.argsort(radius, kind='stable')
+    sorted_radius = np.asarray(radius)[order]
+    n_inside = np.searchsorted(sorted_radius, apertures, side='left')
+    index = order[:np.max(n_inside, initial=0)]
+    mass = np.asarray(mass)[index]
+    coords = np.asarray(coords, dtype=np.float64)[index]
+    if centre is not None:
+        coords = coords - np.asarray(centre, dtype=np.float64)
+
+    shapes = [iterative_shape(mass[:n], coords[:n], aperture_radius, tolerance=tolerance,
+                              max_iterations=max_iterations)
+              for n, aperture_radius in zip(n_inside, apertures)]
+    return {key: np.array([shape[key] for shape in shapes]) for key in shape_keys}
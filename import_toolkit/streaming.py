@@ -0,0 +1,217 @@
+"""
+------------------------------------------------------------------
+FILE:   streaming.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the streaming mode of the aperture reports.
+The moments in apertures.py (mass, momentum, angular momentum and
+second moments about the centre of potential, m*v**2, m*T, ...) are
+additive: the particles can be consumed in chunks, as they come off
+disk, and each chunk is added to the moments of the spherical shells
+between consecutive apertures
+
+    shell k = {R_(k-1) <= r < R_k},    R_(-1) = 0
+
+with one np.bincount per column. The enclosed moments are then the
+cumulative sums of the shells. Frame-dependent quantities (e.g. the
+angular momentum in the zero momentum frame) follow from the raw
+moments in dynamics_from_moments, so a single pass over the particles
+is enough and the full particle arrays are never held in memory:
+the memory footprint is set by the chunk size.
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+from mpi4py import MPI
+
+from .geometry import CHUNK_SIZE, radial_distance
+from ._cluster_profiler import Mixin as ProfilerMixin
+from .apertures import (
+    N_MOMENTS,
+    particle_moments,
+    stack_moments,
+    dynamics_from_moments,
+    morphology_from_moments,
+    split_apertures,
+    report_warnings,
+)
+
+
+def clean_chunk(part_type: str,
+                data: Dict[str, np.ndarray],
+                centre: np.ndarray,
+                r200: float) -> Dict[str, np.ndarray]:
+    """
+    Applies the selection of Cluster.from_dict to one chunk of particles:
+    r < 5 R200 and, for the gas, the equation-of-state cut in the phase diagram.
+
+    :param part_type: expect str, '0', '1' or '4'
+    :param data: expect dict of np.ndarray, with the field names of the readers
+        (coordinates, mass, velocity, subgroupnumber and, for the gas, temperature
+        and sphdensity).
+    :param centre: expect np.ndarray of shape (3,)
+    :param r200: expect float
+    :return: dict of np.ndarray, the selected particles only.
+    """
+    selection = radial_distance(data['coordinates'], centre) < 5 * r200
+    if part_type == '0' and 'sphdensity' in data and 'temperature' in data:
+        density = ProfilerMixin.density_units(data['sphdensity'], unit_system='nHcgs')
+        temperature = data['temperature']
+        log_temperature_cut = np.log10(density) / 3 + 13 / 3
+        selection &= (temperature > 1e4) & (np.log10(temperature) > log_temperature_cut)
+        del density, temperature, log_temperature_cut
+    return {field: values[selection] for field, values in data.items()}
+
+
+class ApertureAccumulator:
+
+    def __init__(self,
+                 apertures: np.ndarray,
+                 centre: np.ndarray,
+                 part_types: Tuple[str] = ('0', '1', '4')):
+        """
+        Empty accumulators for a grid of spherical apertures.
+
+        :param apertures: expect array-like of shape (N_apertures,), in any order
+        :param centre: expect np.ndarray of shape (3,)
+            The centre of potential. The coordinates passed to update must
+            already be wrapped around it.
+        :param part_types: default = ('0', '1', '4')
+        """
+        self.apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+        self.centre = np.asarray(centre, dtype=np.float64)
+        self.order = np.argsort(self.apertures, kind='stable')
+        self.edges = self.apertures[self.order]
+        # One row per shell, the last column is the number of particles
+        self.shells = {
+            part_type: np.zeros((len(self.edges), N_MOMENTS + 1), dtype=np.float64)
+            for part_type in part_types
+        }
+
+    def update(self,
+               part_type: str,
+               data: Dict[str, np.ndarray],
+               chunk_size: int = CHUNK_SIZE) -> None:
+        """
+        Adds one chunk of particles to the shells.
+
+        :param part_type: expect str
+        :param data: expect dict of np.ndarray with keys mass, coordinates, velocity
+            and optionally temperature and subgroupnumber. Other keys are ignored.
+        :param chunk_size: expect int
+            Number of particles processed at a time, bounding the temporaries.
+        """
+        shells = self.shells[part_type]
+        n_shells = len(self.edges)
+        temperature = data.get('temperature')
+        subgroupnumber = data.get('subgroupnumber')
+
+        for start in range(0, len(data['mass']), chunk_size):
+            block = slice(start, start + chunk_size)
+            radius = radial_distance(data['coordinates'][block], self.centre)
+            # Number of apertures with R <= r: the particle is enclosed by all the others
+            shell = np.searchsorted(self.edges, radius, side='right')
+            inside = np.where(shell < n_shells)[0]
+            if len(inside) == 0:
+                continue
+            shell = shell[inside]
+            rows = particle_moments(
+                    data['mass'][block][inside],
+                    data['coordinates'][block][inside],
+                    data['velocity'][block][inside],
+                    temperature=None if temperature is None else temperature[block][inside],
+                    subgroupnumber=None if subgroupnumber is None else subgroupnumber[block][inside],
+                    centre=self.centre
+            )
+            for column in range(N_MOMENTS):
+                shells[:, column] += np.bincount(shell, weights=rows[:, column], minlength=n_shells)
+            shells[:, -1] += np.bincount(shell, minlength=n_shells)
+
+    def allreduce(self, comm: MPI.Comm) -> None:
+        """
+        Sums the shells accumulated by all the cores, in place.
+        """
+        for shells in self.shells.values():
+            comm.Allreduce(MPI.IN_PLACE, shells, op=MPI.SUM)
+
+    def enclosed(self, part_type: str) -> np.ndarray:
+        """
+        Moments of the particles with r < R for each aperture R, in the order
+        of the apertures given at initialisation.
+
+        :return: np.ndarray of shape (N_apertures, N_MOMENTS + 1), as RadialMoments.enclosed
+        """
+        enclosed = np.cumsum(self.shells[part_type], axis=0)
+        return enclosed[np.argsort(self.order)]
+
+    def report(self) -> List[Dict[str, np.ndarray]]:
+        """
+        The group_dynamics and group_morphology datasets of each aperture, with
+        the same layout as Cluster.group_report_apertures.
+        """
+        moments = stack_moments([self.enclosed(part_type) for part_type in ['0', '1', '4']])
+        reports = split_apertures({
+                **dynamics_from_moments(moments, self.apertures, self.centre),
+                **morphology_from_moments(moments)
+        })
+        for aperture_radius, report in zip(self.apertures, reports):
+            report_warnings(report, aperture_radius)
+        return reports
+
+
+def stream_report(chunks: Iterable[Tuple[str, Dict[str, np.ndarray]]],
+                  fofgroup: Dict[str, np.ndarray],
+                  apertures: np.ndarray = None,
+                  comm: MPI.Comm = None,
+                  clean: bool = True) -> Tuple[np.ndarray, List[Dict[str, np.ndarray]]]:
+    """
+    Consumes the particle chunks of a reader and returns the aperture reports.
+
+    :param chunks: expect iterable of (part_type, data) pairs
+        E.g. bahamas.read.cluster_particle_chunks. Each core consumes its own chunks.
+    :param fofgroup: expect dict with the COP, R200, R500 and R2500 of the group
+    :param apertures: default = None (the grid of Cluster.generate_apertures)
+    :param comm: default = None (serial), otherwise the MPI communicator of the readers
+    :param clean: default = True
+        Applies the selection of Cluster.from_dict to each chunk (see clean_chunk).
+    :return: (apertures, reports)
+        The list of reports has one dict per aperture, as Cluster.group_report_apertures.
+    """
+    if apertures is None:
+        apertures = ProfilerMixin.aperture_grid(fofgroup['R200'], fofgroup['R500'], fofgroup['R2500'])
+    accumulator = ApertureAccumulator(apertures, fofgroup['COP'])
+    for part_type, data in chunks:
+        if clean:
+            data = clean_chunk(part_type, data, fofgroup['COP'], fofgroup['R200'])
+        accumulator.update(part_type, data)
+        del data
+    if comm is not None:
+        accumulator.allreduce(comm)
+    return accumulator.apertures, accumulator.report()
+
+
+def fof_info(header: Dict[str, float],
+             fofgroup: Dict[str, np.ndarray],
+             aperture_radius: float = None) -> Dict[str, np.ndarray]:
+    """
+    The group_fofinfo datasets from the header and FoF dicts of the readers.
+    """
+    return {
+        'hubble_param'       : header['Hub'],
+        'redshift'           : header['zred'],
+        'OmegaBaryon'        : header['OmgB'],
+        'Omega0'             : header['OmgM'],
+        'OmegaLambda'        : header['OmgL'],
+        'centre_of_potential': fofgroup['COP'],
+        'r_aperture'         : aperture_radius,
+        'r200'               : fofgroup['R200'],
+        'r500'               : fofgroup['R500'],
+        'r2500'              : fofgroup['R2500'],
+        'mfof'               : fofgroup['Mfof'],
+        'm200'               : fofgroup['M200'],
+        'm500'               : fofgroup['M500'],
+        'm2500'              : fofgroup['M2500'],
+        'NumOfSubhalos'      : fofgroup['NSUB'],
+    }
@@ -0,0 +1,222 @@
+"""
+------------------------------------------------------------------
+FILE:   subhalos.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the subhalo-resolved reductions used by the
+cluster reports. The particles of one type are stable-sorted by
+SubGroupNumber once (the order is cached by the cluster), so that
+the particles of each subhalo are contiguous: whole-subhalo sums are
+then a single np.add.reduceat call. For a grid of apertures, each
+particle is labelled by (subhalo, shell between consecutive apertures)
+and the moments of apertures.particle_moments are summed with one
+np.bincount per column; the enclosed moments of every subhalo in
+every aperture are the cumulative sums over the shells.
+As in the rest of the pipeline, SubGroupNumber = 0 is the fuzz.
+
+The catalogue-only functions at the bottom use the subhalo table of
+the groups files instead (mass, centre of potential and centre of
+mass of each subhalo) and need no particle data at all. They follow
+the SUBHALO-BASED definition of substructure, which differs from the
+particle-based one of the group_* methods (see catalogue_substructure).
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+from typing import Dict, List
+
+from .geometry import CHUNK_SIZE, radial_distance
+from .apertures import N_MOMENTS, _M, _MX, _MV, _MXV, particle_moments
+
+
+class SubhaloGroups:
+
+    def __init__(self, subgroupnumber: np.ndarray, order: np.ndarray = None):
+        """
+        Groups one particle set by SubGroupNumber.
+
+        :param subgroupnumber: expect np.ndarray of integers with shape (N,)
+        :param order: default = None (computed), otherwise np.argsort(subgroupnumber, kind='stable')
+            The grouped order of the particles, usually cached by the cluster.
+        """
+        subgroupnumber = np.asarray(subgroupnumber)
+        if order is None:
+            order = np.argsort(subgroupnumber, kind='stable')
+        sorted_subgroupnumber = subgroupnumber[order]
+        is_first = np.ones(len(order), dtype=bool)
+        is_first[1:] = sorted_subgroupnumber[1:] != sorted_subgroupnumber[:-1]
+        self.order = order
+        self.index = np.flatnonzero(is_first)
+        self.subgroupnumber = sorted_subgroupnumber[self.index]
+        self.counts = np.diff(np.append(self.index, len(order)))
+        # Subhalo label of each particle, in the original order of the arrays
+        self.labels = np.empty(len(order), dtype=np.int64)
+        self.labels[order] = np.repeat(np.arange(len(self.index)), self.counts)
+
+    def __len__(self):
+        return len(self.index)
+
+    def reduce(self, values: np.ndarray) -> np.ndarray:
+        """
+        Sum of the values of the particles in each subhalo.
+
+        :param values: expect np.ndarray of shape (N,) or (N, k)
+        :return: np.ndarray of shape (N_subhalos,) or (N_subhalos, k)
+        """
+        values = np.asarray(values)
+        if len(self.index) == 0:
+            return np.zeros((0,) + values.shape[1:], dtype=np.float64)
+        return np.add.reduceat(values[self.order], self.index, axis=0, dtype=np.float64)
+
+    def enclosed_moments(self,
+                         radius: np.ndarray,
+                         apertures: np.ndarray,
+                         mass: np.ndarray,
+                         coords: np.ndarray,
+                         velocity: np.ndarray,
+                         centre: np.ndarray = None,
+                         chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+        """
+        Moments of the particles of each subhalo with r < R, for every aperture R.
+
+        :param radius: expect np.ndarray of shape (N,)
+            Distance of the particles from the centre.
+        :param apertures: expect array-like of shape (N_apertures,), in any order
+        :param mass: expect np.ndarray of shape (N,)
+        :param coords: expect np.ndarray of shape (N, 3)
+        :param velocity: expect np.ndarray of shape (N, 3)
+        :param centre: default = None (coords are already relative to the centre)
+        :param chunk_size: expect int
+        :return: np.ndarray of shape (N_subhalos, N_apertures, N_MOMENTS + 1), the
+            last column is the number of particles.
+        """
+        apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+        aperture_order = np.argsort(apertures, kind='stable')
+        edges = apertures[aperture_order]
+        n_bins = len(self) * len(edges)
+        shells = np.zeros((n_bins, N_MOMENTS + 1), dtype=np.float64)
+
+        for start in range(0, len(mass), chunk_size):
+            block = slice(start, start + chunk_size)
+            # Number of apertures with R <= r: the particle is enclosed by all the others
+            shell = np.searchsorted(edges, radius[block], side='right')
+            inside = np.flatnonzero(shell < len(edges))
+            if len(inside) == 0:
+                continue
+            bins = self.labels[block][inside] * len(edges) + shell[inside]
+            rows = particle_moments(mass[block][inside], coords[block][inside], velocity[block][inside],
+                                    centre=centre)
+            for column in range(N_MOMENTS):
+                shells[:, column] += np.bincount(bins, weights=rows[:, column], minlength=n_bins)
+            shells[:, -1] += np.bincount(bins, minlength=n_bins)
+
+        enclosed = np.cumsum(shells.reshape(len(self), len(edges), N_MOMENTS + 1), axis=1)
+        return enclosed[:, np.argsort(aperture_order)]
+
+
+def merge_subhalo_moments(groups: List[SubhaloGroups], moments: List[np.ndarray]) -> tuple:
+    """
+    Aligns the subhalo moments of several particle types on the union of their
+    SubGroupNumbers and prepends their sum.
+
+    :param groups: expect list of SubhaloGroups, e.g. for [PartType0, PartType1, PartType4]
+    :param moments: expect list of np.ndarray of shape (N_subhalos_i, N_apertures, N_MOMENTS + 1)
+    :return: (subgroupnumber, moments)
+        The SubGroupNumbers (N_subhalos,) and the moments with shape
+        (N_apertures, N_subhalos, 1 + N_types, N_MOMENTS + 1), ordered as
+        [total, PartType0, PartType1, PartType4] along the third axis.
+    """
+    subgroupnumber = np.unique(np.concatenate([group.subgroupnumber for group in groups]))
+    n_apertures = moments[0].shape[1]
+    merged = np.zeros((n_apertures, len(subgroupnumber), 1 + len(groups), N_MOMENTS + 1), dtype=np.float64)
+    for i, (group, moment) in enumerate(zip(groups, moments)):
+        rows = np.searchsorted(subgroupnumber, group.subgroupnumber)
+        merged[:, rows, 1 + i] = np.swapaxes(moment, 0, 1)
+    merged[:, :, 0] = merged[:, :, 1:].sum(axis=2)
+    return subgroupnumber, merged
+
+
+def subhalo_quantities_from_moments(moments: np.ndarray, centre: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Mass, centre of mass, bulk velocity, angular momentum and number of particles
+    of each subhalo. The angular momentum is measured about the centre of mass
+    of the subhalo, in its own rest frame:
+
+        sum m (x - X) cross (v - V) = sum m x cross v - M X cross V
+
+    :param moments: expect np.ndarray of shape (..., N_moments + 1)
+    :param centre: expect np.ndarray with 3 components
+        The centre the coordinates were measured from (centre of potential).
+    :return: dict of np.ndarray with the leading dimensions of `moments`.
+        Empty subhalos have NaN centres of mass and velocities.
+    """
+    mass = moments[..., _M]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centre_of_mass = moments[..., _MX] / mass[..., None]
+        bulk_velocity = moments[..., _MV] / mass[..., None]
+    angular_momentum = moments[..., _MXV] - mass[..., None] * np.cross(np.nan_to_num(centre_of_mass),
+                                                                        np.nan_to_num(bulk_velocity))
+    return {
+            'N_particles'     : moments[..., -1].astype(np.int64),
+            'mass'            : mass,
+            'centre_of_mass'  : centre_of_mass + np.asarray(centre, dtype=np.float64),
+            'bulk_velocity'   : bulk_velocity,
+            'angular_momentum': angular_momentum,
+    }
+
+
+def catalogue_substructure(subhalo_mass: np.ndarray,
+                           subhalo_centre_of_potential: np.ndarray,
+                           subhalo_centre_of_mass: np.ndarray,
+                           centre: np.ndarray,
+                           apertures: np.ndarray,
+                           boxsize: float = None) -> Dict[str, np.ndarray]:
+    """
+    Subhalo-based substructure fractions and dynamical merging indices, from the
+    subhalo table of one FoF group alone. The first subhalo is the central one,
+    as in the SUBFIND ordering. A subhalo is in an aperture if its centre of
+    potential is, and it is counted with its whole mass:
+
+        substructure_mass       = sum of the masses of the satellites in the aperture
+        substructure_fraction   = substructure_mass / mass of all subhalos in the aperture
+        dynamical_merging_index = || CoM(subhalos in the aperture) - CoP || / aperture
+
+    where CoM is the mass-weighted mean of the centres of mass of the subhalos.
+    The particle-based definitions (group_substructure_fraction and
+    group_dynamical_merging_index) select particles instead: they agree with these
+    when the subhalos lie entirely inside or outside the aperture, and the fuzz
+    (not bound to any subhalo) is negligible.
+
+    :param subhalo_mass: expect np.ndarray of shape (N_subhalos,)
+    :param subhalo_centre_of_potential: expect np.ndarray of shape (N_subhalos, 3)
+    :param subhalo_centre_of_mass: expect np.ndarray of shape (N_subhalos, 3)
+    :param centre: expect np.ndarray of shape (3,), the centre of potential of the group
+    :param apertures: expect array-like of shape (N_apertures,)
+    :param boxsize: default = None (no periodic boundaries)
+    :return: dict of np.ndarray with shape (N_apertures,), with keys
+        subhalo_N_satellites, subhalo_substructure_mass, subhalo_substructure_fraction
+        and subhalo_dynamical_merging_index.
+    """
+    apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+    mass = np.asarray(subhalo_mass, dtype=np.float64)
+    centre = np.asarray(centre, dtype=np.float64)
+    radius = radial_distance(np.asarray(subhalo_centre_of_potential).reshape(-1, 3), centre, boxsize=boxsize)
+    centre_of_mass = np.asarray(subhalo_centre_of_mass, dtype=np.float64).reshape(-1, 3) - centre
+    if boxsize is not None:
+        centre_of_mass -= boxsize * np.rint(centre_of_mass / boxsize)
+
+    inside = radius[None, :] < apertures[:, None]
+    satellite = np.arange(len(mass)) > 0
+    enclosed_mass = inside * mass
+    total_mass = enclosed_mass.sum(axis=1)
+    substructure_mass = enclosed_mass[:, satellite].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = (enclosed_mass @ centre_of_mass) / total_mass[:, None]
+        substructure_fraction = substructure_mass / total_mass
+    return {
+            'subhalo_N_satellites'           : np.count_nonzero(inside & satellite, axis=1),
+            'subhalo_substructure_mass'      : substructure_mass,
+            'subhalo_substructure_fraction'  : substructure_fraction,
+            'subhalo_dynamical_merging_index': np.linalg.norm(offset, axis=1) / apertures,
+    }
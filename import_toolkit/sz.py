@@ -0,0 +1,167 @@
+"""
+------------------------------------------------------------------
+FILE:   sz.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file provides the integrated Sunyaev-Zel'dovich signals of the
+hot gas, without rendering the maps of visualisation/ first:
+
+    Y_tSZ D_A^2 = sigma_T k_B / (m_e c^2) sum m T / (mu_e m_H)
+    Y_kSZ D_A^2 = - sigma_T / c sum m (v . n) / (mu_e m_H)
+
+for a line of sight n, in Mpc^2 (the same constants as the maps).
+Within spherical apertures, both are read from the radial prefix
+sums of the moments m T and m v (apertures.RadialMoments) of the hot
+gas, in the cached radial order: the kSZ along any line of sight is
+then the projection of the enclosed momentum. Within cylinders, the
+projected radii along all the lines of sight are computed in one
+pass over the particles, sorted once per line of sight, and all the
+apertures are lookups in the prefix sums of m T and m (v . n).
+-------------------------------------------------------------------
+"""
+
+import numpy as np
+from typing import Dict
+from unyt import hydrogen_mass, speed_of_light, thompson_cross_section, electron_mass, boltzmann_constant, Mpc
+
+from .geometry import CHUNK_SIZE
+from .apertures import RadialMoments, _MT, _MV
+from ._cluster_profiler import Mixin as ProfilerMixin
+
+# Only the ionised gas contributes, as in the kSZ maps
+SZ_TEMPERATURE_CUT = 1e5
+# Mean molecular weight per free electron
+MU_E = 1.16
+# Default lines of sight: the x, y and z axes
+LINES_OF_SIGHT = np.identity(3)
+
+# Delete the units from Unyt constants
+hydrogen_mass = float(hydrogen_mass.in_units('kg').value)
+speed_of_light = float(speed_of_light.in_units('m/s').value)
+thompson_cross_section = float(thompson_cross_section.in_units('m**2').value)
+electron_mass = float(electron_mass.in_units('kg').value)
+boltzmann_constant = float(boltzmann_constant.in_units('J/K').value)
+Mpc = float((1 * Mpc).in_units('m').value)
+
+# From sum m T in 10^10 M_sun K and sum m v in 10^10 M_sun km/s to Y D_A^2 in Mpc^2
+tsz_factor = thompson_cross_section * boltzmann_constant / (electron_mass * speed_of_light ** 2) * \
+             ProfilerMixin.mass_units(1.) / (MU_E * hydrogen_mass) / Mpc ** 2
+ksz_factor = - thompson_cross_section / speed_of_light * ProfilerMixin.mass_units(1.) * \
+             ProfilerMixin.velocity_units(1.) / (MU_E * hydrogen_mass) / Mpc ** 2
+
+# Output datasets of Cluster.group_sz
+sz_keys = ('tSZ_sphere', 'kSZ_sphere', 'tSZ_cylinder', 'kSZ_cylinder', 'lines_of_sight')
+
+
+def unit_lines_of_sight(lines_of_sight: np.ndarray) -> np.ndarray:
+    """
+    Normalises the lines of sight.
+
+    :param lines_of_sight: expect array-like of shape (3,) or (N_los, 3)
+    :return: np.ndarray of shape (N_los, 3)
+    """
+    lines_of_sight = np.atleast_2d(np.asarray(lines_of_sight, dtype=np.float64))
+    norm = np.linalg.norm(lines_of_sight, axis=1)
+    if np.any(norm == 0):
+        raise ValueError("The lines of sight must be non-zero vectors.")
+    return lines_of_sight / norm[:, None]
+
+def spherical_sz(radius: np.ndarray,
+                 mass: np.ndarray,
+                 coords: np.ndarray,
+                 velocity: np.ndarray,
+                 temperature: np.ndarray,
+                 apertures: np.ndarray,
+                 lines_of_sight: np.ndarray = LINES_OF_SIGHT,
+                 t_min: float = SZ_TEMPERATURE_CUT,
+                 centre: np.ndarray = None,
+                 order: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """
+    Integrated tSZ and kSZ signals of the gas with T > t_min within spherical apertures.
+
+    :param radius: expect np.ndarray of shape (N,)
+        Distance of the particles from the centre.
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param velocity: expect np.ndarray of shape (N, 3)
+    :param temperature: expect np.ndarray of shape (N,)
+    :param apertures: expect array-like of shape (N_apertures,)
+    :param lines_of_sight: expect array-like of shape (N_los, 3)
+    :param t_min: expect float, in K
+    :param centre: default = None (coords are already relative to the centre)
+    :param order: default = None (computed), otherwise np.argsort(radius)
+    :return: dict with tSZ (N_apertures,) and kSZ (N_apertures, N_los), in Mpc^2
+    """
+    if order is None:
+        order = np.argsort(radius, kind='stable')
+    # The hot particles, still in radial order
+    order = order[np.asarray(temperature)[order] > t_min]
+    moments = RadialMoments(radius, mass, coords, velocity, temperature=temperature, centre=centre,
+                            order=order).enclosed(apertures)
+    return {
+            'tSZ': moments[:, _MT] * tsz_factor,
+            'kSZ': moments[:, _MV] @ unit_lines_of_sight(lines_of_sight).T * ksz_factor,
+    }
+
+def cylindrical_sz(mass: np.ndarray,
+                   coords: np.ndarray,
+                   velocity: np.ndarray,
+                   temperature: np.ndarray,
+                   apertures: np.ndarray,
+                   lines_of_sight: np.ndarray = LINES_OF_SIGHT,
+                   t_min: float = SZ_TEMPERATURE_CUT,
+                   centre: np.ndarray = None,
+                   depth: float = None,
+                   chunk_size: int = CHUNK_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Integrated tSZ and kSZ signals of the gas with T > t_min within cylinders of
+    radius R along each line of sight, through the centre.
+
+    :param mass: expect np.ndarray of shape (N,)
+    :param coords: expect np.ndarray of shape (N, 3)
+    :param velocity: expect np.ndarray of shape (N, 3)
+    :param temperature: expect np.ndarray of shape (N,)
+    :param apertures: expect array-like of shape (N_apertures,), the radii of the cylinders
+    :param lines_of_sight: expect array-like of shape (N_los, 3)
+    :param t_min: expect float, in K
+    :param centre: default = None (coords are already relative to the centre)
+    :param depth: default = None (all the particles), otherwise the half-length
+        of the cylinders along the line of sight
+    :param chunk_size: expect int
+    :return: dict with tSZ and kSZ, both (N_apertures, N_los), in Mpc^2
+    """
+    apertures = np.atleast_1d(np.asarray(apertures, dtype=np.float64))
+    lines_of_sight = unit_lines_of_sight(lines_of_sight)
+    hot = np.flatnonzero(np.asarray(temperature) > t_min)
+    n_los = len(lines_of_sight)
+
+    # One pass: distance along and squared distance across every line of sight
+    along = np.empty((len(hot), n_los), dtype=np.float64)
+    across2 = np.empty((len(hot), n_los), dtype=np.float64)
+    thermal = np.empty(len(hot), dtype=np.float64)
+    momentum = np.empty((len(hot), n_los), dtype=np.float64)
+    for start in range(0, len(hot), chunk_size):
+        index = hot[start:start + chunk_size]
+        block = slice(start, start + len(index))
+        x = np.asarray(coords[index], dtype=np.float64)
+        if centre is not None:
+            x = x - np.asarray(centre, dtype=np.float64)
+        m = np.asarray(mass[index], dtype=np.float64)
+        along[block] = x @ lines_of_sight.T
+        across2[block] = np.einsum('ij,ij->i', x, x)[:, None] - along[block] ** 2
+        thermal[block] = m * temperature[index]
+        momentum[block] = (np.asarray(velocity[index], dtype=np.float64) @ lines_of_sight.T) * m[:, None]
+
+    tsz = np.zeros((len(apertures), n_los), dtype=np.float64)
+    ksz = np.zeros((len(apertures), n_los), dtype=np.float64)
+    for l in range(n_los):
+        candidates = np.arange(len(hot)) if depth is None else np.flatnonzero(np.abs(along[:, l]) < depth)
+        order = candidates[np.argsort(across2[candidates, l], kind='stable')]
+        n_inside = np.searchsorted(across2[order, l], apertures ** 2, side='left')
+        tsz[:, l] = np.concatenate(([0.], np.cumsum(thermal[order])))[n_inside]
+        ksz[:, l] = np.concatenate(([0.], np.cumsum(momentum[order, l])))[n_inside]
+    return {
+            'tSZ': tsz * tsz_factor,
+            'kSZ': ksz * ksz_factor,
+    }
@@ -0,0 +1,172 @@
+"""
+------------------------------------------------------------------
+FILE:   manifest.py
+AUTHOR: Edo Altamura
+DATE:   19-10-2026
+------------------------------------------------------------------
+This file builds and queries the manifest of the MACSIS zoom
+simulations: the group (subfind tab) and particle file paths of every
+halo at every snapshot. The directory tree is scanned once and the
+result is stored as a small .npz index file in the pathSave directory
+of the MACSIS simulation (or any file given), so that find_files can resolve the paths with array lookups instead of
+listing the 390 halo directories at every call.
+Paths are verified lazily, i.e. only when a file is actually opened,
+and only the affected halo is re-scanned if a path has gone stale.
+-------------------------------------------------------------------
+"""
+
+import os
+import numpy as np
+
+from .__init__ import pprint, comm, rank
+from import_toolkit.simulation import Simulation
+
+MACSIS_PATH = '/cosma5/data/dp004/dc-hens1/macsis/macsis_gas'
+MANIFEST_FILE = 'macsis_manifest.npz'
+
+z_value = ['z004p688', 'z004p061', 'z003p053', 'z003p078', 'z002p688', 'z002p349',
+           'z002p053', 'z001p792', 'z001p561', 'z001p354', 'z001p168', 'z001p000', 'z000p846', 'z000p706',
+           'z000p577', 'z000p457', 'z000p345', 'z000p240', 'z000p140', 'z000p046', 'z000p000']
+z_IDNumber = ['002', '003', '004', '005', '006', '007', '008', '009', '010', '011', '012', '013',
+              '014', '015', '016', '017', '018', '019', '020', '021', '022']
+snapshot_number = dict(zip(z_value, z_IDNumber))
+
+# Column of the (group, particle) pair in the manifest
+GROUP, PARTICLE = 0, 1
+_file_prefix = {GROUP: ('groups', 'eagle_subfind_tab'), PARTICLE: ('particledata', 'eagle_subfind_particles')}
+
+# Manifest loaded in this process: {'root', 'halos', 'files'}
+_manifest = {}
+
+
+def _scan_file(path: str, halo: str, sn: str, kind: int) -> str:
+	"""
+	Returns the path, relative to the MACSIS root, of the first group or
+	particle file of a halo at a snapshot. Returns '' if not found.
+	"""
+	directory, prefix = _file_prefix[kind]
+	try:
+		candidates = sorted(x for x in os.listdir(os.path.join(path, halo, 'data', f'{directory}_{sn}')) if x.startswith(prefix))
+	except FileNotFoundError:
+		return ''
+	return os.path.join(halo, 'data', f'{directory}_{sn}', candidates[0]) if candidates else ''
+
+def _scan_halo(path: str, halo: str) -> np.ndarray:
+	"""
+	Scans one halo directory for all snapshots.
+	:return: np.ndarray of strings with shape (N_snapshots, 2)
+	"""
+	return np.asarray([[_scan_file(path, halo, sn, kind) for kind in (GROUP, PARTICLE)] for sn in z_IDNumber])
+
+def manifest_path(manifest_file: str = None) -> str:
+	"""
+	The manifest file given, otherwise MANIFEST_FILE in the pathSave directory
+	of the MACSIS simulation.
+	"""
+	if manifest_file is None:
+		manifest_file = os.path.join(Simulation(simulation_name='macsis').pathSave, MANIFEST_FILE)
+	return manifest_file
+
+def build_manifest(path: str = MACSIS_PATH, manifest_file: str = None, save: bool = True) -> dict:
+	"""
+	Scans the MACSIS tree once and saves the manifest to file.
+	The scan is performed by rank 0 only and broadcast to the other cores.
+
+	:param path: expect str
+		The root directory of the MACSIS simulations, containing the halo_* directories.
+	:param manifest_file: default = None (see manifest_path)
+		The .npz file to save the manifest to.
+	:param save: default = True
+		False only keeps the manifest in memory.
+	:return: dict
+		The manifest with keys 'root', 'halos' (N_halos,) and 'files' (N_halos, N_snapshots, 2).
+	"""
+	manifest = None
+	if rank == 0:
+		pprint(f"[+] Building MACSIS manifest from {path:s}...")
+		halos = sorted(x for x in os.listdir(path) if x.startswith('halo_'))
+		files = np.asarray([_scan_halo(path, halo) for halo in halos]).reshape(len(halos), len(z_IDNumber), 2)
+		manifest = {'root': path, 'halos': np.asarray(halos), 'files': files}
+		if save:
+			save_manifest(manifest, manifest_file)
+	manifest = comm.bcast(manifest, root=0)
+	_manifest.clear()
+	_manifest.update(manifest)
+	return manifest
+
+def save_manifest(manifest: dict, manifest_file: str = None) -> None:
+	manifest_file = manifest_path(manifest_file)
+	os.makedirs(os.path.dirname(os.path.abspath(manifest_file)), exist_ok=True)
+	np.savez(manifest_file, root=np.asarray(manifest['root']), halos=manifest['halos'], files=manifest['files'])
+
+def load_manifest(path: str = MACSIS_PATH, manifest_file: str = None) -> dict:
+	"""
+	Returns the manifest loaded in memory, otherwise reads it from file,
+	otherwise builds it by scanning the MACSIS tree.
+	"""
+	if _manifest.get('root') == path:
+		return _manifest
+	manifest_file = manifest_path(manifest_file)
+	if os.path.isfile(manifest_file):
+		with np.load(manifest_file) as data:
+			if str(data['root']) == path:
+				_manifest.clear()
+				_manifest.update({'root': path, 'halos': data['halos'], 'files': data['files']})
+				return _manifest
+	return build_manifest(path, manifest_file)
+
+def find_files(redshift: str, path: str = MACSIS_PATH, manifest_file: str = None) -> list:
+	"""
+	Resolves the group and particle files of all halos at a given redshift.
+	No file system access is made if the manifest is already available.
+
+	:param redshift: expect str
+		The redshift of the snapshot, e.g. 'z000p000'.
+	:param manifest_file: default = None (see manifest_path)
+	:return: list
+		[[group_file, particle_file], ...] with absolute paths, ordered by halo number.
+	"""
+	manifest = load_manifest(path, manifest_file)
+	snap = z_IDNumber.index(snapshot_number[redshift])
+	pairs = manifest['files'][:, snap]
+	missing = np.where((pairs == '').any(axis=1))[0]
+	if len(missing) > 0:
+		raise FileNotFoundError(f"Halos without {redshift} data in the MACSIS manifest: {manifest['halos'][missing]}")
+	return [[os.path.join(manifest['root'], group), os.path.join(manifest['root'], particle)] for group, particle in pairs]
+
+def verify_file(file_path: str, manifest_file: str = None) -> str:
+	"""
+	Checks that a path resolved from the manifest still exists. If not,
+	the halo it belongs to is re-scanned (and the manifest file updated)
+	and the fresh path is returned.
+
+	:param file_path: expect str
+		An absolute path returned by find_files.
+	:param manifest_file: default = None (see manifest_path)
+	:return: str
+		A valid absolute path.
+	"""
+	if os.path.isfile(file_path):
+		return file_path
+
+	root = _manifest.get('root', MACSIS_PATH)
+	halo, _, directory, _ = os.path.relpath(file_path, root).split(os.sep)
+	sn = directory.rsplit('_', 1)[-1]
+	kind = GROUP if directory.startswith(_file_prefix[GROUP][0]) else PARTICLE
+	pprint(f"[!] Stale manifest entry {file_path:s}: rescanning {halo:s}")
+
+	if 'files' in _manifest and halo in _manifest['halos']:
+		halo_index = np.where(_manifest['halos'] == halo)[0][0]
+		rescanned = _scan_halo(root, halo)
+		files = _manifest['files'].astype(np.promote_types(_manifest['files'].dtype, rescanned.dtype))
+		files[halo_index] = rescanned
+		_manifest['files'] = files
+		if rank == 0:
+			save_manifest(_manifest, manifest_file)
+		relative_path = _manifest['files'][halo_index, z_IDNumber.index(sn), kind]
+	else:
+		relative_path = _scan_file(root, halo, sn, kind)
+
+	if not relative_path:
+		raise FileNotFoundError(f"No {_file_prefix[kind][1]} file for {halo} at snapshot {sn}.")
+	return os.path.join(root, relative_path)
@@ -1,4 +1,3 @@
-import os
 from typing import List, Dict
 import numpy as np
 import h5py as h5
@@ -26,6 +25,9 @@ from .conversion import (
 	momentum_units,
 	energy_units,
 )
+from . import manifest
+from import_toolkit.geometry import CHUNK_SIZE
+from import_toolkit.streaming import stream_report
 
 def split(nfiles):
     nfiles=int(nfiles)
@@ -66,40 +68,20 @@ def get_indices_sparse(data):
     return [np.unravel_index(row.data, data.shape) for row in M]
 
 def find_files(redshift: str) -> list:
-    z_value = ['z004p688', 'z004p061', 'z003p053', 'z003p078', 'z002p688', 'z002p349',
-            'z002p053', 'z001p792', 'z001p561', 'z001p354', 'z001p168', 'z001p000', 'z000p846', 'z000p706',
-            'z000p577', 'z000p457', 'z000p345', 'z000p240', 'z000p140', 'z000p046', 'z000p000']
-    z_IDNumber = ['002', '003', '004', '005', '006', '007', '008', '009', '010', '011', '012', '013',
-            '014', '015', '016', '017', '018', '019', '020', '021', '022']
-    sn = dict(zip(z_value, z_IDNumber))[redshift]
-    path='/cosma5/data/dp004/dc-hens1/macsis/macsis_gas'
-    pprint(f"[+] Find simulation files {redshift:s}...")
-
-    halos = [x for x in os.listdir(path) if x.startswith('halo_')]
-	master_files = []
-	for halo in halos:
-		groups = []
-		for x in os.listdir(os.path.join(path, halo, f'data/groups_{sn}')):
-			if x.startswith('eagle_subfind_tab'):
-				complete_path = os.path.join(path, halo, f'data/groups_{sn}/{x}')
-				groups.append(complete_path)
-
-		particle = []
-		for x in os.listdir(os.path.join(path, halo, f'data/particledata_{sn}')):
-			if x.startswith('eagle_subfind_particles'):
-				complete_path = os.path.join(path, halo, f'data/particledata_{sn}/{x}')
-				particle.append(complete_path)
-
-		master_files.append([groups[0], particle[0]])
-
-	return master_files
+	"""
+	Resolves the [group_file, particle_file] pairs of all MACSIS halos at
+	the given redshift from the cached manifest (see macsis/manifest.py).
+	The directory tree is only scanned if the manifest does not exist yet.
+	"""
+	pprint(f"[+] Find simulation files {redshift:s}...")
+	return manifest.find_files(redshift)
 
 
 
 def fof_header(files: list):
 	pprint(f"[+] Find header information...")
 	header = {}
-	with h5.File(files[0][1], 'r') as f:
+	with h5.File(manifest.verify_file(files[0][1]), 'r') as f:
 		header['Hub']  = f['Header'].attrs['HubbleParam']
 		header['aexp'] = f['Header'].attrs['ExpansionFactor']
 		header['zred'] = f['Header'].attrs['Redshift']
@@ -126,7 +108,7 @@ def fof_groups(files: list):
 	FSID = np.empty(0, dtype=np.int)
 	SCOP = np.empty(0, dtype=np.float32)
 	for x in range(st, fh, 1):
-		with h5.File(group_files[x], 'r') as f:
+		with h5.File(manifest.verify_file(group_files[x]), 'r') as f:
 			Mfof = np.append(Mfof, f['FOF/GroupMass'][:])
 			M2500 = np.append(M2500, f['FOF/Group_M_Crit2500'][:])
 			R2500 = np.append(R2500, f['FOF/Group_R_Crit2500'][:])
@@ -140,7 +122,7 @@ def fof_groups(files: list):
 			SCOP = np.append(SCOP, f['Subhalo/CentreOfPotential'][:])
 
 	header = {}
-	with h5.File(group_files[0], 'r') as f:
+	with h5.File(manifest.verify_file(group_files[0]), 'r') as f:
 		header['Hub'] =  f['Header'].attrs['HubbleParam']
 		header['aexp'] = f['Header'].attrs['ExpansionFactor']
 		header['zred'] = f['Header'].attrs['Redshift']
@@ -189,7 +171,7 @@ def fof_group(clusterID: int, fofgroups: Dict[str, np.ndarray] = None):
 	new_data['FSID']  = fofgroups['FSID'][clusterID]
 	new_data['SCOP']  = fofgroups['SCOP'][clusterID]
 	new_data['groupfiles']  = fofgroups['groupfiles'][clusterID]
-	new_data['particlefiles'] = fofgroups['particlefiles'][clusterID]
+	new_data['particlefiles'] = manifest.verify_file(fofgroups['particlefiles'][clusterID])
 	return new_data
 
 
@@ -293,6 +275,55 @@ def cluster_particles(fofgroup: Dict[str, np.ndarray] = None, groupNumbers: List
 
 	return data_out
 
+def cluster_particle_chunks(fofgroup: Dict[str, np.ndarray] = None,
+                            groupNumbers: List[np.ndarray] = None,
+                            chunk_size: int = CHUNK_SIZE):
+	"""
+	Generator version of cluster_particles, used by the streaming reports.
+	Each core reads its share of the particles in chunks of at most
+	`chunk_size`, converted to physical units. The chunks are not gathered
+	across cores.
+
+	:param fofgroup: expect dict, as returned by fof_group
+	:param groupNumbers: expect list, as returned by cluster_partgroupnumbers
+	:param chunk_size: expect int
+	:return: generator of (part_type, dict of np.ndarray) pairs
+	"""
+	header = {}
+	partTypes = ['0', '1', '4']
+	with h5.File(fofgroup['particlefiles'], 'r') as h5file:
+
+		header['Hub']  = h5file['Header'].attrs['HubbleParam']
+		header['aexp'] = h5file['Header'].attrs['ExpansionFactor']
+		header['zred'] = h5file['Header'].attrs['Redshift']
+
+		for pt in partTypes:
+
+			# Let each CPU core import a portion of the pgn data
+			pgn = groupNumbers[partTypes.index(pt)]
+			st, fh = split(len(pgn))
+
+			for start in range(st, fh, chunk_size):
+				pgn_chunk = pgn[start:min(start + chunk_size, fh)]
+				data_out = {}
+				data_out['subgroupnumber'] = h5file[f'/PartType{pt}/SubGroupNumber'][pgn_chunk]
+				data_out['velocity']       = comoving_velocity(header, h5file[f'/PartType{pt}/Velocity'][pgn_chunk])
+				data_out['coordinates']    = comoving_length(header, h5file[f'/PartType{pt}/Coordinates'][pgn_chunk])
+				if pt == '1':
+					particle_mass_DM = h5file['Header'].attrs['MassTable'][1]
+					mass = np.ones(len(pgn_chunk), dtype=np.float32) * particle_mass_DM
+				else:
+					mass = h5file[f'/PartType{pt}/Mass'][pgn_chunk]
+				data_out['mass'] = comoving_mass(header, mass * 1.0e10)
+				if pt == '0':
+					den_conv = h5file[f'/PartType{pt}/Density'].attrs['CGSConversionFactor']
+					data_out['temperature'] = h5file[f'/PartType{pt}/Temperature'][pgn_chunk]
+					data_out['sphdensity']  = comoving_density(header, h5file[f'/PartType{pt}/Density'][pgn_chunk] * den_conv)
+				del pgn_chunk, mass
+				yield pt, data_out
+
+			del pgn
+
 def cluster_data(clusterID: int,
                  header: Dict[str, float] = None,
                  fofgroups: Dict[str, np.ndarray] = None):
@@ -316,6 +347,36 @@ def cluster_data(clusterID: int,
 		out[f'partType{pt}'] = {**part_data[f'partType{pt}']}
 	return out
 
+def cluster_data_streaming(clusterID: int,
+                           header: Dict[str, float] = None,
+                           fofgroups: Dict[str, np.ndarray] = None,
+                           apertures: np.ndarray = None,
+                           chunk_size: int = CHUNK_SIZE):
+	"""
+	Streaming version of cluster_data: the particles are consumed in chunks
+	by the aperture accumulators (see import_toolkit.streaming) and never
+	gathered, so the memory used is bounded by `chunk_size`.
+
+	:param clusterID:
+	:param header:
+	:param fofgroups:
+	:param apertures: default = None (the grid of Cluster.generate_apertures)
+	:param chunk_size: expect int
+	:return: dict with the Header and FOF dicts, the apertures and the list
+		of aperture reports (see rotvel_correlation.alignment.save_report_streaming).
+	"""
+	group_data  = fof_group(clusterID, fofgroups = fofgroups)
+	halo_partgn = cluster_partgroupnumbers(fofgroup=group_data)
+	chunks      = cluster_particle_chunks(fofgroup=group_data, groupNumbers=halo_partgn, chunk_size=chunk_size)
+	apertures, reports = stream_report(chunks, group_data, apertures=apertures, comm=comm)
+
+	out = {}
+	out['Header'] = {**header}
+	out['FOF'] = {**group_data}
+	out['apertures'] = apertures
+	out['reports'] = reports
+	return out
+
 
 def glance_cluster(cluster_dict: dict, verbose: bool = False, indent: int = 1) -> None:
 	"""
@@ -11,7 +11,6 @@ etc.
 -------------------------------------------------------------------
 """
 
-import itertools
 import numpy as np
 import sys
 import os.path
@@ -21,6 +20,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.
 
 from import_toolkit.cluster import Cluster
 from import_toolkit.simulation import Simulation
+from import_toolkit.geometry import pairwise_angles, vector_angles
 
 
 class FOFRead(Simulation):
@@ -65,24 +65,10 @@ class FOFRead(Simulation):
             ParType4_angmom = np.array(input_file.get('ParType4_angmom'))
             ParType5_angmom = np.array(input_file.get('ParType5_angmom'))
 
-        # One 5x5 matrix for each aperture
-        alignment_matrix = np.zeros((len(apertures), 5, 5), dtype=np.float)
-
-        for m, r in np.ndenumerate(apertures):
-
-            # Gather ang momenta for a single aperture
-            ang_momenta = np.zeros((5,3))
-            ang_momenta[0] = Total_angmom[m]
-            ang_momenta[1] = ParType0_angmom[m]
-            ang_momenta[2] = ParType1_angmom[m]
-            ang_momenta[3] = ParType4_angmom[m]
-            ang_momenta[4] = ParType5_angmom[m]
-
-            for i, j in itertools.product(range(5), range(5)):
-                if i == j:
-                    alignment_matrix[m][i][j] = 0.
-                else:
-                    alignment_matrix[m][i][j] = self.cluster.angle_between_vectors(ang_momenta[i], ang_momenta[j])
+        # One 5x5 matrix for each aperture, all computed at once
+        ang_momenta = np.stack([Total_angmom, ParType0_angmom, ParType1_angmom, ParType4_angmom, ParType5_angmom], axis=1)
+        alignment_matrix = pairwise_angles(ang_momenta, ang_momenta, cosine=True)
+        alignment_matrix[:, np.arange(5), np.arange(5)] = 0.
 
         return alignment_matrix
     
@@ -104,24 +90,10 @@ class FOFRead(Simulation):
             ParType4_ZMF = np.array(input_file.get('ParType4_ZMF'))
             ParType5_ZMF = np.array(input_file.get('ParType5_ZMF'))
 
-        # One 5x5 matrix for each aperture
-        alignment_matrix = np.zeros((len(apertures), 5, 5), dtype=np.float)
-
-        for m, r in np.ndenumerate(apertures):
-
-            # Gather peculiar velocities for a single aperture
-            ang_momenta = np.zeros((5,3))
-            ang_momenta[0] = Total_ZMF[m]
-            ang_momenta[1] = ParType0_ZMF[m]
-            ang_momenta[2] = ParType1_ZMF[m]
-            ang_momenta[3] = ParType4_ZMF[m]
-            ang_momenta[4] = ParType5_ZMF[m]
-
-            for i, j in itertools.product(range(5), range(5)):
-                if i == j:
-                    alignment_matrix[m][i][j] = 0.
-                else:
-                    alignment_matrix[m][i][j] = self.cluster.angle_between_vectors(ang_momenta[i], ang_momenta[j])
+        # One 5x5 matrix for each aperture, all computed at once
+        peculiar_velocities = np.stack([Total_ZMF, ParType0_ZMF, ParType1_ZMF, ParType4_ZMF, ParType5_ZMF], axis=1)
+        alignment_matrix = pairwise_angles(peculiar_velocities, peculiar_velocities, cosine=True)
+        alignment_matrix[:, np.arange(5), np.arange(5)] = 0.
 
         return alignment_matrix
     
@@ -147,30 +119,12 @@ class FOFRead(Simulation):
             ParType4_ZMF = np.array(input_file.get('ParType4_ZMF'))
             ParType5_ZMF = np.array(input_file.get('ParType5_ZMF'))
 
-        # One 5x5 matrix for each aperture
-        alignment_matrix = np.zeros((len(apertures), 10, 10), dtype=np.float)
-
-        for m, r in np.ndenumerate(apertures):
-
-            # Gather corr entry for a single aperture
-            corr_entry = np.zeros((10, 3))
-            corr_entry[0] = Total_ZMF[m]
-            corr_entry[1] = Total_angmom[m]
-            corr_entry[2] = ParType0_ZMF[m]
-            corr_entry[3] = ParType1_ZMF[m]
-            corr_entry[4] = ParType4_ZMF[m]
-            corr_entry[5] = ParType5_ZMF[m]
-            corr_entry[6] = ParType0_angmom[m]
-            corr_entry[7] = ParType1_angmom[m]
-            corr_entry[8] = ParType4_angmom[m]
-            corr_entry[9] = ParType5_angmom[m]
-            
-
-            for i, j in itertools.product(range(10), range(10)):
-                if i == j:
-                    alignment_matrix[m][i][j] = 0.
-                else:
-                    alignment_matrix[m][i][j] = self.cluster.angle_between_vectors(corr_entry[i], corr_entry[j])
+        # One 10x10 matrix for each aperture, all computed at once
+        corr_entry = np.stack([Total_ZMF, Total_angmom,
+                               ParType0_ZMF, ParType1_ZMF, ParType4_ZMF, ParType5_ZMF,
+                               ParType0_angmom, ParType1_angmom, ParType4_angmom, ParType5_angmom], axis=1)
+        alignment_matrix = pairwise_angles(corr_entry, corr_entry, cosine=True)
+        alignment_matrix[:, np.arange(10), np.arange(10)] = 0.
 
         return alignment_matrix
 
@@ -205,11 +159,7 @@ class FOFRead(Simulation):
             with h5py.File(os.path.join(self.FOFDirectory, 'peculiar_velocity.hdf5'), 'r') as input_file:
                 vector2 = np.array(input_file.get(vector2_str))
 
-        angle_apertures = np.zeros(len(apertures), dtype=np.float)
-
-        for m, _ in np.ndenumerate(apertures):
-            angle_apertures[m] = self.cluster.angle_between_vectors(vector1[m], vector2[m])
-
+        angle_apertures = vector_angles(vector1, vector2, cosine=True)
         return angle_apertures
 
     def pull_mass_aperture(self, datasetName: str):
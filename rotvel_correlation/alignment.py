@@ -3,11 +3,10 @@ import os
 import warnings
 import numpy as np
 from typing import Dict
-from copy import deepcopy
-from itertools import product
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir)))
 from import_toolkit.cluster import Cluster
-angle = deepcopy(Cluster.angle_between_vectors)
+from import_toolkit.geometry import pairwise_angles
+from import_toolkit.streaming import fof_info
 
 def group_alignment(groupreport: Dict[str, np.ndarray] = None) -> Dict[str, np.ndarray]:
 	"""
@@ -47,83 +46,114 @@ def group_alignment(groupreport: Dict[str, np.ndarray] = None) -> Dict[str, np.n
 	:return: expected a numpy array of dimension 1 if all particletypes are combined, or
 		dimension 2 if particle types are returned separately.
 	"""
-	x_axis, y_axis, z_axis = np.identity(3, dtype=np.int)
-	peculiar_velocity = groupreport['zero_momentum_frame']
-	angular_velocity = groupreport['angular_velocity']
-	angular_momentum = groupreport['angular_momentum']
-	eigenvectors = groupreport['eigenvectors'].reshape((4,3,3))
-	a_vec, b_vec, c_vec = eigenvectors[:, 0], eigenvectors[:, 1], eigenvectors[:, 2]
+	peculiar_velocity = np.asarray(groupreport['zero_momentum_frame'])
+	angular_velocity = np.asarray(groupreport['angular_velocity'])
+	angular_momentum = np.asarray(groupreport['angular_momentum'])
+	eigenvectors = np.asarray(groupreport['eigenvectors']).reshape(angular_momentum.shape + (3,))
+	a_vec, b_vec, c_vec = eigenvectors[..., 0, :], eigenvectors[..., 1, :], eigenvectors[..., 2, :]
 	del eigenvectors
 
-	v_l = np.zeros((4,4), dtype=np.float)
-	v_w = np.zeros((4,4), dtype=np.float)
-	l_w = np.zeros((4,4), dtype=np.float)
-	a_v = np.zeros((4,4), dtype=np.float)
-	a_l = np.zeros((4,4), dtype=np.float)
-	a_w = np.zeros((4,4), dtype=np.float)
-	b_v = np.zeros((4,4), dtype=np.float)
-	b_l = np.zeros((4,4), dtype=np.float)
-	b_w = np.zeros((4,4), dtype=np.float)
-	c_v = np.zeros((4,4), dtype=np.float)
-	c_l = np.zeros((4,4), dtype=np.float)
-	c_w = np.zeros((4,4), dtype=np.float)
-	a_b = np.zeros((4,4), dtype=np.float)
-	b_c = np.zeros((4,4), dtype=np.float)
-	c_a = np.zeros((4,4), dtype=np.float)
-
-	for i,j in product(list(range(4)), repeat=2):
-		v_l[i, j] = angle(peculiar_velocity[i], angular_momentum[j])
-		v_w[i, j] = angle(peculiar_velocity[i], angular_velocity[j])
-		l_w[i, j] = angle(angular_momentum[i], angular_velocity[j])
-		a_v[i, j] = angle(a_vec[i], peculiar_velocity[j])
-		a_l[i, j] = angle(a_vec[i], angular_momentum[j])
-		a_w[i, j] = angle(a_vec[i], angular_velocity[j])
-		b_v[i, j] = angle(b_vec[i], peculiar_velocity[j])
-		b_l[i, j] = angle(b_vec[i], angular_momentum[j])
-		b_w[i, j] = angle(b_vec[i], angular_velocity[j])
-		c_v[i, j] = angle(c_vec[i], peculiar_velocity[j])
-		c_l[i, j] = angle(c_vec[i], angular_momentum[j])
-		c_w[i, j] = angle(c_vec[i], angular_velocity[j])
-		a_b[i, j] = angle(a_vec[i], b_vec[j])
-		b_c[i, j] = angle(b_vec[i], c_vec[j])
-		c_a[i, j] = angle(c_vec[i], a_vec[j])
+	# All vector kinds stacked along a new axis: the cosines between every
+	# pair of kinds and particle groupings are computed in one operation.
+	# Reports with leading dimensions (e.g. apertures or clusters) are supported.
+	vectors = np.stack([peculiar_velocity, angular_momentum, angular_velocity, a_vec, b_vec, c_vec], axis=-3)
+	cosines = pairwise_angles(vectors[..., :, None, :, :], vectors[..., None, :, :, :], cosine=True)
+	kind = dict(zip('vlwabc', range(6)))
+	pairs = ['v_l', 'v_w', 'l_w', 'a_v', 'a_l', 'a_w', 'b_v', 'b_l', 'b_w', 'c_v', 'c_l', 'c_w', 'a_b', 'b_c', 'c_a']
+	alignment = {pair: cosines[..., kind[pair[0]], kind[pair[-1]], :, :] for pair in pairs}
 
 	# Check eigenvector orthogonality
 	# Angle should be 90 deg, hence cosine zero
-	if (
-			round(float(np.trace(a_b)), 2) != 0. or
-			round(float(np.trace(b_c)), 2) != 0. or
-			round(float(np.trace(c_a)), 2) != 0.
-	):
+	if not all(np.all(np.round(np.trace(alignment[pair], axis1=-2, axis2=-1), 2) == 0.) for pair in ['a_b', 'b_c', 'c_a']):
 		warnings.warn('[-] Detected non-orthogonal semiaxes. Check inertia tensor.')
 
-	angle_dict = {
-			'v_l' : v_l,
-			'v_w' : v_w,
-			'l_w' : l_w,
-			'a_v' : a_v,
-			'a_l' : a_l,
-			'a_w' : a_w,
-			'b_v' : b_v,
-			'b_l' : b_l,
-			'b_w' : b_w,
-			'c_v' : c_v,
-			'c_l' : c_l,
-			'c_w' : c_w
-	}
+	angle_dict = {pair: alignment[pair] for pair in pairs[:-3]}
 	return angle_dict
 
+def group_alignment_bootstrap(replicas: Dict[str, np.ndarray], percentiles: tuple = (16., 50., 84.)) -> Dict[str, np.ndarray]:
+	"""
+	Percentiles of the alignment angles over the Poisson bootstrap replicas
+	returned by Cluster.group_report_bootstrap.
+
+	:param replicas: expect dict of arrays with leading dimensions (n_replicas, N_apertures)
+	:param percentiles: expect tuple of floats between 0 and 100
+	:return: dict with keys '<pair>_percentiles' for the pairs of group_alignment,
+		each with shape (N_apertures, len(percentiles), 4, 4).
+	"""
+	angles = group_alignment(replicas)
+	return {
+			f'{pair}_percentiles': np.moveaxis(np.nanpercentile(value, percentiles, axis=0), 0, 1)
+			for pair, value in angles.items()
+	}
 
-def save_report(cluster: Cluster) -> dict:
 
+def save_report(cluster: Cluster,
+                bootstrap: int = 0,
+                seed: int = None,
+                selections=None,
+                centres=None,
+                sz: bool = False,
+                potential_energy: bool = False) -> dict:
+	"""
+	Reports of all the apertures of a cluster. If `bootstrap` is a number of
+	replicas, the percentiles of the alignment angles over the Poisson bootstrap
+	of the particles are added (see group_alignment_bootstrap).
+	If `selections` are given (see Cluster.group_report_selections), all the
+	datasets and alignment angles get a leading selection axis, evaluated in one
+	pass over the particles. Likewise, `centres` (see Cluster.group_report_centres)
+	adds a leading centre axis. Only one of the two can be given at a time.
+	The bootstrap percentiles always refer to all particles about the centre of potential.
+	If `sz` is True, the integrated SZ signals of the hot gas (see Cluster.group_sz)
+	are added to every aperture. These are always computed for all the gas about
+	the centre of potential, so they cannot be combined with selections or centres.
+	If `potential_energy` is True, the potential energy and virial ratio of every
+	aperture are added (see Cluster.group_report_apertures): this builds an octree of
+	all the particles, far slower than the rest of the report, and has no selection or
+	centre axis either.
+	"""
 	apertures = cluster.generate_apertures()
+	if selections is not None and centres is not None:
+		raise ValueError("Give either selections or centres, not both.")
+	if sz and (selections is not None or centres is not None):
+		raise ValueError("The SZ signals have no selection or centre axis: use sz with the default report only.")
+	if potential_energy and (selections is not None or centres is not None):
+		raise ValueError("The potential energy has no selection or centre axis: use potential_energy with "
+		                 "the default report only.")
+	if selections is not None:
+		aperture_reports = cluster.group_report_selections(selections, apertures)
+	elif centres is not None:
+		aperture_reports = cluster.group_report_centres(centres, apertures)
+	else:
+		aperture_reports = cluster.group_report_apertures(apertures, potential_energy=potential_energy)
+	if sz:
+		sz_report = cluster.group_sz(apertures)
+		for i, report in enumerate(aperture_reports):
+			report.update({key: value if key == 'lines_of_sight' else value[i] for key, value in sz_report.items()})
+	if bootstrap:
+		percentiles = (16., 50., 84.)
+		uncertainties = group_alignment_bootstrap(cluster.group_report_bootstrap(apertures, n_replicas=bootstrap,
+		                                                                         seed=seed), percentiles=percentiles)
+		for i, report in enumerate(aperture_reports):
+			report['bootstrap_percentiles'] = np.array(percentiles)
+			report.update({key: value[i] for key, value in uncertainties.items()})
+	return assemble_report(apertures, aperture_reports, cluster.group_fofinfo)
+
+def save_report_streaming(cluster_data: dict) -> dict:
+	"""
+	Same output as save_report with the default arguments (no bootstrap, selections,
+	centres, SZ signals or potential energy), from the dict returned by the streaming readers
+	(bahamas.read.cluster_data_streaming, macsis.read.cluster_data_streaming).
+	"""
+	fofinfo = lambda r_a: fof_info(cluster_data['Header'], cluster_data['FOF'], aperture_radius=r_a)
+	return assemble_report(cluster_data['apertures'], cluster_data['reports'], fofinfo)
+
+def assemble_report(apertures: np.ndarray, aperture_reports: list, fofinfo) -> dict:
 	master_dict = {}
 	for i, r_a in enumerate(apertures):
 		try:
 			halo_output = {
-					**cluster.group_fofinfo(aperture_radius=r_a),
-					**cluster.group_dynamics(aperture_radius=r_a),
-					**cluster.group_morphology(aperture_radius=r_a)
+					**fofinfo(r_a),
+					**aperture_reports[i]
 			}
 			alignment_dict = group_alignment(halo_output)
 		except:
@@ -135,4 +165,4 @@ def save_report(cluster: Cluster) -> dict:
 			}
 			master_dict[f'aperture{i:02d}'] = halo_output
 			del alignment_dict, halo_output
-	return master_dict
\ No newline at end of file
+	return master_dict
@@ -280,6 +280,10 @@ class FOFOutput(save.SimulationOutput):
 
 class FOFDatagen(save.SimulationOutput):
 
+    jackknife_description = """The *_err datasets contain the delete-one-block jackknife errors of the 
+        Total and ParType0, ParType1, ParType4 datasets, from azimuthal wedges about the Centre of Potential 
+        (see Cluster.group_bulk_quantities_jackknife)."""
+
     def __init__(self, cluster: Cluster):
         super(save.SimulationOutput, self).__init__(simulation_name=cluster.simulation_name)
         self.cluster = cluster
@@ -288,6 +292,20 @@ class FOFDatagen(save.SimulationOutput):
                                          f'halo{self.halo_Num(cluster.clusterID)}',
                                          f'halo{self.halo_Num(cluster.clusterID)}_{cluster.redshift}')
 
+    def jackknife_errors(self) -> dict:
+        """
+        Jackknife errors of the bulk quantities for all the apertures, computed once
+        and shared by the push methods.
+        """
+        if not hasattr(self, '_jackknife_errors'):
+            self._jackknife_errors = self.cluster.group_bulk_quantities_jackknife(self.cluster.generate_apertures())
+        return self._jackknife_errors
+
+    def jackknife_datasets(self, key: str, name: str) -> dict:
+        error = self.jackknife_errors()[f'{key}_err']
+        return {f'/{grouping}_{name}_err': error[:, i]
+                for i, grouping in enumerate(['Total', 'ParType0', 'ParType1', 'ParType4'])}
+
     def push_R_crit(self):
         data = {'/R_200_crit'  : np.array([self.cluster.r200]),
                 '/R_500_crit' : np.array([self.cluster.r500]),
@@ -340,6 +358,8 @@ class FOFDatagen(save.SimulationOutput):
         The Total-mass array gives the total mass within an aperture of all partTypes summed together.""",
                       'Units': '10^10 M_sun'}
 
+        data.update(self.jackknife_datasets('aperture_mass', 'mass'))
+        attributes['Errors'] = self.jackknife_description
         out = FOFOutput(self.cluster, filename='mass.hdf5', data=data, attrs=attributes)
         out.makefile()
 
@@ -373,6 +393,8 @@ class FOFDatagen(save.SimulationOutput):
         The datasets contain the CoM for each high-res particle type and also the combined total value of all particles.""",
                       'Units': '[Mpc], [Mpc], [Mpc]'}
 
+        data.update(self.jackknife_datasets('centre_of_mass', 'CoM'))
+        attributes['Errors'] = self.jackknife_description
         out = FOFOutput(self.cluster, filename='centre_of_mass.hdf5', data=data, attrs=attributes)
         out.makefile()
 
@@ -406,6 +428,8 @@ class FOFDatagen(save.SimulationOutput):
         about each particle type separately, as well as one with combined total contribution.""",
                       'Units': '[km s^-1], [km s^-1], [km s^-1]'}
 
+        data.update(self.jackknife_datasets('zero_momentum_frame', 'ZMF'))
+        attributes['Errors'] = self.jackknife_description
         out = FOFOutput(self.cluster, filename='peculiar_velocity.hdf5', data=data, attrs=attributes)
         out.makefile()
 
@@ -433,6 +457,8 @@ class FOFDatagen(save.SimulationOutput):
                 together.""",
                       'Units': '10^46 J'}
 
+        data.update(self.jackknife_datasets('kinetic_energy', 'kin_energy'))
+        attributes['Errors'] = self.jackknife_description
         out = FOFOutput(self.cluster, filename='kinetic_energy.hdf5', data=data, attrs=attributes)
         out.makefile()
 
@@ -487,6 +513,8 @@ class FOFDatagen(save.SimulationOutput):
         angular momentum information about each particle type separately, as well as one with combined total contribution.""",
                       'Units': '[10^10 M_sun * km * s^-1 * Mpc], [10^10 M_sun * km * s^-1 * Mpc], [10^10 M_sun * km * s^-1 * Mpc]'}
 
+        data.update(self.jackknife_datasets('angular_momentum', 'angmom'))
+        attributes['Errors'] = self.jackknife_description
         out = FOFOutput(self.cluster, filename='angular_momentum.hdf5', data=data, attrs=attributes)
         out.makefile()
 
@@ -653,6 +681,25 @@ class FOFDatagen(save.SimulationOutput):
         out = FOFOutput(self.cluster, filename='substructure_fraction.hdf5', data=data, attrs=attributes)
         out.makefile()
 
+    def push_phase_table(self):
+        """
+        The cumulative radius-temperature table of the gas: the phase-split aperture
+        quantities can be read back with PhaseTable.from_hdf5, without the particle data.
+        :return: None
+        """
+        data = self.cluster.group_phase_table().to_dict()
+
+        attributes = {'Description': """The table dataset contains the cumulative moments of the gas particles,
+                with shape (N_radius_edges, N_temperature_edges + 1, N_moments + 1). table[i, 0] holds the moments of
+                the gas within radius_edges[i] from the Centre of Potential and table[i, j + 1] those of the gas
+                within radius_edges[i] and with T > temperature_edges[j]. The moment columns are those of
+                import_toolkit.apertures.particle_moments, the last column is the number of particles.
+                """,
+                      'Units': '[Mpc], [K], moments in 10^10 M_sun, Mpc and km/s'}
+
+        out = FOFOutput(self.cluster, filename='phase_table.hdf5', data=data, attrs=attributes)
+        out.makefile()
+
 
 
 if __name__ == '__main__':
@@ -676,6 +723,7 @@ if __name__ == '__main__':
         out.push_thermal_energy()
         out.push_thermodynamic_merging_index()
         out.push_substructure_merging_index()
+        out.push_phase_table()
 
 
     """
@@ -43,6 +43,30 @@ def dynamical_index(cluster, aperture_radius = None):
     # assert dynamic_index < 1, "dynamical_index > 1. Unusual for clusters"
     return dynamic_index
 
+def catalogue_indices(cluster, aperture_radius = None):
+    """
+    Catalogue-only dynamical merging index and substructure fraction, from the
+    subhalo table of the groups files: no particle data are loaded, so that all
+    clusters and redshifts can be screened quickly.
+    N.B.: these use the subhalo-based definition (see Cluster.group_substructure_catalogue),
+    not the particle-based one of dynamical_index.
+
+    :param cluster: cluster.Cluster class
+    :return: (dynamical merging index, substructure fraction)
+    """
+    if aperture_radius is None:
+        aperture_radius = cluster.r500
+        print('[ CATALOGUE MERGING IDX ]\t==>\tAperture radius set to default R500 true.')
+
+    for field, reader in [('subhalo_mass', cluster.subgroups_mass),
+                          ('subhalo_centre_of_potential', cluster.subgroups_centre_of_potential),
+                          ('subhalo_centre_of_mass', cluster.subgroups_centre_of_mass)]:
+        if not hasattr(cluster, field):
+            setattr(cluster, field, reader())
+
+    report = cluster.group_substructure_catalogue(apertures=[aperture_radius])
+    return report['subhalo_dynamical_merging_index'][0], report['subhalo_substructure_fraction'][0]
+
 def thermal_index(cluster, aperture_radius = None):
     part_type = '0'
 